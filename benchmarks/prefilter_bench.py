@@ -0,0 +1,160 @@
+#  Copyright 2025 T-Systems International GmbH
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are met:
+#
+#  1. Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#  2. Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+#
+#  3. Neither the name of the copyright holder nor the names of its
+#     contributors may be used to endorse or promote products derived from
+#     this software without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+#  DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+#  FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+#  DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+#  SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+#  CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+#  OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#  OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+# Times the gitleaks keyword prefilter on typical and worst case commits and,
+# if gitleaks is installed, the gitleaks run it replaces.
+#
+#   PYTHONPATH=src python benchmarks/prefilter_bench.py
+
+from __future__ import annotations
+
+import base64
+import os
+import random
+import shutil
+import string
+import subprocess
+import sys
+import tempfile
+import time
+from unittest.mock import patch
+
+from hooked.library.prefilter import keyword_pattern, may_leak
+
+KEYWORDS = [
+    "akia",
+    "ghp_",
+    "gho_",
+    "glpat-",
+    "xoxb-",
+    "xoxp-",
+    "sk_live",
+    "rk_live",
+    "pypi-",
+    "npm_",
+    "shpat_",
+    "aiza",
+    "-----begin",
+    "secret",
+    "token",
+    "password",
+]
+
+
+def _config(path: str, rules: int = 200):
+    rng = random.Random(1)
+    keywords = list(KEYWORDS)
+    while len(keywords) < rules:
+        length = rng.randint(4, 10)
+        keywords.append("".join(rng.choices(string.ascii_lowercase, k=length)))
+    with open(path, "w") as f:
+        for i, keyword in enumerate(keywords):
+            f.write(f'[[rules]]\nid = "rule-{i}"\nregex = "{keyword}[a-z]+"\n')
+            f.write(f'keywords = ["{keyword}"]\n\n')
+    return tuple(keywords)
+
+
+def _code(size: int, keywords: tuple[str, ...]) -> str:
+    """Python source without any of the keywords."""
+    source = open(subprocess.__file__).read()
+    pattern = keyword_pattern(keywords)
+    source = pattern.sub(b"", source.lower().encode()).decode()
+    return (source * (size // len(source) + 1))[:size]
+
+
+def _git(cwd: str, *args: str):
+    subprocess.run(
+        ["git", "-c", "user.name=a", "-c", "user.email=a@b", *args],
+        cwd=cwd,
+        check=True,
+        capture_output=True,
+    )
+
+
+def _time(fn, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _scenario(tmp: str, name: str, files: dict[str, str], config: str):
+    repo = os.path.join(tmp, name)
+    _git(tmp, "init", "--quiet", "--template=", repo)
+    for path, content in files.items():
+        with open(os.path.join(repo, path), "w") as f:
+            f.write(content)
+    _git(repo, "add", ".")
+    size = sum(len(content) for content in files.values())
+
+    result = may_leak(repo, config, max_bytes=1 << 40)
+    seconds = _time(lambda: may_leak(repo, config, max_bytes=1 << 40))
+    line = f"{name:<24}{size / 1024:>10.0f} KiB  may leak: {result!s:<6}{seconds * 1000:>9.1f} ms"
+    if shutil.which("gitleaks"):
+        cmd = ["gitleaks", "git", "--pre-commit", "--staged", "--no-banner"]
+        cmd += ["--config", config, "--exit-code", "0", "."]
+        gitleaks = _time(lambda: subprocess.run(cmd, cwd=repo, capture_output=True))
+        line += f"   gitleaks: {gitleaks * 1000:>9.1f} ms"
+    print(line)
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        config = os.path.join(tmp, ".gitleaks.toml")
+        keywords = _config(config)
+        rng = random.Random(2)
+        blob = base64.b64encode(rng.randbytes(768 * 1024)).decode()
+        with patch("hooked.library.prefilter.get_cache_dir", return_value=tmp):
+            _scenario(
+                tmp,
+                "typical",
+                {f"module{i}.py": _code(4096, keywords) for i in range(20)},
+                config,
+            )
+            _scenario(
+                tmp,
+                "typical with keyword",
+                {
+                    "settings.py": "PASSWORD = 'x'\n",
+                    **{f"module{i}.py": _code(4096, keywords) for i in range(20)},
+                },
+                config,
+            )
+            _scenario(tmp, "large clean", {"big.py": _code(8 << 20, keywords)}, config)
+            _scenario(tmp, "base64 heavy", {"data.txt": blob}, config)
+            _scenario(
+                tmp,
+                "keyword at the end",
+                {"big.py": _code(8 << 20, keywords) + "\ntoken = 1\n"},
+                config,
+            )
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,120 @@
+#  Copyright 2025 T-Systems International GmbH
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are met:
+#
+#  1. Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#  2. Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+#
+#  3. Neither the name of the copyright holder nor the names of its
+#     contributors may be used to endorse or promote products derived from
+#     this software without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+#  DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+#  FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+#  DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+#  SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+#  CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+#  OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#  OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+# Times run_stream on hooks that print a lot, with the console redirected to
+# /dev/null, against the command writing to /dev/null itself.
+#
+#   PYTHONPATH=src python benchmarks/run_stream_bench.py
+
+from __future__ import annotations
+
+import inspect
+import os
+import subprocess
+import sys
+import time
+
+from hooked.library.cmd_util import run_stream
+
+MIB = 1 << 20
+
+
+def _writer(total: int, chunk: int, stderr_every: int = 0) -> list[str]:
+    """A command writing total bytes in writes of chunk bytes."""
+    script = (
+        "import sys\n"
+        f"line = (b'x' * ({chunk} - 1) + b'\\n')\n"
+        f"for i in range({total // chunk}):\n"
+        "    sys.stdout.buffer.write(line)\n"
+        "    sys.stdout.buffer.flush()\n"
+    )
+    if stderr_every:
+        script += (
+            f"    if i % {stderr_every} == 0:\n"
+            "        sys.stderr.buffer.write(line)\n"
+            "        sys.stderr.buffer.flush()\n"
+        )
+    return [sys.executable, "-c", script]
+
+
+def _time(fn, repeat: int = 3) -> tuple[float, object]:
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def _quiet(fn):
+    """Runs fn with stdout and stderr pointing at /dev/null."""
+
+    def run():
+        sys.stdout.flush()
+        sys.stderr.flush()
+        saved = [os.dup(1), os.dup(2)]
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        try:
+            os.dup2(devnull, 1)
+            os.dup2(devnull, 2)
+            return fn()
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os.dup2(saved[0], 1)
+            os.dup2(saved[1], 2)
+            for fd in (*saved, devnull):
+                os.close(fd)
+
+    return run
+
+
+def _scenario(name: str, cmd: list[str], total: int):
+    direct, _ = _time(_quiet(lambda: subprocess.run(cmd, check=True)))
+    line = (
+        f"{name:<28}{total / MIB:>6.0f} MiB  direct {total / MIB / direct:>7.0f} MiB/s"
+    )
+    seconds, result = _time(_quiet(lambda: run_stream(cmd)))
+    captured = len(result.stdout or "") + len(result.stderr or "")
+    line += f"  run_stream {total / MIB / seconds:>7.0f} MiB/s"
+    line += f" ({captured / MIB:.2f} MiB kept)"
+    if "passthrough" in inspect.signature(run_stream).parameters:
+        seconds, _ = _time(_quiet(lambda: run_stream(cmd, passthrough=True)))
+        line += f"  passthrough {total / MIB / seconds:>7.0f} MiB/s"
+    print(line)
+
+
+def main():
+    total = 64 * MIB
+    _scenario("80 byte lines", _writer(total, 80), total)
+    _scenario("4 KiB writes", _writer(total, 4096), total)
+    _scenario("64 KiB writes", _writer(total, 64 * 1024), total)
+    _scenario("lines, 1% to stderr", _writer(total, 80, stderr_every=100), total)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -27,8 +27,6 @@
 
 from __future__ import annotations
 
-from packaging.version import Version
-
 try:
     from ._version import version as __version__
 except ImportError:
@@ -36,6 +34,20 @@ except ImportError:
 
 __pkg_name__ = "hooked"
 __upgrade_interval_seconds__ = 60 * 60 * 24 * 14  # 14 days
-__min_git_version__ = Version("2.30.0")
-__min_precommit_version__ = Version("4.3.0")
-__min_gitleaks_version__ = Version("8.28.0")
+
+# built on first access, packaging is not needed on the hook path
+_MIN_VERSIONS = {
+    "__min_git_version__": "2.30.0",
+    "__min_precommit_version__": "4.3.0",
+    "__min_gitleaks_version__": "8.28.0",
+}
+
+
+def __getattr__(name: str):
+    if name in _MIN_VERSIONS:
+        from packaging.version import Version
+
+        version = Version(_MIN_VERSIONS[name])
+        globals()[name] = version
+        return version
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,303 @@
+#  Copyright 2025 T-Systems International GmbH
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are met:
+#
+#  1. Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#  2. Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+#
+#  3. Neither the name of the copyright holder nor the names of its
+#     contributors may be used to endorse or promote products derived from
+#     this software without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+#  DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+#  FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+#  DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+#  SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+#  CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+#  OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#  OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+# Serves the python hooks of one pre-commit environment for hooked. It runs with
+# the environment's interpreter and only uses the standard library, hooked is
+# not installed there:
+#
+#   python forkserver.py SOCKET IDLE_TIMEOUT [SCRIPT...]
+#
+# The server imports the modules behind the given console scripts, and those of
+# every script it is asked to run later, once. Per connection the client sends
+# a single byte with the fd for the output attached, followed by a json line
+# {"argv", "cwd", "env", "umask"}. The server forks a child that runs argv[0]
+# as __main__ with stdin from /dev/null and stdout and stderr on the fd, like
+# pre-commit starts a hook, and answers {"rc": ...} once the child exited. A
+# client hanging up early terminates its child, connections of other users are
+# closed without reading. The server exits after IDLE_TIMEOUT seconds without
+# requests.
+from __future__ import annotations
+
+import array
+import json
+import os
+import selectors
+import signal
+import socket
+import struct
+import sys
+import time
+
+_EX_SOFTWARE = 70
+_REQUEST_TIMEOUT = 5.0
+
+
+def _preload(script: str):
+    """Imports the module of a console script of this environment."""
+    try:
+        from importlib import metadata
+
+        entry_points = metadata.entry_points()
+        if hasattr(entry_points, "select"):
+            found = entry_points.select(group="console_scripts", name=script)
+        else:
+            found = [
+                ep
+                for ep in entry_points.get("console_scripts", ())
+                if ep.name == script
+            ]
+        for entry_point in found:
+            __import__(entry_point.value.split(":")[0].strip())
+    except Exception:
+        # the child imports it again and reports the error like python would
+        pass
+
+
+def _exit_code(code) -> int:
+    if code is None:
+        return 0
+    if isinstance(code, int):
+        return code
+    print(code, file=sys.stderr)
+    return 1
+
+
+def _child(message: dict, out: int):
+    """Runs a script like `python script args...` would, never returns."""
+    rc = _EX_SOFTWARE
+    try:
+        signal.set_wakeup_fd(-1)
+        signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+        devnull = os.open(os.devnull, os.O_RDONLY)
+        os.dup2(devnull, 0)
+        os.dup2(out, 1)
+        os.dup2(out, 2)
+        os.close(devnull)
+        os.close(out)
+        # buffered like python buffers a terminal or a pipe
+        sys.stdout.reconfigure(line_buffering=os.isatty(1))
+        os.umask(message["umask"])
+        os.chdir(message["cwd"])
+        os.environ.clear()
+        os.environ.update(message["env"])
+        argv = message["argv"]
+        sys.argv = list(argv)
+        sys.path.insert(0, os.path.dirname(os.path.abspath(argv[0])))
+
+        import runpy
+
+        rc = 0
+        runpy.run_path(argv[0], run_name="__main__")
+    except SystemExit as e:
+        rc = _exit_code(e.code)
+    except KeyboardInterrupt:
+        rc = 128 + signal.SIGINT
+    except BaseException:
+        import traceback
+
+        traceback.print_exc()
+        rc = 1
+    finally:
+        try:
+            import atexit
+
+            atexit._run_exitfuncs()
+            sys.stdout.flush()
+            sys.stderr.flush()
+        finally:
+            os._exit(rc & 0xFF)
+
+
+def _returncode(status: int) -> int:
+    """Like subprocess, negative for a signal."""
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+    return os.WEXITSTATUS(status)
+
+
+def _recv_fd(conn: socket.socket) -> int | None:
+    fds = array.array("i")
+    _, ancdata, _, _ = conn.recvmsg(1, socket.CMSG_SPACE(fds.itemsize))
+    for level, kind, data in ancdata:
+        if level == socket.SOL_SOCKET and kind == socket.SCM_RIGHTS:
+            fds.frombytes(data[: len(data) - len(data) % fds.itemsize])
+    for fd in fds[1:]:
+        os.close(fd)
+    return fds[0] if fds else None
+
+
+def _same_user(conn: socket.socket) -> bool:
+    if not hasattr(socket, "SO_PEERCRED"):
+        # the socket's directory is only accessible by the user
+        return True
+    creds = conn.getsockopt(
+        socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i")
+    )
+    _, uid, _ = struct.unpack("3i", creds)
+    return uid == os.getuid()
+
+
+def _listen(path: str) -> socket.socket | None:
+    """Binds the socket, None if another server is serving it."""
+    os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        listener.bind(path)
+    except OSError:
+        other = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            other.connect(path)
+            listener.close()
+            return None
+        except OSError:
+            # stale socket of a server that died
+            os.unlink(path)
+            listener.bind(path)
+        finally:
+            other.close()
+    os.chmod(path, 0o600)
+    listener.listen(16)
+    return listener
+
+
+def _accept(listener: socket.socket) -> tuple[socket.socket, dict, int] | None:
+    conn, _ = listener.accept()
+    out = None
+    try:
+        if not _same_user(conn):
+            raise ValueError("connection of another user")
+        conn.settimeout(_REQUEST_TIMEOUT)
+        out = _recv_fd(conn)
+        if out is None:
+            raise ValueError("no fd")
+        message = json.loads(conn.makefile("rb").readline())
+        conn.settimeout(None)
+        return conn, message, out
+    except (OSError, ValueError):
+        conn.close()
+        if out is not None:
+            os.close(out)
+        return None
+
+
+def serve(path: str, idle_timeout: float, scripts: list[str]):
+    os.chdir("/")
+    # python put the directory of this file first on sys.path
+    if sys.path and sys.path[0] == os.path.dirname(os.path.abspath(__file__)):
+        del sys.path[0]
+    listener = _listen(path)
+    if listener is None:
+        return
+    inode = os.stat(path).st_ino
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    wakeup_r, wakeup_w = os.pipe()
+    os.set_blocking(wakeup_w, False)
+    signal.set_wakeup_fd(wakeup_w)
+    signal.signal(signal.SIGCHLD, lambda signum, frame: None)
+
+    preloaded = set()
+    for script in scripts:
+        preloaded.add(script)
+        _preload(script)
+
+    children: dict[int, socket.socket] = {}
+    selector = selectors.DefaultSelector()
+    selector.register(listener, selectors.EVENT_READ)
+    selector.register(wakeup_r, selectors.EVENT_READ)
+    last_request = time.monotonic()
+    try:
+        while True:
+            timeout = None
+            if not children:
+                timeout = last_request + idle_timeout - time.monotonic()
+                if timeout <= 0:
+                    break
+            for key, _ in selector.select(timeout):
+                if key.fileobj == wakeup_r:
+                    os.read(wakeup_r, 512)
+                elif key.fileobj == listener:
+                    request = _accept(listener)
+                    if request is None:
+                        continue
+                    conn, message, out = request
+                    pid = os.fork()
+                    if pid == 0:
+                        selector.close()
+                        listener.close()
+                        conn.close()
+                        for other in children.values():
+                            other.close()
+                        os.close(wakeup_r)
+                        os.close(wakeup_w)
+                        _child(message, out)
+                    os.close(out)
+                    children[pid] = conn
+                    selector.register(conn, selectors.EVENT_READ, pid)
+                    # warms the next run of this script
+                    script = os.path.basename(message["argv"][0])
+                    if script not in preloaded:
+                        preloaded.add(script)
+                        _preload(script)
+                else:
+                    # the client sends nothing after its request, it hung up
+                    selector.unregister(key.fileobj)
+                    try:
+                        os.kill(key.data, signal.SIGTERM)
+                    except ProcessLookupError:
+                        pass
+
+            while children:
+                try:
+                    pid, status = os.waitpid(-1, os.WNOHANG)
+                except ChildProcessError:
+                    break
+                if pid == 0:
+                    break
+                conn = children.pop(pid)
+                if conn.fileno() in selector.get_map():
+                    selector.unregister(conn)
+                try:
+                    conn.sendall(
+                        json.dumps({"rc": _returncode(status)}).encode() + b"\n"
+                    )
+                except OSError:
+                    pass
+                conn.close()
+                last_request = time.monotonic()
+    finally:
+        listener.close()
+        try:
+            if os.stat(path).st_ino == inode:
+                os.unlink(path)
+        except OSError:
+            pass
+
+
+if __name__ == "__main__":
+    serve(sys.argv[1], float(sys.argv[2]), sys.argv[3:])
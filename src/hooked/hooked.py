@@ -30,21 +30,33 @@ from __future__ import annotations
 import logging
 import os
 import sys
-import traceback
 from argparse import Namespace
 from collections.abc import Sequence
 
-from hooked import __upgrade_interval_seconds__, __version__
-from hooked.library.cli import cmd_parser
-from hooked.library.config import update_config
-from hooked.library.files import get_base_dir
+from hooked import __version__
 from hooked.library.logger import logger, set_log_level
 
 
+def _hook_args(argv: Sequence[str]) -> Namespace | None:
+    """
+    Parses `run pre-commit <path>` without the parser, which imports and
+    builds every subcommand on each commit. Anything else returns None.
+    """
+    if len(argv) != 3 or argv[0] != "run" or argv[1] != "pre-commit":
+        return None
+    if argv[2].startswith("-"):
+        return None
+    # what the parser returns for it, --log-level is not given
+    return Namespace(cmd="run", cmd_run="pre-commit", path=[argv[2]], log_level="INFO")
+
+
 def main(argv: Sequence[str] | None = None):
-    parser = cmd_parser()
+    argv = sys.argv[1:] if argv is None else argv
+    args = _hook_args(argv)
+    if args is None:
+        from hooked.library.cli import cmd_parser
 
-    args = parser.parse_args(argv)
+        args = cmd_parser().parse_args(argv)
 
     # default log level is ERROR, can be overridden by HOOKED_LOG_LEVEL env var
     log_level = os.getenv("HOOKED_LOG_LEVEL", "info").upper()
@@ -64,6 +76,8 @@ def main(argv: Sequence[str] | None = None):
         return os.EX_OK
     except:
         if logger.level == logging.DEBUG:
+            import traceback
+
             sys.stderr.write("\033[31m")
             sys.stderr.write(traceback.format_exc())
             sys.stderr.write("\033[0m")
@@ -71,6 +85,51 @@ def main(argv: Sequence[str] | None = None):
         return os.EX_SOFTWARE
 
 
+def _watch(args: Namespace):
+    from hooked.library import watcher
+
+    paths = args.path or [os.getcwd()]
+    if args.add:
+        for path in paths:
+            if watcher.add_repo(path):
+                logger.info(f"Watching {watcher.work_tree(path)}.")
+        return
+    if args.remove:
+        for path in paths:
+            if not watcher.remove_repo(path):
+                logger.info(f"{path} is not enrolled.")
+        return
+    if args.list:
+        for repo in watcher.watched_repos():
+            sys.stdout.write(f"{repo}\n")
+        sys.stdout.flush()
+        return
+
+    repos = [watcher.work_tree(path) for path in args.path]
+    repos = repos or watcher.watched_repos()
+    if not repos:
+        logger.info("No repositories enrolled, see hooked watch --add.")
+        return
+
+    from hooked.library.hooks.precheck import precheck_staged
+
+    try:
+        os.nice(10)
+    except (AttributeError, OSError):
+        pass
+    # failing verdicts are not tried again until the watcher restarts
+    failed: set[bytes] = set()
+    logger.info(f"Watching {len(repos)} repositories, Ctrl-C to stop.")
+    try:
+        watcher.watch(
+            repos,
+            lambda repo: precheck_staged(repo, failed),
+            use_inotify=not args.poll,
+        )
+    except KeyboardInterrupt:
+        pass
+
+
 def run(args: Namespace):
     match args.cmd:
         case "version":
@@ -78,8 +137,13 @@ def run(args: Namespace):
             sys.stdout.flush()
 
         case "update":
+            from hooked.library.config import update_config
+            from hooked.library.files import copy_hooked_files, get_base_dir
+
             base_dir = get_base_dir()
             update_config(base_dir)
+            # the pre-commit shim bakes in settings of the rule set
+            copy_hooked_files()
 
         case "self-upgrade":
             from hooked.library.upgrade import self_upgrade
@@ -104,9 +168,47 @@ def run(args: Namespace):
             enable()
 
         case "run":
-            from hooked.library.hooks.pre_commit import run_pre_commit_hook
-
-            run_pre_commit_hook(args.path)
+            if args.cmd_run == "deferred":
+                from hooked.library.hooks.post_commit import run_deferred_hooks
+
+                run_deferred_hooks(args.path)
+            else:
+                from hooked.library.hooks.pre_commit import run_pre_commit_hook
+
+                run_pre_commit_hook(args.path)
+
+        case "cache-server":
+            from hooked.library.files import get_cache_dir
+            from hooked.library.remote_cache import serve
+
+            cache_file = args.cache_file or os.path.join(
+                get_cache_dir(), "server-verdicts.bin"
+            )
+            serve(
+                args.host,
+                args.port,
+                cache_file,
+                size=args.size,
+                token=os.getenv("HOOKED_REMOTE_CACHE_TOKEN"),
+            )
+
+        case "daemon":
+            from hooked.library.daemon import DEFAULT_IDLE_TIMEOUT, serve, stop
+            from hooked.library.env import env_float
+
+            if args.stop:
+                if not stop():
+                    logger.info("hooked daemon is not running.")
+            else:
+                idle_timeout = args.idle_timeout
+                if idle_timeout is None:
+                    idle_timeout = env_float(
+                        "HOOKED_DAEMON_IDLE_TIMEOUT", DEFAULT_IDLE_TIMEOUT
+                    )
+                serve(idle_timeout=idle_timeout)
+
+        case "watch":
+            _watch(args)
 
         case "check":
             from hooked.library.install import check_pre_requisites
@@ -114,6 +216,8 @@ def run(args: Namespace):
             check_pre_requisites()
 
         case _:
+            from hooked.library.cli import cmd_parser
+
             cmd_parser().print_help()
 
 
@@ -87,6 +87,19 @@ def cmd_parser() -> argparse.ArgumentParser:
         help="Path to the repository where the pre-commit hook should be run",
     )
 
+    cmd_run_deferred = cmd_run_sub.add_parser(
+        "deferred",
+        help="run the hooks deferred by the pre-commit hook",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+
+    cmd_run_deferred.add_argument(
+        "path",
+        type=str,
+        nargs=1,
+        help="Path to the repository where the commit was made",
+    )
+
     # install subcommand
     cmd_install = sub.add_parser(
         "install",
@@ -173,6 +186,95 @@ def cmd_parser() -> argparse.ArgumentParser:
         help="Ignore the timer",
     )
 
+    # cache-server subcommand
+    cmd_cache_server = sub.add_parser(
+        "cache-server",
+        help="Serve a shared verdict cache for a team",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    cmd_cache_server.add_argument(
+        "--host",
+        type=str,
+        default="127.0.0.1",
+        help="Address to listen on",
+    )
+    cmd_cache_server.add_argument(
+        "--port",
+        type=int,
+        default=8420,
+        help="Port to listen on",
+    )
+    cmd_cache_server.add_argument(
+        "--cache-file",
+        type=str,
+        default=None,
+        help="Verdict index to serve (default: server-verdicts.bin in the hooked cache directory)",
+    )
+    cmd_cache_server.add_argument(
+        "--size",
+        type=int,
+        default=64 * 1024 * 1024,
+        help="Size budget of the verdict index in bytes",
+    )
+
+    # daemon subcommand
+    cmd_daemon = sub.add_parser(
+        "daemon",
+        help="Serve commits from a warm process, see HOOKED_DAEMON",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    cmd_daemon.add_argument(
+        "--idle-timeout",
+        type=float,
+        default=None,
+        help="Seconds without requests after which the daemon exits "
+        "(default: HOOKED_DAEMON_IDLE_TIMEOUT or 1800)",
+    )
+    cmd_daemon.add_argument(
+        "--stop",
+        action="store_true",
+        default=False,
+        help="Stop the running daemon",
+    )
+
+    # watch subcommand
+    cmd_watch = sub.add_parser(
+        "watch",
+        help="Pre-check staged files of enrolled repositories in the background",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    cmd_watch_action = cmd_watch.add_mutually_exclusive_group()
+    cmd_watch_action.add_argument(
+        "--add",
+        action="store_true",
+        default=False,
+        help="Enroll the repositories (default: the current one) and exit",
+    )
+    cmd_watch_action.add_argument(
+        "--remove",
+        action="store_true",
+        default=False,
+        help="Withdraw the repositories (default: the current one) and exit",
+    )
+    cmd_watch_action.add_argument(
+        "--list",
+        action="store_true",
+        default=False,
+        help="List the enrolled repositories and exit",
+    )
+    cmd_watch.add_argument(
+        "--poll",
+        action="store_true",
+        default=False,
+        help="Poll the indexes instead of using inotify",
+    )
+    cmd_watch.add_argument(
+        "path",
+        type=str,
+        nargs="*",
+        help="Repositories to watch instead of the enrolled ones",
+    )
+
     # version subcommand
     sub.add_parser(
         "version",
@@ -27,17 +27,25 @@
 
 from __future__ import annotations
 
+import codecs
+import os
+import selectors
 import shlex
 import signal
 import subprocess as sp
 import sys
 import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from logging import DEBUG
-from typing import Mapping, Sequence
+from typing import IO, TYPE_CHECKING, Any, Callable, Iterator, Mapping, Sequence
 
 from hooked.library.logger import logger
 
+if TYPE_CHECKING:
+    import asyncio
+
 
 @dataclass
 class CommandResult:
@@ -45,6 +53,7 @@ class CommandResult:
     returncode: int
     stdout: str | None
     stderr: str | None
+    duration: float = 0.0
 
     @property
     def ok(self) -> bool:
@@ -136,69 +145,440 @@ def run_cmd(
     return result
 
 
+# run_stream keeps the end of each stream in the CommandResult, the output
+# only matters once the command failed
+STREAM_CAPTURE_BYTES = 256 * 1024
+# seconds between flushes of the console while output keeps coming
+_FLUSH_INTERVAL = 0.05
+_READ_SIZE = 64 * 1024
+
+
+def _keep_tail(tail: bytearray, data: bytes, limit: int):
+    """Appends data to tail, dropping all but the last limit bytes in batches."""
+    if limit <= 0:
+        return
+    tail.extend(data)
+    if len(tail) > 2 * limit:
+        del tail[: len(tail) - limit]
+
+
+class _Console:
+    """Writes raw output to a text stream, to its binary buffer if it has one."""
+
+    def __init__(self, stream: IO[str]):
+        self.stream: IO[str] | None = stream
+        self.buffer: IO[bytes] | None = getattr(stream, "buffer", None)
+        self.decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+
+    def write(self, data: bytes):
+        if self.stream is None:
+            return
+        try:
+            if self.buffer is not None:
+                self.buffer.write(data)
+            else:
+                self.stream.write(self.decoder.decode(data))
+        except Exception:  # noqa
+            # e.g. the console is gone, keep draining the command
+            self.stream = None
+
+    def flush(self):
+        if self.stream is None:
+            return
+        try:
+            (self.buffer or self.stream).flush()
+        except Exception:  # noqa
+            self.stream = None
+
+
+def _pump(streams: list[tuple[IO[bytes], IO[str]]], capture: int) -> list[bytes]:
+    """
+    Copies the output of a command to the console in one thread, reading
+    whatever is available in chunks. The console is flushed at most every
+    _FLUSH_INTERVAL while output keeps coming, and once the command paused.
+    Returns the last capture bytes of each stream.
+    """
+    consoles = {src.fileno(): (_Console(dst), bytearray()) for src, dst in streams}
+    with selectors.DefaultSelector() as selector:
+        for fd in consoles:
+            selector.register(fd, selectors.EVENT_READ)
+        unflushed = False
+        last_flush = time.monotonic()
+        while selector.get_map():
+            timeout = None
+            if unflushed:
+                timeout = max(0.0, last_flush + _FLUSH_INTERVAL - time.monotonic())
+            for key, _ in selector.select(timeout):
+                data = os.read(key.fd, _READ_SIZE)
+                if not data:
+                    selector.unregister(key.fd)
+                    continue
+                console, tail = consoles[key.fd]
+                console.write(data)
+                _keep_tail(tail, data, capture)
+                unflushed = True
+            if unflushed and time.monotonic() - last_flush >= _FLUSH_INTERVAL:
+                for console, _ in consoles.values():
+                    console.flush()
+                unflushed = False
+                last_flush = time.monotonic()
+    for console, _ in consoles.values():
+        console.flush()
+    for src, _ in streams:
+        src.close()
+    return [
+        bytes(tail[-capture:]) if capture > 0 else b"" for _, tail in consoles.values()
+    ]
+
+
 def run_stream(
     cmd: Sequence[str],
     *,
     cwd: str | None = None,
     env: Mapping[str, str] | None = None,
+    popen: Callable[..., Any] | None = None,
+    capture: int = STREAM_CAPTURE_BYTES,
+    passthrough: bool = False,
 ) -> CommandResult:
     """
-    Stream output live to the console (tee) while capturing it.
-    On non-zero exit: logs stderr+stdout and raises CommandError.
-    Returns CommandResult on success (stdout/stderr are the captured streams).
+    Stream output live to the console (tee) while capturing its end.
+    stdout and stderr of the command go to sys.stdout and sys.stderr, the
+    result holds the last `capture` bytes of each. With passthrough the
+    command writes to the console itself and nothing is captured.
+    On non-zero exit: raises CommandError.
+    Returns CommandResult on success.
+    popen replaces subprocess.Popen, e.g. to run pre-commit in a worker.
     """
     _log_cmd(cmd)
+    for stream in (sys.stdout, sys.stderr):
+        # what was written before comes first
+        try:
+            stream.flush()
+        except Exception:  # noqa
+            pass
+    pipe = None if passthrough else sp.PIPE
+    start = time.monotonic()
     try:
-        p = sp.Popen(
-            cmd,
-            cwd=cwd,
-            env=env,
-            stdout=sp.PIPE,
-            stderr=sp.PIPE,
-            text=True,
-            bufsize=1,  # line-buffered
-        )
+        p = (popen or sp.Popen)(cmd, cwd=cwd, env=env, stdout=pipe, stderr=pipe)
     except FileNotFoundError as e:
         raise _handle_failure(
             CommandResult(cmd=cmd, returncode=127, stdout=None, stderr=str(e))
         )
 
-    out_buf: list[str] = []
-    err_buf: list[str] = []
-
-    def _pump(src, dst, collector: list[str]):
-        for line in iter(src.readline, ""):
-            collector.append(line)
-            try:
-                dst.write(line)
-                dst.flush()
-            except Exception:  # noqa
-                pass
-        src.close()
-
-    t_out = threading.Thread(
-        target=_pump, args=(p.stdout, sys.stdout, out_buf), daemon=True
-    )
-    t_err = threading.Thread(
-        target=_pump, args=(p.stderr, sys.stdout, err_buf), daemon=True
-    )
-    t_out.start()
-    t_err.start()
+    stdout = stderr = b""
+    if not passthrough:
+        stdout, stderr = _pump(
+            [(p.stdout, sys.stdout), (p.stderr, sys.stderr)], capture
+        )
     rc = p.wait()
-    t_out.join()
-    t_err.join()
 
     result = CommandResult(
         cmd=cmd,
         returncode=rc,
-        stdout="".join(out_buf) if out_buf else None,
-        stderr="".join(err_buf) if err_buf else None,
+        stdout=stdout.decode(errors="replace") if stdout else None,
+        stderr=stderr.decode(errors="replace") if stderr else None,
+        duration=time.monotonic() - start,
+    )
+    if not result.ok:
+        raise _handle_failure(result)
+    return result
+
+
+def run_parallel(
+    cmds: Sequence[Sequence[str]],
+    *,
+    jobs: int,
+    cwd: str | None = None,
+    env: Mapping[str, str] | None = None,
+    fail_fast: bool = False,
+    popen: Callable[..., Any] | None = None,
+) -> list[CommandResult | None]:
+    """
+    Run commands concurrently, at most `jobs` at a time. stdout and stderr of
+    each command are captured together into stdout, so output can be printed
+    in a stable order afterwards.
+    Failures are not raised; returns the results in the order of cmds. With
+    fail_fast, commands not started before the first failure are not run and
+    their result is None. popen replaces subprocess.Popen.
+    """
+    failed = threading.Event()
+
+    def _run(cmd: Sequence[str]) -> CommandResult | None:
+        if fail_fast and failed.is_set():
+            return None
+        _log_cmd(cmd)
+        start = time.monotonic()
+        try:
+            with (popen or sp.Popen)(
+                cmd, cwd=cwd, env=env, stdout=sp.PIPE, stderr=sp.STDOUT, text=True
+            ) as p:
+                stdout, _ = p.communicate()
+        except FileNotFoundError as e:
+            failed.set()
+            return CommandResult(cmd=cmd, returncode=127, stdout=None, stderr=str(e))
+        if p.returncode != 0:
+            failed.set()
+        return CommandResult(
+            cmd=cmd,
+            returncode=p.returncode,
+            stdout=stdout,
+            stderr=None,
+            duration=time.monotonic() - start,
+        )
+
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        return list(pool.map(_run, cmds))
+
+
+# seconds a process group may take to exit on SIGTERM before it is killed
+_TERMINATE_GRACE = 2.0
+
+
+def _signal_group(pid: int, signum: int):
+    try:
+        os.killpg(pid, signum)
+    except OSError:
+        # the group is gone
+        pass
+
+
+async def _terminate_group(p: asyncio.subprocess.Process):
+    """
+    Terminates the process group of p, i.e. the command and everything it
+    started that didn't leave the group, and reaps p.
+    """
+    import asyncio
+
+    _signal_group(p.pid, signal.SIGTERM)
+    try:
+        await asyncio.wait_for(p.wait(), _TERMINATE_GRACE)
+    except TimeoutError:
+        # ignores SIGTERM
+        pass
+    finally:
+        # also stops children that outlived their parent or ignore SIGTERM
+        _signal_group(p.pid, signal.SIGKILL)
+    await p.wait()
+
+
+async def _run_async(
+    cmd: Sequence[str],
+    *,
+    timeout: float | None,
+    cwd: str | None,
+    env: Mapping[str, str] | None,
+    merge_stderr: bool,
+) -> tuple[CommandResult, bytes, bytes | None]:
+    """
+    Runs a command in its own process group and returns its result together
+    with the raw output. Failures are returned, not raised.
+
+    Raises:
+        FileNotFoundError: If the command does not exist.
+    """
+    import asyncio
+
+    _log_cmd(cmd)
+    start = time.monotonic()
+    p = await asyncio.create_subprocess_exec(
+        *cmd,
+        cwd=cwd,
+        env=env,
+        stdin=sp.DEVNULL,
+        stdout=sp.PIPE,
+        stderr=sp.STDOUT if merge_stderr else sp.PIPE,
+        # Ctrl-C is not sent to the group, cancelling the task stops it
+        start_new_session=True,
+    )
+    try:
+        async with asyncio.timeout(timeout):
+            stdout, stderr = await p.communicate()
+        returncode = p.returncode
+        assert returncode is not None
+    except TimeoutError:
+        await _terminate_group(p)
+        stdout, stderr = b"", None
+        returncode = -signal.SIGALRM
+    except BaseException:
+        # cancelled, e.g. by Ctrl-C in asyncio.run
+        await _terminate_group(p)
+        raise
+    result = CommandResult(
+        cmd=cmd,
+        returncode=returncode,
+        stdout=None,
+        stderr=None,
+        duration=time.monotonic() - start,
     )
+    return result, stdout, stderr
+
+
+async def run_cmd_async(
+    cmd: Sequence[str],
+    *,
+    timeout: float | None = None,
+    cwd: str | None = None,
+    env: Mapping[str, str] | None = None,
+    text: bool = True,
+    limit: asyncio.Semaphore | None = None,
+) -> CommandResult:
+    """
+    Run a command like run_cmd, in an event loop. The command gets its own
+    process group, which is terminated as a whole when the timeout expires
+    or the task is cancelled. limit bounds how many commands sharing it run
+    at once; the timeout starts once the command may run.
+    On non-zero exit: raises CommandError.
+    Returns CommandResult on success.
+    """
+    import contextlib
+
+    async with limit or contextlib.nullcontext():
+        try:
+            result, stdout, stderr = await _run_async(
+                cmd, timeout=timeout, cwd=cwd, env=env, merge_stderr=False
+            )
+        except FileNotFoundError as e:
+            raise _handle_failure(
+                CommandResult(cmd=cmd, returncode=127, stdout=None, stderr=str(e)),
+                stderr=True,
+                stdout=True,
+            )
+    stdout, stderr = stdout.strip(), (stderr or b"").strip()
+    # like run_cmd, the output stays bytes unless text
+    result.stdout = stdout.decode(errors="replace") if text else stdout
+    result.stderr = stderr.decode(errors="replace") if text else stderr
     if not result.ok:
         raise _handle_failure(result)
     return result
 
 
+async def run_parallel_async(
+    cmds: Sequence[Sequence[str]],
+    *,
+    jobs: int,
+    timeout: float | None = None,
+    cwd: str | None = None,
+    env: Mapping[str, str] | None = None,
+    fail_fast: bool = False,
+) -> list[CommandResult | None]:
+    """
+    Run commands like run_parallel, in an event loop, at most `jobs` at a
+    time and each with its own process group and timeout. A command that
+    timed out fails with the return code of SIGALRM, like with run_cmd.
+    Cancelling the task terminates the process groups of running commands.
+    """
+    import asyncio
+
+    limit = asyncio.Semaphore(max(1, jobs))
+    failed = False
+
+    async def _run(cmd: Sequence[str]) -> CommandResult | None:
+        nonlocal failed
+        async with limit:
+            if fail_fast and failed:
+                return None
+            try:
+                result, stdout, _ = await _run_async(
+                    cmd, timeout=timeout, cwd=cwd, env=env, merge_stderr=True
+                )
+            except FileNotFoundError as e:
+                failed = True
+                return CommandResult(
+                    cmd=cmd, returncode=127, stdout=None, stderr=str(e)
+                )
+        if result.returncode != 0:
+            failed = True
+        result.stdout = stdout.decode(errors="replace")
+        return result
+
+    return list(await asyncio.gather(*(_run(cmd) for cmd in cmds)))
+
+
+def iter_records(
+    cmd: Sequence[str],
+    *,
+    sep: bytes = b"\0",
+    cwd: str | None = None,
+    env: Mapping[str, str] | None = None,
+) -> Iterator[bytes]:
+    """
+    Stream the stdout of a command as records split by sep (NUL by default).
+    Records are yielded while the command is still running.
+    On non-zero exit: logs stderr and raises CommandError once the output
+    has been consumed.
+    """
+    _log_cmd(cmd)
+    try:
+        p = sp.Popen(cmd, cwd=cwd, env=env, stdout=sp.PIPE, stderr=sp.PIPE)
+    except FileNotFoundError as e:
+        raise _handle_failure(
+            CommandResult(cmd=cmd, returncode=127, stdout=None, stderr=str(e))
+        )
+
+    assert p.stdout is not None and p.stderr is not None
+    pending = b""
+    with p:
+        while chunk := p.stdout.read1(64 * 1024):
+            *records, pending = (pending + chunk).split(sep)
+            yield from records
+        stderr = p.stderr.read()
+        rc = p.wait()
+    if pending:
+        yield pending
+
+    if rc != 0:
+        raise _handle_failure(
+            CommandResult(
+                cmd=cmd,
+                returncode=rc,
+                stdout=None,
+                stderr=stderr.decode(errors="replace").strip(),
+            ),
+            stderr=True,
+        )
+
+
+def arg_max(env: Mapping[str, str] | None = None) -> int:
+    """
+    Returns the number of bytes left for command line arguments, taking the
+    environment passed to the child and some headroom into account.
+    """
+    try:
+        limit = os.sysconf("SC_ARG_MAX")
+    except (AttributeError, ValueError, OSError):
+        limit = -1
+    if limit <= 0:
+        limit = 32 * 1024  # windows command line limit
+    env = os.environ if env is None else env
+    env_size = sum(len(k) + len(v) + 2 + 8 for k, v in env.items())
+    return max(limit - env_size - 4096, 4096)
+
+
+def partition_args(
+    cmd: Sequence[str], args: Sequence[str], max_length: int
+) -> Iterator[list[str]]:
+    """
+    Split args into chunks, so that cmd plus each chunk fits into max_length
+    bytes. Every argument counts its size plus the pointer and NUL terminator.
+    """
+
+    def _size(arg: str) -> int:
+        return len(os.fsencode(arg)) + 1 + 8
+
+    base = sum(_size(arg) for arg in cmd)
+    chunk: list[str] = []
+    length = base
+    for arg in args:
+        size = _size(arg)
+        if chunk and length + size > max_length:
+            yield chunk
+            chunk, length = [], base
+        chunk.append(arg)
+        length += size
+    if chunk:
+        yield chunk
+
+
 def exit_with_child_status(returncode: int):
     """Exit current process with the normalized child status."""
     sys.exit(_normalize_exit_code(returncode))
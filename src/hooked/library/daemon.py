@@ -0,0 +1,473 @@
+#  Copyright 2025 T-Systems International GmbH
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are met:
+#
+#  1. Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#  2. Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+#
+#  3. Neither the name of the copyright holder nor the names of its
+#     contributors may be used to endorse or promote products derived from
+#     this software without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+#  DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+#  FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+#  DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+#  SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+#  CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+#  OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#  OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+from __future__ import annotations
+
+import json
+import os
+import signal
+import socket
+import sys
+import time
+from typing import Callable, Sequence
+
+from hooked import __version__
+from hooked.library.files import get_base_dir, get_config_dir
+from hooked.library.logger import logger
+
+# opts the shell hook into serving commits through the daemon
+DAEMON_ENV = "HOOKED_DAEMON"
+DEFAULT_IDLE_TIMEOUT = 30 * 60
+# exit code of the client if no daemon served the request (EX_TEMPFAIL),
+# the shell hook then runs hooked as usual
+EX_NO_DAEMON = 75
+
+_CONNECT_TIMEOUT = 1.0
+_REQUEST_TIMEOUT = 5.0
+_FORWARDED_SIGNALS = (signal.SIGINT, signal.SIGTERM, signal.SIGHUP)
+
+# Protocol, one connection per request: the client sends a single byte with its
+# stdin, stdout and stderr attached as file descriptors, followed by a json
+# line {"version", "python", "argv", "cwd", "env", "umask"} or {"cmd": "stop"}.
+# The daemon forks a child per request that answers {"pid": ...} once it runs
+# and {"rc": ...} when done; {"error": ...} tells the client to fall back.
+
+
+def socket_path() -> str:
+    """The per user socket, in XDG_RUNTIME_DIR if available."""
+    runtime_dir = os.getenv("XDG_RUNTIME_DIR")
+    if runtime_dir:
+        return os.path.join(runtime_dir, "hooked", "daemon.sock")
+    return os.path.join(get_base_dir(), "run", "daemon.sock")
+
+
+def _send(conn: socket.socket, message: dict):
+    conn.sendall(json.dumps(message).encode() + b"\n")
+
+
+def _connect(path: str) -> socket.socket | None:
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.settimeout(_CONNECT_TIMEOUT)
+        sock.connect(path)
+    except OSError:
+        sock.close()
+        return None
+    sock.settimeout(None)
+    return sock
+
+
+def _umask() -> int:
+    umask = os.umask(0o022)
+    os.umask(umask)
+    return umask
+
+
+def request(
+    argv: Sequence[str],
+    cwd: str,
+    fds: Sequence[int] | None = None,
+    path: str | None = None,
+) -> int:
+    """
+    Runs hooked with argv in the daemon, passing it the given stdin, stdout
+    and stderr. Returns hooked's exit code, or EX_NO_DAEMON if no daemon of
+    this version could serve the request.
+    """
+    sock = _connect(path or socket_path())
+    if sock is None:
+        return EX_NO_DAEMON
+
+    devnull = None
+    if fds is None:
+        # the daemon's child is not in the terminal's foreground group and
+        # would be stopped reading from it
+        if os.isatty(0):
+            devnull = os.open(os.devnull, os.O_RDONLY)
+        fds = (devnull if devnull is not None else 0, 1, 2)
+
+    pid = None
+    forwarded = None
+
+    def forward(signum, frame):
+        nonlocal forwarded
+        forwarded = signum
+        if pid:
+            try:
+                os.killpg(pid, signum)
+            except OSError:
+                pass
+
+    handlers = {signum: signal.signal(signum, forward) for signum in _FORWARDED_SIGNALS}
+    try:
+        with sock:
+            socket.send_fds(sock, [b"\0"], list(fds))
+            if devnull is not None:
+                os.close(devnull)
+                devnull = None
+            _send(
+                sock,
+                {
+                    "version": __version__,
+                    "python": sys.executable,
+                    "argv": list(argv),
+                    "cwd": cwd,
+                    "env": dict(os.environ),
+                    "umask": _umask(),
+                },
+            )
+            for line in sock.makefile("rb"):
+                reply = json.loads(line)
+                if "pid" in reply:
+                    pid = reply["pid"]
+                    if forwarded:
+                        forward(forwarded, None)
+                elif "rc" in reply:
+                    return int(reply["rc"])
+                else:
+                    return EX_NO_DAEMON
+    except (OSError, ValueError):
+        pass
+    finally:
+        for signum, handler in handlers.items():
+            signal.signal(signum, handler)
+        if devnull is not None:
+            os.close(devnull)
+    # the child died without an answer
+    return 128 + forwarded if forwarded else EX_NO_DAEMON
+
+
+def spawn_daemon():
+    """Starts a daemon in the background, it exits if one is running already."""
+    import subprocess
+
+    subprocess.Popen(
+        [sys.executable, "-m", "hooked", "daemon"],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+
+
+def client_main(argv: Sequence[str] | None = None) -> int:
+    """Entry point of hooked-client, runs `hooked run <argv>` in the daemon."""
+    argv = list(sys.argv[1:] if argv is None else argv)
+    rc = request(["run", *argv], os.getcwd())
+    if rc == EX_NO_DAEMON:
+        spawn_daemon()
+    return rc
+
+
+def stop(path: str | None = None) -> bool:
+    """Asks a running daemon to exit, returns False if none was running."""
+    sock = _connect(path or socket_path())
+    if sock is None:
+        return False
+    with sock:
+        socket.send_fds(sock, [b"\0"], [])
+        _send(sock, {"cmd": "stop"})
+        sock.makefile("rb").readline()
+    return True
+
+
+def _ruleset_snapshot(config_dir: str) -> tuple:
+    from hooked.library.ruleset import GITLEAKS_CONFIG, PRE_COMMIT_CONFIG, SETTINGS_FILE
+
+    snapshot = []
+    for name in (PRE_COMMIT_CONFIG, SETTINGS_FILE, GITLEAKS_CONFIG):
+        try:
+            st = os.stat(os.path.join(config_dir, name))
+            snapshot.append((name, st.st_mtime_ns, st.st_size, st.st_ino))
+        except OSError:
+            snapshot.append((name, None))
+    return tuple(snapshot)
+
+
+def _warm(config_dir: str):
+    """Imports the hook path and loads the rule set and tool versions."""
+    import hooked.hooked  # noqa: F401
+    from hooked.library.cmd_util import CommandError
+    from hooked.library.hooks import (
+        post_commit,  # noqa: F401
+        pre_commit,
+    )
+    from hooked.library.pre_commit_worker import fork_backend, import_pre_commit
+    from hooked.library.prefilter import keyword_pattern, load_keywords
+    from hooked.library.ruleset import (
+        GITLEAKS_CONFIG,
+        PRE_COMMIT_CONFIG,
+        load_hooks,
+        load_settings,
+    )
+
+    settings = load_settings(config_dir)
+    try:
+        load_hooks(os.path.join(config_dir, PRE_COMMIT_CONFIG))
+    except (OSError, ValueError):
+        pass
+
+    if fork_backend():
+        # forked pre-commit workers start with it imported
+        import_pre_commit()
+
+    pre_commit._pre_commit_version.cache_clear()
+    pre_commit._gitleaks_version.cache_clear()
+    try:
+        pre_commit._pre_commit_version()
+    except CommandError:
+        pass
+    if settings.native_gitleaks:
+        try:
+            pre_commit._gitleaks_version()
+        except RuntimeError:
+            pass
+
+    gitleaks_config = os.path.join(config_dir, GITLEAKS_CONFIG)
+    if os.path.isfile(gitleaks_config):
+        keywords = load_keywords(gitleaks_config)
+        if keywords:
+            keyword_pattern(keywords)
+
+
+def _run_hooked(argv: Sequence[str]) -> int:
+    from hooked.hooked import main
+
+    return main(argv)
+
+
+def _same_user(conn: socket.socket) -> bool:
+    if not hasattr(socket, "SO_PEERCRED"):
+        # the socket's directory is only accessible by the user
+        return True
+    import struct
+
+    creds = conn.getsockopt(
+        socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i")
+    )
+    _, uid, _ = struct.unpack("3i", creds)
+    return uid == os.getuid()
+
+
+def _listen(path: str) -> socket.socket | None:
+    """Binds the socket, None if another daemon is serving it."""
+    os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        listener.bind(path)
+    except OSError:
+        other = _connect(path)
+        if other is not None:
+            other.close()
+            listener.close()
+            return None
+        # stale socket of a daemon that died
+        os.unlink(path)
+        listener.bind(path)
+    os.chmod(path, 0o600)
+    listener.listen(16)
+    return listener
+
+
+def _child(
+    conn: socket.socket,
+    fds: list[int],
+    message: dict,
+    handler: Callable[[Sequence[str]], int],
+):
+    """Runs a request in a forked child, never returns."""
+    rc = os.EX_SOFTWARE
+    try:
+        os.setpgid(0, 0)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+        for target, fd in enumerate(fds):
+            os.dup2(fd, target)
+        os.chdir(message["cwd"])
+        os.environ.clear()
+        os.environ.update(message["env"])
+        os.umask(message.get("umask", 0o022))
+        _send(conn, {"pid": os.getpid()})
+        rc = handler(message["argv"])
+    except SystemExit as e:
+        rc = e.code if isinstance(e.code, int) else 1
+    except KeyboardInterrupt:
+        rc = 128 + signal.SIGINT
+    except BaseException as e:
+        logger.error(f"hooked daemon failed to run {message.get('argv')}: {e}")
+    finally:
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            _send(conn, {"rc": rc})
+        finally:
+            os._exit(rc)
+
+
+def _handle(
+    conn: socket.socket,
+    listener: socket.socket,
+    path: str,
+    handler: Callable[[Sequence[str]], int],
+    children: set[int],
+    warm: Callable[[], None],
+) -> bool:
+    """Serves one connection, returns True if the daemon should exit."""
+    if not _same_user(conn):
+        logger.warning("Rejected a connection of another user.")
+        return False
+    conn.settimeout(_REQUEST_TIMEOUT)
+    fds: list[int] = []
+    try:
+        _, fds, _, _ = socket.recv_fds(conn, 1, 3)
+        message = json.loads(conn.makefile("rb").readline())
+        conn.settimeout(None)
+
+        if message.get("cmd") == "stop":
+            _send(conn, {"rc": 0})
+            return True
+        if (
+            message.get("version") != __version__
+            or message.get("python") != sys.executable
+        ):
+            logger.info(f"Client of version {message.get('version')}, restarting.")
+            # let the next daemon bind while this one exits
+            os.unlink(path)
+            _send(conn, {"error": "version mismatch"})
+            return True
+        if len(fds) != 3:
+            _send(conn, {"error": "missing file descriptors"})
+            return False
+
+        warm()
+        sys.stdout.flush()
+        sys.stderr.flush()
+        pid = os.fork()
+        if pid == 0:
+            listener.close()
+            _child(conn, fds, message, handler)
+        children.add(pid)
+        logger.debug(f"Serving {' '.join(message['argv'])} in process {pid}")
+    except (OSError, ValueError, KeyError) as e:
+        logger.debug(f"Invalid request: {e}")
+    finally:
+        for fd in fds:
+            os.close(fd)
+    return False
+
+
+def _reap(children: set[int]):
+    for pid in list(children):
+        try:
+            done, _ = os.waitpid(pid, os.WNOHANG)
+        except ChildProcessError:
+            done = pid
+        if done:
+            children.discard(pid)
+
+
+def serve(
+    path: str | None = None,
+    idle_timeout: float = DEFAULT_IDLE_TIMEOUT,
+    handler: Callable[[Sequence[str]], int] | None = None,
+):
+    """
+    Serves hooked commands on a Unix socket until stopped, idle for
+    idle_timeout seconds or asked by a client of another version. Each
+    request runs in a child forked from the warm daemon. The rule set is
+    reloaded whenever one of its files changes.
+    """
+    import selectors
+
+    # started from a hook, the repository of that commit is no concern of ours
+    for name in [name for name in os.environ if name.startswith("GIT_")]:
+        del os.environ[name]
+
+    path = path or socket_path()
+    listener = _listen(path)
+    if listener is None:
+        logger.info("hooked daemon is running already.")
+        return
+    inode = os.stat(path).st_ino
+    handler = handler or _run_hooked
+
+    config_dir = get_config_dir()
+    snapshot = None
+
+    def warm():
+        nonlocal snapshot
+        current = _ruleset_snapshot(config_dir)
+        if current != snapshot:
+            logger.debug("Loading the rule set...")
+            try:
+                _warm(config_dir)
+            except Exception as e:
+                # requests still work, only slower
+                logger.warning(f"Could not load the rule set: {e}")
+            snapshot = current
+
+    stopping = False
+
+    def stop_serving(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, stop_serving)
+    children: set[int] = set()
+    last_request = time.monotonic()
+    selector = selectors.DefaultSelector()
+    selector.register(listener, selectors.EVENT_READ)
+    logger.info(f"hooked daemon {__version__} listening on {path}")
+    try:
+        warm()
+        while not stopping:
+            events = selector.select(timeout=1.0)
+            _reap(children)
+            if events:
+                conn, _ = listener.accept()
+                last_request = time.monotonic()
+                with conn:
+                    if _handle(conn, listener, path, handler, children, warm):
+                        break
+            elif not children and time.monotonic() - last_request > idle_timeout:
+                logger.info("hooked daemon idle, exiting.")
+                break
+    except KeyboardInterrupt:
+        pass
+    finally:
+        selector.close()
+        listener.close()
+        try:
+            if os.stat(path).st_ino == inode:
+                os.unlink(path)
+        except OSError:
+            pass
+
+
+if __name__ == "__main__":
+    # the rendered pre-commit shim runs the client with its own interpreter
+    sys.exit(client_main())
@@ -0,0 +1,150 @@
+#  Copyright 2025 T-Systems International GmbH
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are met:
+#
+#  1. Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#  2. Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+#
+#  3. Neither the name of the copyright holder nor the names of its
+#     contributors may be used to endorse or promote products derived from
+#     this software without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+#  DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+#  FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+#  DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+#  SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+#  CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+#  OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#  OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+from __future__ import annotations
+
+import glob
+import json
+import os
+from dataclasses import asdict, dataclass, field
+
+from hooked.library.logger import logger
+
+PENDING_FILE = "pending.json"
+
+
+@dataclass
+class DeferredConfig:
+    """Hooks of a config to run after the commit."""
+
+    # absolute path, or relative to the work tree for the repository's config
+    config: str
+    hooks: list[str]
+    env: dict[str, str] = field(default_factory=dict)
+    local: bool = False
+
+
+@dataclass
+class Deferral:
+    """Hooks deferred by the pre-commit hook, run by the post-commit hook."""
+
+    # tree of the commit the hooks were deferred for
+    tree: str
+    files: list[str]
+    configs: list[DeferredConfig]
+
+
+@dataclass
+class DeferredResult:
+    commit: str
+    passed: list[str]
+    failed: list[str]
+    # output of the hooks, only kept if some failed
+    log: str | None = None
+
+
+def deferred_dir(git_dir: str) -> str:
+    return os.path.join(git_dir, "hooked", "deferred")
+
+
+def _write_json(path: str, data: dict):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_file = f"{path}.{os.getpid()}"
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp_file, path)
+
+
+def save_deferral(git_dir: str, deferral: Deferral):
+    _write_json(os.path.join(deferred_dir(git_dir), PENDING_FILE), asdict(deferral))
+
+
+def discard_deferral(git_dir: str):
+    """Drops hooks deferred by an earlier commit attempt that didn't happen."""
+    try:
+        os.remove(os.path.join(deferred_dir(git_dir), PENDING_FILE))
+    except FileNotFoundError:
+        pass
+
+
+def claim_deferral(git_dir: str) -> Deferral | None:
+    """
+    Takes the pending deferral, so that it runs only once. Returns None if
+    there is none.
+    """
+    pending = os.path.join(deferred_dir(git_dir), PENDING_FILE)
+    claimed = f"{pending}.{os.getpid()}.claimed"
+    try:
+        os.rename(pending, claimed)
+    except FileNotFoundError:
+        return None
+    try:
+        with open(claimed, encoding="utf-8") as f:
+            data = json.load(f)
+        return Deferral(
+            tree=data["tree"],
+            files=list(data["files"]),
+            configs=[DeferredConfig(**config) for config in data["configs"]],
+        )
+    except (ValueError, KeyError, TypeError) as e:
+        logger.debug(f"Ignoring invalid deferral: {e}")
+        return None
+    finally:
+        os.remove(claimed)
+
+
+def log_file(git_dir: str, commit: str) -> str:
+    return os.path.join(deferred_dir(git_dir), f"{commit}.log")
+
+
+def save_result(git_dir: str, result: DeferredResult):
+    path = os.path.join(deferred_dir(git_dir), f"{result.commit}.json")
+    _write_json(path, asdict(result))
+
+
+def pop_results(git_dir: str) -> list[DeferredResult]:
+    """Returns the results of deferred runs that weren't reported yet."""
+    results = []
+    for path in sorted(glob.glob(os.path.join(deferred_dir(git_dir), "*.json"))):
+        if os.path.basename(path) == PENDING_FILE:
+            continue
+        try:
+            with open(path, encoding="utf-8") as f:
+                results.append(DeferredResult(**json.load(f)))
+        except (ValueError, TypeError) as e:
+            logger.debug(f"Ignoring invalid deferred result {path}: {e}")
+        except FileNotFoundError:
+            continue
+        os.remove(path)
+    return results
+
+
+def prune_logs(git_dir: str):
+    """Removes the logs of results that were already reported."""
+    for path in glob.glob(os.path.join(deferred_dir(git_dir), "*.log")):
+        if not os.path.exists(f"{path[: -len('.log')]}.json"):
+            os.remove(path)
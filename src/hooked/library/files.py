@@ -29,8 +29,9 @@ from __future__ import annotations
 
 import os
 import platform
+import shlex
 import shutil
-from importlib.resources import as_file, files
+import sys
 
 from hooked.library.logger import logger
 
@@ -61,6 +62,12 @@ def get_template_dir() -> str:
     return os.path.join(base_dir, "git_template")
 
 
+def get_cache_dir() -> str:
+    """Get the cache directory for hooked."""
+    base_dir = get_base_dir()
+    return os.path.join(base_dir, "cache")
+
+
 def _create_base_dir():
     """Create the base directory if it doesn't exist."""
     base_dir = get_base_dir()
@@ -88,6 +95,8 @@ def _create_git_template_dir():
 
 def _copy_git_hooks(git_hooks_src_path: str, git_hooks_dst_dir: str):
     """Copy git hook scripts to the git_hooks directory."""
+    from importlib.resources import as_file, files
+
     git_hooks_src_dir = files(git_hooks_src_path)
     with as_file(git_hooks_src_dir) as git_hooks_src:
         for root, _, _files in os.walk(git_hooks_src):
@@ -102,11 +111,73 @@ def _copy_git_hooks(git_hooks_src_path: str, git_hooks_dst_dir: str):
     logger.debug("Git hooks copied.")
 
 
+# characters of an excluded repository pattern taken as is by a shell case
+# pattern, anything else is escaped so only * ? and [...] are special
+_CASE_SAFE = frozenset(
+    "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789/._-+,:@%=!*?[]"
+)
+
+
+def _case_pattern(pattern: str) -> str:
+    """Quotes a glob pattern for a shell case statement."""
+    if "\n" in pattern:
+        raise ValueError(f"Invalid pattern {pattern!r}")
+    return "".join(c if c in _CASE_SAFE else "\\" + c for c in pattern)
+
+
+def _exclude_block(patterns: list[str]) -> str:
+    if not patterns:
+        return "# no excluded repositories"
+    cases = " | ".join(_case_pattern(os.path.expanduser(p)) for p in patterns)
+    return f'case "$dir" in\n  {cases}) exit 0 ;;\nesac'
+
+
+def _render_pre_commit_shim(hooks_dir: str):
+    """
+    Replaces the copied pre-commit hook with a shim that has the interpreter,
+    base dir and excluded repositories of this installation baked in.
+    """
+    from importlib.resources import files
+
+    from hooked import __version__
+    from hooked.library.ruleset import load_settings
+
+    if not sys.executable:
+        logger.debug("Interpreter unknown, keeping the generic pre-commit hook.")
+        return
+
+    settings = load_settings(get_config_dir())
+    try:
+        exclude = _exclude_block(settings.exclude_repos)
+    except ValueError as e:
+        logger.warning(f"Ignoring excluded repositories: {e}")
+        exclude = _exclude_block([])
+
+    template = files("hooked.data.shim").joinpath("pre-commit.in").read_text()
+    shim = (
+        template.replace("@VERSION@", __version__)
+        .replace("@PYTHON@", shlex.quote(os.path.abspath(sys.executable)))
+        .replace("@BASE_DIR@", shlex.quote(get_base_dir()))
+        .replace("@EXCLUDE@", exclude)
+    )
+
+    # written next to the hook and renamed, a commit running right now keeps
+    # reading the old file
+    path = os.path.join(hooks_dir, "pre-commit")
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(shim)
+    os.chmod(tmp, 0o755)
+    os.replace(tmp, path)
+    logger.debug("Pre-commit shim rendered.")
+
+
 def copy_hooked_files():
     _create_base_dir()
     _create_git_template_dir()
     _create_hooks_dir()
     _copy_git_hooks("hooked.data.git_hooks", get_hooks_dir())
+    _render_pre_commit_shim(get_hooks_dir())
     logger.debug("Git global hooks copied.")
     _copy_git_hooks("hooked.data.git_template", get_template_dir())
     logger.debug("Git template copied.")
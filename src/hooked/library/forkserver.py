@@ -0,0 +1,247 @@
+#  Copyright 2025 T-Systems International GmbH
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are met:
+#
+#  1. Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#  2. Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+#
+#  3. Neither the name of the copyright holder nor the names of its
+#     contributors may be used to endorse or promote products derived from
+#     this software without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+#  DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+#  FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+#  DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+#  SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+#  CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+#  OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#  OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import socket
+import subprocess as sp
+import threading
+from typing import Any, Callable, Collection, Sequence
+
+from hooked import __version__
+from hooked.library.logger import logger
+
+# comma separated ids of the python hooks pre-commit runs in forkservers
+FORKSERVER_HOOKS_ENV = "HOOKED_FORKSERVER_HOOKS"
+
+# returncode of a run whose answer was lost with the forkserver
+_EX_SOFTWARE = 70
+_CONNECT_TIMEOUT = 1.0
+
+# Python hooks that opt in with `forkserver: true` in .hooked.yaml run in a
+# server per pre-commit environment (data/forkserver/forkserver.py), started by
+# the environment's own interpreter with the hook's modules imported. Every run
+# is a child forked from it, so neither the interpreter nor the imports start
+# again. Inside the pre-commit worker hooked swaps pre-commit's cmd_output_b
+# and cmd_output_p while an opted-in hook runs: a console script of the hook's
+# environment goes to its server, anything else and the first run of a server
+# that is not up yet run as before.
+
+_spawned: set[str] = set()
+_spawn_lock = threading.Lock()
+
+
+def socket_path(python: str) -> str:
+    """
+    The socket of the forkserver for an interpreter, next to the daemon's. A
+    recreated environment or another hooked version gets a new server.
+    """
+    from hooked.library.daemon import socket_path as daemon_socket_path
+
+    venv = os.path.dirname(os.path.dirname(python))
+    st = os.stat(os.path.join(venv, "pyvenv.cfg"))
+    key = f"{__version__}\0{python}\0{st.st_ino}\0{st.st_mtime_ns}"
+    digest = hashlib.sha256(key.encode()).hexdigest()[:16]
+    return os.path.join(
+        os.path.dirname(daemon_socket_path()), f"forkserver-{digest}.sock"
+    )
+
+
+def server_script() -> str:
+    from importlib.resources import files
+
+    return str(files("hooked.data.forkserver").joinpath("forkserver.py"))
+
+
+def _connect(path: str) -> socket.socket | None:
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.settimeout(_CONNECT_TIMEOUT)
+        sock.connect(path)
+    except OSError:
+        sock.close()
+        return None
+    sock.settimeout(None)
+    return sock
+
+
+def _umask() -> int:
+    umask = os.umask(0o022)
+    os.umask(umask)
+    return umask
+
+
+def spawn(python: str, path: str, scripts: Sequence[str]):
+    """Starts a forkserver in the background, once per process and socket."""
+    from hooked.library.daemon import DEFAULT_IDLE_TIMEOUT
+    from hooked.library.env import env_float
+    from hooked.library.git import without_hook_env
+
+    with _spawn_lock:
+        if path in _spawned:
+            return
+        _spawned.add(path)
+    idle_timeout = env_float("HOOKED_DAEMON_IDLE_TIMEOUT", DEFAULT_IDLE_TIMEOUT)
+    logger.debug(f"Starting forkserver for {python} at {path}.")
+    try:
+        sp.Popen(
+            [python, server_script(), path, str(idle_timeout), *scripts],
+            stdin=sp.DEVNULL,
+            stdout=sp.DEVNULL,
+            stderr=sp.DEVNULL,
+            cwd="/",
+            env=without_hook_env(os.environ),
+            start_new_session=True,
+        )
+    except OSError as e:
+        logger.debug(f"Could not start forkserver for {python}: {e}")
+
+
+def _output_fds(color: bool) -> tuple[int, int]:
+    """A pty like pre-commit uses for color, a pipe otherwise."""
+    if not color:
+        return os.pipe()
+    import termios
+
+    r, w = os.openpty()
+    # tty flags normally change \n to \r\n
+    attrs = termios.tcgetattr(w)
+    attrs[1] &= ~(termios.ONLCR | termios.OPOST)
+    termios.tcsetattr(w, termios.TCSANOW, attrs)
+    return r, w
+
+
+def _read_all(fd: int) -> bytes:
+    chunks = []
+    while True:
+        try:
+            chunk = os.read(fd, 65536)
+        except OSError:
+            # EIO once the last writer of a pty closed it
+            break
+        if not chunk:
+            break
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+def run(cmd: Sequence[str], color: bool = False) -> tuple[int, bytes] | None:
+    """
+    Runs `python script args...` in the forkserver of the interpreter, with
+    stdout and stderr combined. Returns the returncode and the output, or None
+    if no forkserver serves it yet and the command has to run as usual.
+    """
+    python, argv = cmd[0], list(cmd[1:])
+    try:
+        path = socket_path(python)
+    except OSError:
+        return None
+    sock = _connect(path)
+    if sock is None:
+        spawn(python, path, [os.path.basename(argv[0])])
+        return None
+    with sock:
+        r, w = _output_fds(color)
+        try:
+            socket.send_fds(sock, [b"\0"], [w])
+            os.close(w)
+            w = -1
+            sock.sendall(
+                json.dumps(
+                    {
+                        "argv": argv,
+                        "cwd": os.getcwd(),
+                        "env": dict(os.environ),
+                        "umask": _umask(),
+                    }
+                ).encode()
+                + b"\n"
+            )
+        except OSError as e:
+            logger.debug(f"Forkserver at {path} unavailable: {e}")
+            os.close(r)
+            if w != -1:
+                os.close(w)
+            return None
+        try:
+            out = _read_all(r)
+        finally:
+            os.close(r)
+        line = sock.makefile("rb").readline()
+    try:
+        return int(json.loads(line)["rc"]), out
+    except (ValueError, KeyError):
+        logger.debug(f"Forkserver at {path} died running {argv!r}")
+        return _EX_SOFTWARE, out
+
+
+def _console_script(cmd: Sequence[str]) -> bool:
+    """Whether cmd runs a console script with the active environment's python."""
+    venv = os.getenv("VIRTUAL_ENV")
+    if not venv or len(cmd) < 2:
+        return False
+    bin_dir = os.path.join(venv, "bin")
+    return (
+        os.path.dirname(cmd[0]) == bin_dir
+        and os.path.basename(cmd[0]).startswith("python")
+        and os.path.dirname(cmd[1]) == bin_dir
+    )
+
+
+def _forked(original: Callable[..., Any], color: bool) -> Callable[..., Any]:
+    def cmd_output(*cmd: str, check: bool = True, **kwargs: Any):
+        if not check and kwargs == {"stderr": sp.STDOUT} and _console_script(cmd):
+            result = run(cmd, color)
+            if result is not None:
+                return (*result, None)
+        return original(*cmd, check=check, **kwargs)
+
+    return cmd_output
+
+
+def patch_pre_commit(hook_ids: Collection[str]):
+    """Makes pre-commit run the given python hooks in forkservers."""
+    from pre_commit import xargs
+    from pre_commit.commands import run as run_command
+
+    run_single_hook = run_command._run_single_hook
+
+    def _run_single_hook(classifier, hook, *args, **kwargs):
+        if hook.id not in hook_ids or hook.language != "python":
+            return run_single_hook(classifier, hook, *args, **kwargs)
+        cmd_output_b, cmd_output_p = xargs.cmd_output_b, xargs.cmd_output_p
+        xargs.cmd_output_b = _forked(cmd_output_b, color=False)
+        xargs.cmd_output_p = _forked(cmd_output_p, color=True)
+        try:
+            return run_single_hook(classifier, hook, *args, **kwargs)
+        finally:
+            xargs.cmd_output_b, xargs.cmd_output_p = cmd_output_b, cmd_output_p
+
+    run_command._run_single_hook = _run_single_hook
@@ -27,9 +27,18 @@
 
 from __future__ import annotations
 
-from hooked.library.cmd_util import CommandError, run_cmd
+import os
+import subprocess as sp
+import threading
+from dataclasses import dataclass
+from typing import Iterable, Iterator, Mapping
+
+from hooked.library.cmd_util import CommandError, CommandResult, iter_records, run_cmd
 from hooked.library.logger import logger
 
+# set by git for its hooks, they would point git at the wrong repository
+GIT_HOOK_ENV = ("GIT_DIR", "GIT_INDEX_FILE", "GIT_WORK_TREE", "GIT_PREFIX")
+
 
 def git_set_global_hook_path(hooks_dir: str):
     """Set the global git hooks path to the specified directory."""
@@ -121,3 +130,384 @@ def is_git_repo(dir: str) -> bool:
         if "not a git repository" in str(e.result.stderr):
             return False
         raise
+
+
+@dataclass(frozen=True)
+class StagedEntry:
+    """A file staged for commit as reported by `git diff --cached --raw`."""
+
+    path: str
+    mode: str
+    sha: str
+    status: str
+
+
+def _parse_raw_records(records: Iterator[bytes]) -> Iterator[StagedEntry]:
+    """Parses the NUL separated records of `git diff --raw -z`."""
+    for meta in records:
+        if not meta:
+            continue
+        # :old_mode new_mode old_sha new_sha status
+        _, mode, _, sha, status = meta.decode().lstrip(":").split(" ")
+        path = next(records)
+        if status[0] in "RC":
+            # renames and copies report the source path first
+            path = next(records)
+        yield StagedEntry(os.fsdecode(path), mode, sha, status[0])
+
+
+def git_staged_entries(
+    cwd: str, env: Mapping[str, str] | None = None
+) -> list[StagedEntry]:
+    """
+    Returns added and modified entries of the index, a renamed file is
+    reported as added under its new path.
+    """
+    records = iter_records(
+        [
+            "git",
+            "diff",
+            "--cached",
+            "--raw",
+            "-z",
+            "--no-abbrev",
+            "--no-renames",
+            "--diff-filter",
+            "AM",
+        ],
+        cwd=cwd,
+        env=env,
+    )
+    return list(_parse_raw_records(records))
+
+
+def git_staged_changes(cwd: str) -> list[StagedEntry]:
+    """
+    Returns all entries of the index that differ from HEAD except deletions,
+    renames are reported as additions of the new path.
+    """
+    records = iter_records(
+        [
+            "git",
+            "diff",
+            "--cached",
+            "--raw",
+            "-z",
+            "--no-abbrev",
+            "--no-renames",
+            "--diff-filter",
+            "d",
+        ],
+        cwd=cwd,
+    )
+    return list(_parse_raw_records(records))
+
+
+# Blobs up to this size are read into a buffer that is reused for the next
+# blob, larger ones into a buffer of their own.
+_REUSE_MAX = 1 << 20
+# readers kept open by git_object_reader, e.g. in a daemon serving many repos
+_MAX_READERS = 8
+
+
+class GitObjectReader:
+    """
+    Reads objects of a repository through long-lived `git cat-file --batch`
+    and `git cat-file --batch-check` processes. All object IDs of a request
+    are written by a thread while the replies are read, so git never waits
+    for the next ID and requests don't wait for git to start.
+    """
+
+    def __init__(self, cwd: str, env: Mapping[str, str] | None = None):
+        self.cwd = cwd
+        self.env = env
+        self._pid = os.getpid()
+        self._procs: dict[str, sp.Popen] = {}
+        self._lock = threading.Lock()
+        self._buffer = bytearray()
+
+    def _check_fork(self):
+        if self._pid != os.getpid():
+            # forked, the processes and their pipes belong to the parent
+            self._pid = os.getpid()
+            self._procs = {}
+            self._lock = threading.Lock()
+
+    def _process(self, mode: str) -> sp.Popen:
+        p = self._procs.get(mode)
+        if p is None or p.poll() is not None:
+            p = sp.Popen(
+                ["git", "cat-file", mode],
+                cwd=self.cwd,
+                env=self.env,
+                stdin=sp.PIPE,
+                stdout=sp.PIPE,
+                stderr=sp.DEVNULL,
+            )
+            self._procs[mode] = p
+        return p
+
+    def _discard(self, mode: str):
+        """Stops a process whose replies are out of step with the requests."""
+        p = self._procs.pop(mode, None)
+        if p is not None:
+            p.kill()
+            p.wait()
+            _close(p)
+
+    @staticmethod
+    def _request(p: sp.Popen, shas: list[str]) -> threading.Thread:
+        def feed(stdin=p.stdin, data="".join(f"{sha}\n" for sha in shas).encode()):
+            try:
+                stdin.write(data)
+                stdin.flush()
+            except (OSError, ValueError):
+                # git was stopped, the reader reports why
+                pass
+
+        writer = threading.Thread(target=feed, daemon=True)
+        writer.start()
+        return writer
+
+    def info(self, shas: Iterable[str]) -> list[tuple[str, int] | None]:
+        """
+        Returns the type and size of each object, None for missing objects.
+
+        Raises:
+            CommandError: If git fails.
+        """
+        shas = list(shas)
+        self._check_fork()
+        with self._lock:
+            p = self._process("--batch-check")
+            assert p.stdout is not None
+            writer = self._request(p, shas)
+            complete = False
+            try:
+                result: list[tuple[str, int] | None] = []
+                for _ in shas:
+                    header = p.stdout.readline()
+                    fields = header.split()
+                    if len(fields) == 3:
+                        result.append((fields[1].decode(), int(fields[2])))
+                    elif len(fields) == 2 and fields[1] == b"missing":
+                        result.append(None)
+                    else:
+                        raise _cat_file_error("--batch-check", header)
+                complete = True
+                return result
+            finally:
+                if not complete:
+                    self._discard("--batch-check")
+                writer.join()
+
+    def contents(self, shas: Iterable[str]) -> Iterator[memoryview]:
+        """
+        Streams the content of objects in the given order. Each view is only
+        valid until the next one is requested, copy what has to outlive it.
+        Stopping early restarts git on the next request.
+
+        Raises:
+            CommandError: If an object is missing or git fails.
+        """
+        shas = list(shas)
+        self._check_fork()
+        with self._lock:
+            p = self._process("--batch")
+            assert p.stdout is not None
+            writer = self._request(p, shas)
+            complete = False
+            try:
+                for _ in shas:
+                    header = p.stdout.readline()
+                    fields = header.split()
+                    if len(fields) != 3:
+                        raise _cat_file_error("--batch", header)
+                    size = int(fields[2])
+                    if size > _REUSE_MAX:
+                        view = memoryview(bytearray(size))
+                    else:
+                        if len(self._buffer) < size:
+                            self._buffer = bytearray(max(size, 2 * len(self._buffer)))
+                        view = memoryview(self._buffer)[:size]
+                    rest = view
+                    while rest:
+                        n = p.stdout.readinto(rest)
+                        if not n:
+                            raise _cat_file_error("--batch", b"")
+                        rest = rest[n:]
+                    p.stdout.read(1)
+                    yield view
+                complete = True
+            finally:
+                if not complete:
+                    self._discard("--batch")
+                writer.join()
+
+    def close(self):
+        """Lets the git processes exit."""
+        self._check_fork()
+        with self._lock:
+            for mode, p in list(self._procs.items()):
+                try:
+                    _close(p)
+                    p.wait(timeout=5)
+                except sp.TimeoutExpired:
+                    self._discard(mode)
+            self._procs = {}
+
+
+def _close(p: sp.Popen):
+    for stream in (p.stdin, p.stdout):
+        if stream is not None:
+            try:
+                stream.close()
+            except OSError:
+                pass
+
+
+def _cat_file_error(mode: str, header: bytes) -> CommandError:
+    reason = header.decode(errors="replace").strip() or "git exited"
+    return CommandError(CommandResult(["git", "cat-file", mode], 1, None, reason))
+
+
+_readers: dict[str, GitObjectReader] = {}
+_close_at_exit = False
+
+
+def git_object_reader(cwd: str) -> GitObjectReader:
+    """
+    Returns the object reader shared by everything reading objects of the
+    repository at cwd in this process. Readers are closed at exit.
+    """
+    global _close_at_exit
+    key = os.path.realpath(cwd)
+    reader = _readers.pop(key, None)
+    if reader is None:
+        if not _close_at_exit:
+            import atexit
+
+            atexit.register(close_object_readers)
+            _close_at_exit = True
+        reader = GitObjectReader(key)
+        while len(_readers) >= _MAX_READERS:
+            _readers.pop(next(iter(_readers))).close()
+    # most recently used last
+    _readers[key] = reader
+    return reader
+
+
+def close_object_readers():
+    """Closes the readers returned by git_object_reader."""
+    while _readers:
+        _readers.popitem()[1].close()
+
+
+def git_unstaged_files(cwd: str) -> set[str]:
+    """Returns paths whose working tree content differs from the index."""
+    records = iter_records(["git", "diff", "--name-only", "-z"], cwd=cwd)
+    return {os.fsdecode(path) for path in records if path}
+
+
+def git_staged_patch(cwd: str) -> Iterator[bytes]:
+    """
+    Streams the lines of the staged changes as a patch without context and
+    without a/ b/ path prefixes, for the files of git_staged_entries: a
+    renamed file is added as a whole under its new path.
+    """
+    return iter_records(
+        [
+            "git",
+            "diff",
+            "--cached",
+            "--unified=0",
+            "--no-prefix",
+            "--no-color",
+            "--no-ext-diff",
+            "--no-textconv",
+            "--no-renames",
+            "--diff-filter",
+            "AM",
+        ],
+        sep=b"\n",
+        cwd=cwd,
+    )
+
+
+def git_write_tree(cwd: str, env: Mapping[str, str] | None = None) -> str:
+    """Writes the index as a tree object and returns its ID."""
+    return str(run_cmd(["git", "write-tree"], cwd=cwd, env=env).stdout)
+
+
+def git_head(cwd: str) -> tuple[str, str]:
+    """Returns the commit and the symbolic ref of HEAD, empty if unborn."""
+    try:
+        stdout = run_cmd(
+            ["git", "rev-parse", "HEAD", "--symbolic-full-name", "HEAD"], cwd=cwd
+        ).stdout
+    except CommandError:
+        return "", ""
+    sha, _, ref = str(stdout).partition("\n")
+    return sha, ref
+
+
+def git_dir(cwd: str) -> str:
+    """Returns the absolute path of the repository's git directory."""
+    return str(run_cmd(["git", "rev-parse", "--absolute-git-dir"], cwd=cwd).stdout)
+
+
+def without_hook_env(env: Mapping[str, str]) -> dict[str, str]:
+    """Returns a copy of env without the variables git sets for its hooks."""
+    return {k: v for k, v in env.items() if k not in GIT_HOOK_ENV}
+
+
+def git_path(cwd: str, name: str) -> str:
+    """Returns the absolute path of a file in the git directory, e.g. objects."""
+    path = str(run_cmd(["git", "rev-parse", "--git-path", name], cwd=cwd).stdout)
+    return os.path.abspath(os.path.join(cwd, path))
+
+
+def git_tree_files(cwd: str, tree: str) -> list[str]:
+    """Returns the paths of the files directly in a tree, without subtrees."""
+    records = iter_records(["git", "ls-tree", "-z", tree], cwd=cwd)
+    files = []
+    for record in records:
+        if not record:
+            continue
+        meta, _, path = record.partition(b"\t")
+        if meta.split(b" ")[1] == b"blob":
+            files.append(os.fsdecode(path))
+    return files
+
+
+def git_rev_parse(cwd: str, *revs: str) -> list[str]:
+    """Returns the object IDs of the given revisions."""
+    stdout = run_cmd(["git", "rev-parse", *revs], cwd=cwd).stdout
+    return str(stdout).split()
+
+
+def git_worktree_add(
+    cwd: str, path: str, commit: str, env: Mapping[str, str] | None = None
+):
+    """Checks out a commit into a new, detached work tree."""
+    run_cmd(
+        ["git", "worktree", "add", "--detach", "--quiet", path, commit],
+        cwd=cwd,
+        env=env,
+    )
+
+
+def git_worktree_remove(cwd: str, path: str, env: Mapping[str, str] | None = None):
+    """Removes a work tree, or forgets about it if it's gone already."""
+    try:
+        run_cmd(["git", "worktree", "remove", "--force", path], cwd=cwd, env=env)
+    except CommandError:
+        run_cmd(["git", "worktree", "prune"], cwd=cwd, env=env)
+
+
+def git_reachable_objects(cwd: str, revs: list[str]) -> set[str]:
+    """Returns the IDs of all objects reachable from the given revisions."""
+    stdout = run_cmd(
+        ["git", "rev-list", "--objects", "--no-object-names", *revs], cwd=cwd
+    ).stdout
+    return set(str(stdout or "").split())
@@ -0,0 +1,633 @@
+#  Copyright 2025 T-Systems International GmbH
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are met:
+#
+#  1. Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#  2. Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+#
+#  3. Neither the name of the copyright holder nor the names of its
+#     contributors may be used to endorse or promote products derived from
+#     this software without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+#  DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+#  FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+#  DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+#  SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+#  CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+#  OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#  OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+from __future__ import annotations
+
+import bisect
+import mmap
+import os
+import struct
+import zlib
+from dataclasses import dataclass
+from typing import Mapping
+
+from hooked.library.env import env_flag
+from hooked.library.git import StagedEntry, git_staged_entries
+from hooked.library.logger import logger
+
+# Reads what `git diff --cached --raw --no-renames --diff-filter AM` reports
+# straight from the index and the object database, without starting git.
+# Directories whose tree in the index's cache tree (the TREE extension) is the
+# one of HEAD are skipped without reading their objects, so the usual commit
+# of a few files reads a handful of trees. Anything the reader doesn't know,
+# like a split or sparse index, reftable refs or SHA-256 repositories, raises
+# UnsupportedRepository and staged_entries() asks git instead.
+
+NATIVE_INDEX_ENV = "HOOKED_NATIVE_INDEX"
+
+_HEADER = struct.Struct(">4sII")  # signature, version, entries
+# ctime, mtime, dev, ino, mode, uid, gid, size, sha, flags
+_ENTRY = struct.Struct(">8x8x4x4xI4x4x4x20sH")
+_EXTENSION = struct.Struct(">4sI")
+_SHA_SIZE = 20
+
+_FLAG_EXTENDED = 0x4000
+_FLAG_STAGE = 0x3000
+_FLAG_NAME_LENGTH = 0x0FFF
+_EXTENDED_INTENT_TO_ADD = 0x2000
+
+# object types of pack entries
+_OBJ_TYPES = {1: b"commit", 2: b"tree", 3: b"blob", 4: b"tag"}
+_OFS_DELTA = 6
+_REF_DELTA = 7
+
+_TREE_MODE = 0o040000
+_MAX_SYMREFS = 5
+_MAX_ALTERNATES = 5
+
+
+class UnsupportedRepository(Exception):
+    """The repository uses a feature the native reader doesn't read."""
+
+
+@dataclass(frozen=True)
+class IndexEntry:
+    path: bytes
+    mode: int
+    sha: bytes
+    stage: int
+    intent_to_add: bool
+
+
+def _read_varint(data: bytes | mmap.mmap, pos: int) -> tuple[int, int]:
+    """The offset encoding of index v4 and ofs-delta, returns (value, pos)."""
+    byte = data[pos]
+    pos += 1
+    value = byte & 0x7F
+    while byte & 0x80:
+        byte = data[pos]
+        pos += 1
+        value = ((value + 1) << 7) | (byte & 0x7F)
+    return value, pos
+
+
+def _parse_cache_tree(data: bytes) -> dict[bytes, bytes]:
+    """The valid trees of the TREE extension by directory, b"" for the root."""
+    trees = {}
+    pos = 0
+    # (path of the directory, subtrees left) of the directories being listed
+    stack: list[list] = []
+    while pos < len(data):
+        end = data.index(b"\0", pos)
+        name = data[pos:end]
+        pos = end + 1
+        end = data.index(b"\n", pos)
+        count, subtrees = data[pos:end].split(b" ")
+        pos = end + 1
+        while stack and stack[-1][1] == 0:
+            stack.pop()
+        if stack:
+            stack[-1][1] -= 1
+            parent = stack[-1][0]
+            path = parent + b"/" + name if parent else name
+        else:
+            path = name
+        if int(count) >= 0:
+            trees[path] = data[pos : pos + _SHA_SIZE]
+            pos += _SHA_SIZE
+        stack.append([path, int(subtrees)])
+    return trees
+
+
+def read_index(path: str) -> tuple[list[IndexEntry], dict[bytes, bytes]]:
+    """
+    Reads the entries of an index file, in index order, and its cache tree.
+
+    Raises:
+        UnsupportedRepository: For index versions and required extensions
+            the reader doesn't know.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    signature, version, count = _HEADER.unpack_from(data, 0)
+    if signature != b"DIRC" or version not in (2, 3, 4):
+        raise UnsupportedRepository(f"index version {version}")
+    pos = _HEADER.size
+    entries = []
+    previous = b""
+    for _ in range(count):
+        start = pos
+        mode, sha, flags = _ENTRY.unpack_from(data, pos)
+        pos += _ENTRY.size
+        extended = 0
+        if flags & _FLAG_EXTENDED:
+            (extended,) = struct.unpack_from(">H", data, pos)
+            pos += 2
+        if version == 4:
+            strip, pos = _read_varint(data, pos)
+            end = data.index(b"\0", pos)
+            name = previous[: len(previous) - strip] + data[pos:end]
+            pos = end + 1
+        else:
+            length = flags & _FLAG_NAME_LENGTH
+            if length < _FLAG_NAME_LENGTH:
+                end = pos + length
+            else:
+                end = data.index(b"\0", pos)
+            name = data[pos:end]
+            # entries are padded with 1-8 NULs to a multiple of 8 bytes
+            pos = start + ((end - start + 8) & ~7)
+        previous = name
+        entries.append(
+            IndexEntry(
+                name,
+                mode,
+                sha,
+                (flags & _FLAG_STAGE) >> 12,
+                bool(extended & _EXTENDED_INTENT_TO_ADD),
+            )
+        )
+
+    cache_tree: dict[bytes, bytes] = {}
+    end = len(data) - _SHA_SIZE
+    while pos + _EXTENSION.size <= end:
+        signature, size = _EXTENSION.unpack_from(data, pos)
+        pos += _EXTENSION.size
+        if signature == b"TREE":
+            cache_tree = _parse_cache_tree(data[pos : pos + size])
+        elif not b"A" <= signature[:1] <= b"Z":
+            # e.g. link (split index) or sdir (sparse index)
+            raise UnsupportedRepository(f"index extension {signature!r}")
+        pos += size
+    return entries, cache_tree
+
+
+def _apply_delta(base: bytes, delta: bytes) -> bytes:
+    pos = 0
+    for _ in range(2):
+        # source and target size, little endian base 128
+        while delta[pos] & 0x80:
+            pos += 1
+        pos += 1
+    out = bytearray()
+    while pos < len(delta):
+        op = delta[pos]
+        pos += 1
+        if op & 0x80:
+            offset = size = 0
+            for i in range(4):
+                if op & (1 << i):
+                    offset |= delta[pos] << (8 * i)
+                    pos += 1
+            for i in range(3):
+                if op & (0x10 << i):
+                    size |= delta[pos] << (8 * i)
+                    pos += 1
+            out += base[offset : offset + (size or 0x10000)]
+        elif op:
+            out += delta[pos : pos + op]
+            pos += op
+        else:
+            raise ValueError("invalid delta opcode")
+    return bytes(out)
+
+
+class _Pack:
+    """A pack and its version 2 index, both memory-mapped."""
+
+    def __init__(self, idx_path: str):
+        with open(idx_path, "rb") as f:
+            self._idx = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._idx[:8] != b"\377tOc\0\0\0\2":
+            raise UnsupportedRepository(f"pack index version of {idx_path}")
+        with open(idx_path[: -len(".idx")] + ".pack", "rb") as f:
+            self._pack = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._fanout = struct.unpack_from(">256I", self._idx, 8)
+        self._count = self._fanout[255]
+        self._names = 8 + 256 * 4
+        self._offsets = self._names + self._count * (_SHA_SIZE + 4)
+
+    def _sha(self, i: int) -> bytes:
+        start = self._names + i * _SHA_SIZE
+        return self._idx[start : start + _SHA_SIZE]
+
+    def offset(self, sha: bytes) -> int | None:
+        """The offset of an object in the pack, None if it isn't in it."""
+        lo = self._fanout[sha[0] - 1] if sha[0] else 0
+        hi = self._fanout[sha[0]]
+        while lo < hi:
+            mid = (lo + hi) // 2
+            found = self._sha(mid)
+            if found == sha:
+                (offset,) = struct.unpack_from(">I", self._idx, self._offsets + mid * 4)
+                if offset & 0x80000000:
+                    large = self._offsets + self._count * 4
+                    large += (offset & 0x7FFFFFFF) * 8
+                    (offset,) = struct.unpack_from(">Q", self._idx, large)
+                return offset
+            if found < sha:
+                lo = mid + 1
+            else:
+                hi = mid
+        return None
+
+    def _inflate(self, pos: int, size: int) -> bytes:
+        inflater = zlib.decompressobj()
+        chunks = []
+        view = memoryview(self._pack)
+        try:
+            while not inflater.eof:
+                chunk = view[pos : pos + 65536]
+                if not chunk:
+                    raise ValueError("truncated pack")
+                chunks.append(inflater.decompress(chunk))
+                pos += len(chunk)
+        finally:
+            view.release()
+        data = b"".join(chunks)
+        if len(data) != size:
+            raise ValueError("corrupt pack entry")
+        return data
+
+    def read(self, offset: int, store: ObjectStore) -> tuple[bytes, bytes]:
+        """The type and content of the object at offset, resolving deltas."""
+        deltas = []
+        while True:
+            byte = self._pack[offset]
+            kind = (byte >> 4) & 7
+            size = byte & 0x0F
+            shift = 4
+            pos = offset + 1
+            while byte & 0x80:
+                byte = self._pack[pos]
+                pos += 1
+                size |= (byte & 0x7F) << shift
+                shift += 7
+            if kind == _OFS_DELTA:
+                distance, pos = _read_varint(self._pack, pos)
+                deltas.append(self._inflate(pos, size))
+                offset -= distance
+            elif kind == _REF_DELTA:
+                base = self._pack[pos : pos + _SHA_SIZE]
+                deltas.append(self._inflate(pos + _SHA_SIZE, size))
+                kind_name, data = store.read(base)
+                break
+            elif kind in _OBJ_TYPES:
+                kind_name, data = _OBJ_TYPES[kind], self._inflate(pos, size)
+                break
+            else:
+                raise ValueError(f"unknown pack object type {kind}")
+        for delta in reversed(deltas):
+            data = _apply_delta(data, delta)
+        return kind_name, data
+
+    def close(self):
+        self._idx.close()
+        self._pack.close()
+
+
+class ObjectStore:
+    """Reads objects from loose files and packs, including alternates."""
+
+    def __init__(self, objects_dir: str):
+        self._dirs = self._with_alternates(objects_dir)
+        self._packs: list[_Pack] | None = None
+
+    @staticmethod
+    def _with_alternates(objects_dir: str) -> list[str]:
+        dirs = [objects_dir]
+        for directory in dirs:
+            if len(dirs) > _MAX_ALTERNATES:
+                break
+            try:
+                with open(os.path.join(directory, "info", "alternates"), "rb") as f:
+                    lines = f.read().splitlines()
+            except FileNotFoundError:
+                continue
+            for line in lines:
+                line = line.strip()
+                if not line or line.startswith(b"#"):
+                    continue
+                if line.startswith(b'"'):
+                    raise UnsupportedRepository("quoted alternates")
+                path = os.path.join(directory, os.fsdecode(line))
+                dirs.append(os.path.normpath(path))
+        return dirs
+
+    def _load_packs(self) -> list[_Pack]:
+        if self._packs is None:
+            self._packs = []
+            for directory in self._dirs:
+                pack_dir = os.path.join(directory, "pack")
+                try:
+                    names = sorted(os.listdir(pack_dir))
+                except FileNotFoundError:
+                    continue
+                for name in names:
+                    if name.endswith(".idx"):
+                        self._packs.append(_Pack(os.path.join(pack_dir, name)))
+        return self._packs
+
+    def read(self, sha: bytes) -> tuple[bytes, bytes]:
+        """
+        The type and content of an object.
+
+        Raises:
+            KeyError: If the object doesn't exist.
+        """
+        hex_sha = sha.hex()
+        for directory in self._dirs:
+            try:
+                with open(os.path.join(directory, hex_sha[:2], hex_sha[2:]), "rb") as f:
+                    raw = zlib.decompress(f.read())
+            except FileNotFoundError:
+                continue
+            header, _, data = raw.partition(b"\0")
+            kind, _, _ = header.partition(b" ")
+            return kind, data
+        for pack in self._load_packs():
+            offset = pack.offset(sha)
+            if offset is not None:
+                return pack.read(offset, self)
+        raise KeyError(hex_sha)
+
+    def read_tree(self, sha: bytes) -> list[tuple[bytes, int, bytes]]:
+        """The (name, mode, sha) entries of a tree object."""
+        kind, data = self.read(sha)
+        if kind != b"tree":
+            raise ValueError(f"{sha.hex()} is a {kind.decode()}, not a tree")
+        entries = []
+        pos = 0
+        while pos < len(data):
+            space = data.index(b" ", pos)
+            end = data.index(b"\0", space)
+            mode = int(data[pos:space], 8)
+            entries.append(
+                (data[space + 1 : end], mode, data[end + 1 : end + 1 + _SHA_SIZE])
+            )
+            pos = end + 1 + _SHA_SIZE
+        return entries
+
+    def close(self):
+        for pack in self._packs or []:
+            pack.close()
+        self._packs = None
+
+    def __enter__(self) -> ObjectStore:
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+@dataclass(frozen=True)
+class Repository:
+    """The files of a repository the reader looks at."""
+
+    git_dir: str
+    common_dir: str
+    index_file: str
+    objects_dir: str
+
+
+def find_repository(cwd: str, env: Mapping[str, str] | None = None) -> Repository:
+    """
+    Locates the git directory of cwd like git does, honoring GIT_DIR,
+    GIT_INDEX_FILE and GIT_OBJECT_DIRECTORY as set for hooks.
+
+    Raises:
+        UnsupportedRepository: If cwd is not in a repository the reader can
+            read.
+    """
+    env = os.environ if env is None else env
+    cwd = os.path.abspath(cwd)
+    git_dir = env.get("GIT_DIR")
+    if git_dir:
+        git_dir = os.path.join(cwd, git_dir)
+    else:
+        directory = cwd
+        while True:
+            dot_git = os.path.join(directory, ".git")
+            if os.path.isdir(dot_git):
+                git_dir = dot_git
+                break
+            if os.path.isfile(dot_git):
+                with open(dot_git, encoding="utf-8") as f:
+                    content = f.read().strip()
+                if not content.startswith("gitdir: "):
+                    raise UnsupportedRepository(f"invalid {dot_git}")
+                git_dir = os.path.join(directory, content[len("gitdir: ") :])
+                break
+            parent = os.path.dirname(directory)
+            if parent == directory:
+                raise UnsupportedRepository(f"no repository at {cwd}")
+            directory = parent
+    if env.get("GIT_ALTERNATE_OBJECT_DIRECTORIES") or env.get("GIT_COMMON_DIR"):
+        raise UnsupportedRepository("git directory set up by the environment")
+
+    common_dir = git_dir
+    try:
+        with open(os.path.join(git_dir, "commondir"), encoding="utf-8") as f:
+            common_dir = os.path.join(git_dir, f.read().strip())
+    except FileNotFoundError:
+        pass
+    _check_extensions(common_dir)
+
+    index_file = env.get("GIT_INDEX_FILE")
+    index_file = os.path.join(cwd, index_file) if index_file else None
+    objects_dir = env.get("GIT_OBJECT_DIRECTORY")
+    objects_dir = os.path.join(cwd, objects_dir) if objects_dir else None
+    return Repository(
+        git_dir=os.path.normpath(git_dir),
+        common_dir=os.path.normpath(common_dir),
+        index_file=index_file or os.path.join(git_dir, "index"),
+        objects_dir=objects_dir or os.path.join(common_dir, "objects"),
+    )
+
+
+def _check_extensions(common_dir: str):
+    """Refuses repositories with another object format or ref storage."""
+    with open(os.path.join(common_dir, "config"), "rb") as f:
+        lines = f.read().splitlines()
+    section = b""
+    for line in lines:
+        line = line.split(b"#", 1)[0].split(b";", 1)[0].strip().lower()
+        if line.startswith(b"["):
+            section = line.strip(b"[]").strip()
+            continue
+        key, _, value = line.partition(b"=")
+        if section != b"extensions":
+            continue
+        key, value = key.strip(), value.strip().strip(b'"')
+        if key == b"objectformat" and value != b"sha1":
+            raise UnsupportedRepository(f"object format {value.decode()}")
+        if key == b"refstorage" and value != b"files":
+            raise UnsupportedRepository(f"ref storage {value.decode()}")
+
+
+def _read_ref(repo: Repository, ref: str) -> str | None:
+    for directory in (repo.git_dir, repo.common_dir):
+        try:
+            with open(os.path.join(directory, ref), encoding="utf-8") as f:
+                return f.read().strip()
+        except (FileNotFoundError, NotADirectoryError, IsADirectoryError):
+            continue
+    try:
+        with open(os.path.join(repo.common_dir, "packed-refs"), "rb") as f:
+            for line in f:
+                if line.startswith((b"#", b"^")):
+                    continue
+                sha, _, name = line.rstrip(b"\n").partition(b" ")
+                if name == ref.encode():
+                    return sha.decode()
+    except FileNotFoundError:
+        pass
+    return None
+
+
+def head_commit(repo: Repository) -> bytes | None:
+    """The commit HEAD points to, None on an unborn branch."""
+    value = _read_ref(repo, "HEAD")
+    for _ in range(_MAX_SYMREFS):
+        if value is None:
+            return None
+        if not value.startswith("ref: "):
+            return bytes.fromhex(value)
+        value = _read_ref(repo, value[len("ref: ") :])
+    raise UnsupportedRepository("symbolic ref loop")
+
+
+def _commit_tree(store: ObjectStore, commit: bytes) -> bytes:
+    kind, data = store.read(commit)
+    if kind != b"commit" or not data.startswith(b"tree "):
+        raise ValueError(f"{commit.hex()} is not a commit")
+    return bytes.fromhex(data[5 : 5 + 2 * _SHA_SIZE].decode())
+
+
+def _kind(mode: int) -> int:
+    return mode >> 12
+
+
+def _changes(
+    store: ObjectStore,
+    entries: list[IndexEntry],
+    paths: list[bytes],
+    cache_tree: dict[bytes, bytes],
+    tree: bytes | None,
+    prefix: bytes,
+    lo: int,
+    hi: int,
+    out: list[StagedEntry],
+):
+    """Compares the index entries lo:hi below prefix with the tree."""
+    files: dict[bytes, tuple[int, bytes]] = {}
+    dirs: dict[bytes, bytes] = {}
+    if tree is not None:
+        for name, mode, sha in store.read_tree(tree):
+            if mode == _TREE_MODE:
+                dirs[name] = sha
+            else:
+                files[name] = (mode, sha)
+
+    i = lo
+    while i < hi:
+        entry = entries[i]
+        rel = entry.path[len(prefix) :]
+        slash = rel.find(b"/")
+        if slash >= 0:
+            name = rel[:slash]
+            sub_prefix = prefix + name + b"/"
+            # the entries below a directory are next to each other in the index
+            end = bisect.bisect_left(paths, sub_prefix[:-1] + b"0", i, hi)
+            subtree = dirs.get(name)
+            if subtree is None or cache_tree.get(sub_prefix[:-1]) != subtree:
+                _changes(
+                    store, entries, paths, cache_tree, subtree, sub_prefix, i, end, out
+                )
+            i = end
+            continue
+
+        i += 1
+        if entry.stage:
+            # unmerged, all stages of the path are next to each other
+            while i < hi and entries[i].path == entry.path:
+                i += 1
+            continue
+        if entry.intent_to_add:
+            continue
+        head = files.get(rel)
+        if head is None:
+            status = "A"
+        elif head == (entry.mode, entry.sha):
+            continue
+        elif _kind(head[0]) != _kind(entry.mode):
+            # type change
+            continue
+        else:
+            status = "M"
+        out.append(
+            StagedEntry(
+                os.fsdecode(entry.path), f"{entry.mode:06o}", entry.sha.hex(), status
+            )
+        )
+
+
+def native_staged_entries(
+    cwd: str, env: Mapping[str, str] | None = None
+) -> list[StagedEntry]:
+    """
+    Returns the added and modified entries of the index compared to HEAD,
+    without renames, read without starting git.
+
+    Raises:
+        UnsupportedRepository: If the repository uses a feature the reader
+            doesn't read.
+    """
+    repo = find_repository(cwd, env)
+    entries, cache_tree = read_index(repo.index_file)
+    with ObjectStore(repo.objects_dir) as store:
+        commit = head_commit(repo)
+        tree = _commit_tree(store, commit) if commit else None
+        if tree is not None and cache_tree.get(b"") == tree:
+            return []
+        out: list[StagedEntry] = []
+        paths = [entry.path for entry in entries]
+        _changes(store, entries, paths, cache_tree, tree, b"", 0, len(entries), out)
+    return out
+
+
+def staged_entries(cwd: str) -> list[StagedEntry]:
+    """
+    Returns added and modified entries of the index, read natively unless
+    disabled by HOOKED_NATIVE_INDEX=0 or not possible, and by git otherwise.
+    """
+    if env_flag(NATIVE_INDEX_ENV, True):
+        try:
+            return native_staged_entries(cwd)
+        except (UnsupportedRepository, OSError, ValueError, KeyError, zlib.error) as e:
+            logger.debug(f"Asking git for the staged files: {e!r}")
+    return git_staged_entries(cwd)
@@ -0,0 +1,198 @@
+#  Copyright 2025 T-Systems International GmbH
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are met:
+#
+#  1. Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#  2. Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+#
+#  3. Neither the name of the copyright holder nor the names of its
+#     contributors may be used to endorse or promote products derived from
+#     this software without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+#  DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+#  FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+#  DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+#  SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+#  CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+#  OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#  OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+import time
+from dataclasses import dataclass, field
+
+from hooked.library.cmd_util import CommandError, CommandResult, run_cmd
+from hooked.library.hunks import changed_lines, in_changed_lines
+from hooked.library.logger import logger
+from hooked.library.prefilter import may_leak
+
+# ids of the pre-commit hooks the native stage replaces
+GITLEAKS_HOOKS = ("gitleaks", "gitleaks-docker", "gitleaks-system")
+
+
+@dataclass(frozen=True)
+class Finding:
+    """A single leak from the json report of gitleaks, secrets are redacted."""
+
+    rule_id: str
+    description: str
+    file: str
+    start_line: int
+    end_line: int
+    secret: str = ""
+    fingerprint: str = ""
+
+
+@dataclass
+class GitleaksResult:
+    returncode: int
+    findings: list[Finding] = field(default_factory=list)
+    output: str = ""
+    duration: float = 0.0
+    # gitleaks did not run, as no rule could match
+    skipped: bool = False
+
+    @property
+    def ok(self) -> bool:
+        return self.returncode == 0 and not self.findings
+
+
+def parse_report(data: object) -> list[Finding]:
+    """
+    Turns a gitleaks json report into findings.
+
+    Raises:
+        ValueError: If the report is not a list of findings.
+    """
+    if not isinstance(data, list):
+        raise ValueError("gitleaks report is not a list")
+    findings = []
+    for item in data:
+        if not isinstance(item, dict):
+            raise ValueError(f"Invalid gitleaks finding: {item!r}")
+        findings.append(
+            Finding(
+                rule_id=str(item.get("RuleID", "")),
+                description=str(item.get("Description", "")),
+                file=str(item.get("File", "")),
+                start_line=int(item.get("StartLine") or 0),
+                end_line=int(item.get("EndLine") or item.get("StartLine") or 0),
+                secret=str(item.get("Secret", "")),
+                fingerprint=str(item.get("Fingerprint", "")),
+            )
+        )
+    return findings
+
+
+def _on_changed_lines(cwd: str, findings: list[Finding]) -> list[Finding]:
+    ranges = changed_lines(cwd)
+    return [
+        finding
+        for finding in findings
+        if any(
+            in_changed_lines(ranges.get(finding.file, []), line)
+            for line in range(finding.start_line, finding.end_line + 1)
+        )
+    ]
+
+
+def scan_staged(
+    cwd: str,
+    config: str | None = None,
+    changed_lines_only: bool = False,
+    prefilter_bytes: int | None = None,
+) -> GitleaksResult:
+    """
+    Scans the staged changes of a repository with gitleaks directly.
+
+    gitleaks exits with 1 when it finds leaks, any other failure is passed on
+    as return code with an empty list of findings. With prefilter_bytes set,
+    gitleaks is skipped if up to that many staged bytes contain none of the
+    keywords of the config's rules.
+    """
+    start = time.monotonic()
+    if config and prefilter_bytes and not may_leak(cwd, config, prefilter_bytes):
+        return GitleaksResult(0, duration=time.monotonic() - start, skipped=True)
+
+    with tempfile.TemporaryDirectory(prefix="hooked-gitleaks-") as tmp:
+        report = os.path.join(tmp, "report.json")
+        cmd = [
+            "gitleaks",
+            "git",
+            "--pre-commit",
+            "--staged",
+            "--redact",
+            "--no-banner",
+            "--exit-code",
+            "1",
+            "--report-format",
+            "json",
+            "--report-path",
+            report,
+        ]
+        if config:
+            cmd += ["--config", config]
+        cmd.append(".")
+
+        try:
+            result = run_cmd(cmd, cwd=cwd)
+        except CommandError as e:
+            result = e.result
+        output = (result.stdout or "") + (result.stderr or "")
+        if result.returncode not in (0, 1):
+            return _result(result, [], output, start)
+
+        try:
+            with open(report, encoding="utf-8") as f:
+                findings = parse_report(json.load(f))
+        except (OSError, ValueError) as e:
+            logger.debug(f"Could not read gitleaks report: {e}")
+            # leaks without a report are still leaks
+            return _result(result, [], output, start)
+
+    if changed_lines_only and findings:
+        findings = _on_changed_lines(cwd, findings)
+        if not findings:
+            return GitleaksResult(0, [], output, time.monotonic() - start)
+    return _result(result, findings, output, start)
+
+
+def _result(
+    result: CommandResult, findings: list[Finding], output: str, start: float
+) -> GitleaksResult:
+    return GitleaksResult(
+        returncode=result.returncode,
+        findings=findings,
+        output=output,
+        duration=time.monotonic() - start,
+    )
+
+
+def format_result(result: GitleaksResult) -> str:
+    """Formats the result like a pre-commit hook line with the findings below."""
+    if result.skipped:
+        return f"{'gitleaks (native)':.<41}{'(no keywords in staged changes)Skipped'}\n"
+    status = "Passed" if result.ok else "Failed"
+    lines = [f"{'gitleaks (native)':.<73}{status}"]
+    for finding in result.findings:
+        lines.append(
+            f"- {finding.file}:{finding.start_line}: {finding.rule_id}"
+            f" ({finding.description})"
+        )
+        if finding.fingerprint:
+            lines.append(f"  fingerprint: {finding.fingerprint}")
+    if not result.ok and not result.findings and result.output:
+        lines.append(result.output.rstrip())
+    return "\n".join(lines) + "\n"
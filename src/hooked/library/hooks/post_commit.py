@@ -0,0 +1,142 @@
+#  Copyright 2025 T-Systems International GmbH
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are met:
+#
+#  1. Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#  2. Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+#
+#  3. Neither the name of the copyright holder nor the names of its
+#     contributors may be used to endorse or promote products derived from
+#     this software without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+#  DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+#  FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+#  DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+#  SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+#  CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+#  OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#  OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+from __future__ import annotations
+
+import os
+import tempfile
+from pathlib import Path
+
+from hooked.library.cmd_util import (
+    CommandResult,
+    arg_max,
+    partition_args,
+    run_parallel,
+)
+from hooked.library.deferred import (
+    DeferredResult,
+    claim_deferral,
+    log_file,
+    prune_logs,
+    save_result,
+)
+from hooked.library.env import env_int
+from hooked.library.git import (
+    git_dir,
+    git_rev_parse,
+    git_worktree_add,
+    git_worktree_remove,
+    without_hook_env,
+)
+from hooked.library.logger import logger
+from hooked.library.scheduler import hook_results
+
+
+def _hook_env() -> dict[str, str]:
+    env = without_hook_env(os.environ)
+    env["PRE_COMMIT_COLOR"] = "never"
+    return env
+
+
+def run_deferred_hooks(cwd: str = "") -> int:
+    """
+    Serves as entrypoint for running the hooks the pre-commit hook deferred,
+    in the background after the commit.
+
+    The hooks run in a temporary work tree of the new commit, their results
+    are stored in the git directory and reported by the next pre-commit run.
+
+    Args:
+        cwd (str): The current working directory where the git repository is located.
+
+    Returns:
+        int: Exit code indicating success (0) or failure (1) of the deferred hooks.
+    """
+    if not cwd:
+        raise RuntimeError("Missing required cwd argument")
+
+    cwd_path = Path(cwd[0]).resolve()
+    if not cwd_path.exists() or not cwd_path.is_dir():
+        raise RuntimeError(f"Provided path {cwd} does not exist or is not a directory")
+
+    env = _hook_env()
+    repo_git_dir = git_dir(str(cwd_path))
+    deferral = claim_deferral(repo_git_dir)
+    if deferral is None:
+        logger.debug("No deferred hooks to run.")
+        return 0
+
+    commit, tree = git_rev_parse(str(cwd_path), "HEAD", "HEAD^{tree}")
+    if tree != deferral.tree:
+        logger.info("Deferred hooks belong to another commit, dropping them.")
+        return 0
+
+    try:
+        os.nice(10)
+    except (AttributeError, OSError):
+        pass
+    prune_logs(repo_git_dir)
+
+    hook_ids: list[str] = []
+    results: list[CommandResult | None] = []
+    jobs = env_int("HOOKED_HOOK_JOBS", os.cpu_count() or 1)
+    with tempfile.TemporaryDirectory(prefix="hooked-deferred-") as tmp:
+        worktree = os.path.join(tmp, "tree")
+        git_worktree_add(str(cwd_path), worktree, commit, env=env)
+        try:
+            for config in deferral.configs:
+                config_file = config.config
+                if config.local:
+                    config_file = os.path.join(worktree, config_file)
+                config_env = {**env, **config.env}
+                runs = []
+                for hook_id in config.hooks:
+                    cmd = ["pre-commit", "run", "--config", config_file]
+                    cmd += [hook_id, "--files"]
+                    for chunk in partition_args(
+                        cmd, deferral.files, arg_max(config_env)
+                    ):
+                        hook_ids.append(hook_id)
+                        runs.append([*cmd, *chunk])
+                results += run_parallel(runs, jobs=jobs, cwd=worktree, env=config_env)
+        finally:
+            git_worktree_remove(str(cwd_path), worktree, env=env)
+
+    summary = hook_results(hook_ids, results)
+    result = DeferredResult(
+        commit=commit,
+        passed=[hook.id for hook in summary if hook.ok],
+        failed=[hook.id for hook in summary if not hook.ok],
+    )
+    if result.failed:
+        result.log = log_file(repo_git_dir, commit)
+        with open(result.log, "w", encoding="utf-8") as f:
+            for run_result in results:
+                if run_result:
+                    f.write(run_result.stdout or run_result.stderr or "")
+    save_result(repo_git_dir, result)
+    return 1 if result.failed else 0
@@ -27,26 +27,980 @@
 
 from __future__ import annotations
 
+import io
 import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import ExitStack
 from datetime import datetime, timedelta
+from fnmatch import fnmatchcase
+from functools import cache
 from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, TextIO
 
 from hooked import __upgrade_interval_seconds__
-from hooked.library.cmd_util import CommandError, run_cmd, run_stream
+from hooked.library.cmd_util import (
+    CommandError,
+    CommandResult,
+    arg_max,
+    partition_args,
+    run_cmd,
+    run_parallel,
+    run_stream,
+)
 from hooked.library.config import update_config
-from hooked.library.files import copy_hooked_files, get_base_dir
+from hooked.library.deferred import (
+    Deferral,
+    DeferredConfig,
+    discard_deferral,
+    pop_results,
+    save_deferral,
+)
+from hooked.library.env import env_flag, env_float, env_int
+from hooked.library.files import copy_hooked_files, get_base_dir, get_cache_dir
+from hooked.library.git import (
+    StagedEntry,
+    git_dir,
+    git_unstaged_files,
+    git_write_tree,
+    without_hook_env,
+)
+from hooked.library.git_index import staged_entries
+from hooked.library.hunks import CHANGED_LINES_ENV, published_changed_lines
 from hooked.library.logger import logger
+from hooked.library.memo import has_index_memo, index_memo_key, record_index_memo
 from hooked.library.pre_commit_util import is_hook_error
+from hooked.library.pre_commit_worker import (
+    fork_backend,
+    pre_commit_version,
+    start_worker,
+)
+from hooked.library.ruleset import (
+    HookSpec,
+    RulesetSettings,
+    file_hash,
+    load_hooks,
+    load_settings,
+)
+from hooked.library.scheduler import (
+    format_summary,
+    hook_results,
+    parse_skip,
+    plan_deferral,
+    split_hooks,
+)
+from hooked.library.sequencer import SequencerPolicy, new_blobs, sequencer_state
+from hooked.library.snapshot import staged_snapshot
+from hooked.library.stats import (
+    RepoStats,
+    balance,
+    estimate_cost,
+    fail_fast_order,
+    load_stats,
+    record_costs,
+    record_hook,
+    save_stats,
+)
+from hooked.library.toolchain import tool_version
 from hooked.library.upgrade import (
     get_last_upgrade_timestamp,
     self_upgrade,
     set_last_upgrade_timestamp,
 )
+from hooked.library.verdict_cache import user_verdict_cache, verdict_key
+
+if TYPE_CHECKING:
+    from packaging.version import Version
 
+    from hooked.library.gitleaks import GitleaksResult
+    from hooked.library.remote_cache import RemoteVerdictCache
 
-def _pre_commit_version():
-    version = run_cmd(["pre-commit", "--version"]).stdout
+# commits above these numbers of staged files or bytes are checked in shards
+SHARD_MIN_FILES = 2000
+SHARD_MIN_BYTES = 64 * 1024 * 1024
+
+# configs may run concurrently, both updating the stats of the repository
+_stats_lock = threading.Lock()
+
+
+@cache
+def _pre_commit_version() -> str:
+    if fork_backend():
+        version = pre_commit_version()
+    else:
+        version = tool_version("pre-commit")
     logger.debug(f"running {version}")
+    return version
+
+
+@cache
+def _pre_commit_popen() -> Callable[..., Any] | None:
+    """Popen of the pre-commit worker, None to start pre-commit for each run."""
+    worker = start_worker()
+    if worker is None:
+        return None
+    logger.debug(f"Running pre-commit in worker {worker.pid}")
+    return worker.popen
+
+
+@cache
+def _gitleaks_version() -> Version:
+    from hooked.library.install import _check_gitleaks
+
+    return _check_gitleaks(verbose=False)
+
+
+def _sequencer_policy(settings: RulesetSettings) -> SequencerPolicy:
+    value = os.getenv("HOOKED_SEQUENCER_POLICY") or settings.sequencer_policy
+    if not value:
+        return SequencerPolicy.FULL
+    try:
+        return SequencerPolicy(value.lower())
+    except ValueError:
+        logger.warning(f"Unknown sequencer policy {value}, checking all files.")
+        return SequencerPolicy.FULL
+
+
+def _sequencer_entries(
+    cwd_path: Path, settings: RulesetSettings, staged: list[StagedEntry]
+) -> list[StagedEntry]:
+    """
+    Narrows the staged entries down while a rebase, cherry-pick or merge is in
+    progress, according to the sequencer policy.
+    """
+    policy = _sequencer_policy(settings)
+    if policy == SequencerPolicy.FULL:
+        return staged
+    state = sequencer_state(git_dir(str(cwd_path)))
+    if state is None:
+        return staged
+    if policy == SequencerPolicy.SKIP:
+        logger.info(f"{state.operation} in progress, skipping hooks.")
+        return []
+    entries = new_blobs(str(cwd_path), state, staged)
+    if not entries:
+        logger.info(f"All staged blobs are part of the {state.operation}, skipping.")
+    else:
+        logger.debug(
+            f"{state.operation} in progress, {len(entries)} new blobs to check"
+        )
+    return entries
+
+
+def _remote_cache(settings: RulesetSettings) -> RemoteVerdictCache | None:
+    url = os.getenv("HOOKED_REMOTE_CACHE") or settings.remote_cache
+    if not url:
+        return None
+    # urllib and http pull in most of the standard library
+    from hooked.library.remote_cache import DEFAULT_REMOTE_TIMEOUT, RemoteVerdictCache
+
+    return RemoteVerdictCache(
+        url,
+        timeout=env_float("HOOKED_REMOTE_CACHE_TIMEOUT", DEFAULT_REMOTE_TIMEOUT),
+        token=os.getenv("HOOKED_REMOTE_CACHE_TOKEN"),
+    )
+
+
+def _lookup_verdicts(
+    config_file: str,
+    settings: RulesetSettings,
+    entries: list[StagedEntry],
+    skip: set[str],
+) -> tuple[list[StagedEntry], list[bytes]]:
+    """
+    Drops staged files whose verdicts are all cached as passing.
+
+    The local cache is asked first, the remaining misses go to the remote
+    cache (if configured) in a single request.
+
+    Returns the entries left to check and the verdict keys to store once the
+    run passed.
+    """
+    try:
+        hooks = load_hooks(config_file)
+    except ValueError as e:
+        logger.debug(f"Verdict cache not used: {e}")
+        return entries, []
+    # skipped hooks must not be recorded as passed
+    hooks = [hook for hook in hooks if hook.id not in skip]
+    if not hooks or not all(settings.is_cacheable(hook.id) for hook in hooks):
+        logger.debug("Verdict cache not used, %s has fixing hooks.", config_file)
+        return entries, []
+
+    config_hash = file_hash(config_file)
+    entry_keys = [
+        [verdict_key(entry, hook, config_hash) for hook in hooks] for entry in entries
+    ]
+
+    with user_verdict_cache() as cache:
+        misses = [key for keys in entry_keys for key in keys if not cache.contains(key)]
+        logger.debug(f"Verdict cache hits: {cache.hits}, misses: {cache.misses}")
+
+        remote = _remote_cache(settings)
+        if remote and misses:
+            remote_hits = remote.lookup(misses)
+            logger.debug(
+                f"Remote verdict cache hits: {len(remote_hits)}, "
+                f"misses: {len(misses) - len(remote_hits)}"
+            )
+            for key in remote_hits:
+                cache.add(key)
+            misses = [key for key in misses if key not in remote_hits]
+
+    missing = set(misses)
+    remaining = [
+        entry
+        for entry, keys in zip(entries, entry_keys)
+        if not missing.isdisjoint(keys)
+    ]
+    if len(remaining) < len(entries):
+        logger.debug(
+            f"Dropped {len(entries) - len(remaining)} files with cached verdicts"
+        )
+    return remaining, misses
+
+
+def _cached_checks(
+    config_file: str, settings: RulesetSettings, entries: list[StagedEntry]
+) -> dict[str, set[str]]:
+    """
+    Returns the staged files each cacheable check passed before, e.g. checked
+    by `hooked watch` after they were staged, for configs that also have
+    fixing hooks and can't be skipped as a whole.
+    """
+    try:
+        hooks = load_hooks(config_file)
+    except ValueError:
+        return {}
+    specs: dict[str, list[HookSpec]] = {}
+    for hook in hooks:
+        if settings.is_cacheable(hook.id):
+            specs.setdefault(hook.id, []).append(hook)
+    if not specs:
+        return {}
+
+    config_hash = file_hash(config_file)
+    cached = {}
+    with user_verdict_cache() as cache:
+        for hook_id, hook_specs in specs.items():
+            paths = {
+                entry.path
+                for entry in entries
+                if all(
+                    cache.contains(verdict_key(entry, hook, config_hash))
+                    for hook in hook_specs
+                )
+            }
+            if paths:
+                cached[hook_id] = paths
+    return cached
+
+
+def _check_verdicts(
+    config_file: str,
+    settings: RulesetSettings,
+    entries: list[StagedEntry],
+    skip: set[str],
+    passed: dict[str, set[str]] | None = None,
+) -> list[bytes]:
+    """
+    Returns the verdict keys of the cacheable checks of a config that also has
+    fixing hooks. passed holds the files each check passed on, None if all
+    checks that weren't skipped passed on all staged files.
+    """
+    try:
+        hooks = load_hooks(config_file)
+    except ValueError:
+        return []
+    config_hash = file_hash(config_file)
+    return [
+        verdict_key(entry, hook, config_hash)
+        for hook in hooks
+        if settings.is_cacheable(hook.id) and hook.id not in skip
+        for entry in entries
+        if passed is None or entry.path in passed.get(hook.id, ())
+    ]
+
+
+def _select_files(entries: list[StagedEntry], unstaged: set[str]) -> list[str] | None:
+    """
+    Returns the files to hand to pre-commit, None to let it check all staged
+    files itself.
+    """
+    # --files disables pre-commit's stash, so hooks would see the unstaged
+    # changes of any tracked file, not only of the staged ones: repository
+    # wide hooks and configuration files like pyproject.toml, too
+    if unstaged:
+        logger.debug("Unstaged changes found, checking all staged files.")
+        return None
+    return [entry.path for entry in entries]
+
+
+def _file_sizes(cwd_path: Path, files: list[str]) -> dict[str, int]:
+    sizes = {}
+    for path in files:
+        try:
+            sizes[path] = os.lstat(cwd_path / path).st_size
+        except OSError:
+            sizes[path] = 0
+    return sizes
+
+
+def _shard_jobs(files: list[str], sizes: dict[str, int]) -> int:
+    """Returns the number of shards to check the files in, 1 to not shard."""
+    jobs = env_int("HOOKED_SHARD_JOBS", os.cpu_count() or 1)
+    if jobs <= 1:
+        return 1
+    if len(files) >= env_int("HOOKED_SHARD_MIN_FILES", SHARD_MIN_FILES):
+        return jobs
+    if sum(sizes.values()) >= env_int("HOOKED_SHARD_MIN_BYTES", SHARD_MIN_BYTES):
+        return jobs
+    return 1
+
+
+def _save_stats(stats: RepoStats):
+    try:
+        save_stats(stats)
+    except OSError as e:
+        logger.debug(f"Could not save stats: {e}")
+
+
+def _report(results: list[CommandResult | None], out: TextIO) -> bool:
+    """
+    Writes the buffered output of pre-commit runs in order.
+
+    Returns True if hooks failed, raises CommandError for the first run where
+    pre-commit itself failed.
+    """
+    failed = False
+    error = None
+    for result in results:
+        if result is None:
+            continue
+        for output in (result.stdout, result.stderr):
+            if output:
+                out.write(output)
+        if result.returncode == 1:
+            failed = True
+        elif result.returncode != 0:
+            error = error or result
+    out.flush()
+
+    if error:
+        raise CommandError(error)
+    return failed
+
+
+def _shard_groups(
+    config_file: str, settings: RulesetSettings, env: dict[str, str]
+) -> tuple[list[str], list[str]] | None:
+    """
+    Splits a config into the hooks that run once, i.e. fixers and hooks that
+    check the whole repository, and the read-only checks of single files,
+    which may run in shards. None if the config can't be read.
+    """
+    try:
+        hooks = load_hooks(config_file)
+    except ValueError as e:
+        logger.debug(f"Not sharding: {e}")
+        return None
+    fixers, checks = split_hooks(hooks, settings, parse_skip(env.get("SKIP")))
+    repository = {hook.id for hook in hooks if not hook.runs_on_files}
+    once = [*fixers, *(hook_id for hook_id in checks if hook_id in repository)]
+    sharded = [hook_id for hook_id in checks if hook_id not in repository]
+    return once, sharded
+
+
+def _run_sharded(
+    cmd: list[str],
+    files: list[str],
+    once: list[str],
+    sharded: list[str],
+    cwd_path: Path,
+    env: dict[str, str],
+    sizes: dict[str, int],
+    jobs: int,
+    out: TextIO | None,
+    fail_fast: bool,
+    repo: str,
+) -> bool:
+    """
+    Runs the hooks that may not run in shards once, by a single pre-commit
+    run: fixers would race on the same files and repository checks would
+    run once per shard. Then the read-only checks run on shards of about
+    equal cost in parallel. The output of the shards is written in shard
+    order once all of them finished.
+
+    Returns True if hooks failed, raises CommandError if pre-commit itself
+    failed.
+    """
+    failed = False
+    if once:
+        once_env = _with_skip(env, sharded)
+        runs = _file_runs([*cmd, "--files"], files, once_env)
+        failed = _run_serial(runs, cwd_path, once_env, out)
+        if failed and fail_fast:
+            logger.info("Hooks failed, skipping the sharded read-only hooks.")
+            return failed
+    env = _with_skip(env, once)
+
+    with _stats_lock:
+        stats = load_stats(repo)
+    costs = {path: estimate_cost(stats, path, size) for path, size in sizes.items()}
+    shards = balance(costs, jobs)
+    logger.info(f"Checking {len(sizes)} staged files in {len(shards)} shards...")
+
+    shard_cmd = [*cmd, "--files"]
+    max_length = arg_max(env)
+    chunks = [
+        chunk
+        for shard in shards
+        for chunk in partition_args(shard_cmd, shard, max_length)
+    ]
+    results = run_parallel(
+        [[*shard_cmd, *chunk] for chunk in chunks],
+        jobs=jobs,
+        cwd=str(cwd_path),
+        env=env,
+        popen=_pre_commit_popen(),
+    )
+
+    with _stats_lock:
+        stats = load_stats(repo)
+        for chunk, result in zip(chunks, results):
+            if result and result.returncode in (0, 1):
+                sizes_chunk = {path: sizes[path] for path in chunk}
+                record_costs(stats, sizes_chunk, result.duration)
+        _save_stats(stats)
+
+    return _report(results, out or sys.stdout) or failed
+
+
+def _file_runs(
+    cmd: list[str], files: list[str], env: dict[str, str]
+) -> list[list[str]]:
+    """Appends the files to the command, split into runs that fit ARG_MAX."""
+    return [[*cmd, *chunk] for chunk in partition_args(cmd, files, arg_max(env))]
+
+
+def _run_serial(
+    runs: list[list[str]], cwd_path: Path, env: dict[str, str], out: TextIO | None
+) -> bool:
+    """
+    Runs pre-commit one run after another, streamed to the console or
+    buffered into out. Returns True if hooks failed.
+    """
+    if out is not None:
+        results = run_parallel(
+            runs, jobs=1, cwd=str(cwd_path), env=env, popen=_pre_commit_popen()
+        )
+        return _report(results, out)
+
+    failed = False
+    for run in runs:
+        try:
+            # only the exit code matters, pre-commit gets the terminal itself
+            run_stream(
+                run,
+                env=env,
+                cwd=str(cwd_path),
+                popen=_pre_commit_popen(),
+                passthrough=True,
+            )
+        except CommandError as exc:
+            if not is_hook_error(exc):
+                raise
+            failed = True
+    return failed
+
+
+def _fail_fast(settings: RulesetSettings) -> bool:
+    return env_flag("HOOKED_FAIL_FAST", settings.fail_fast)
+
+
+def _with_skip(env: dict[str, str], hook_ids: list[str]) -> dict[str, str]:
+    """Returns a copy of env that makes pre-commit skip the given hooks, too."""
+    return {**env, "SKIP": ",".join(filter(None, [env.get("SKIP"), *hook_ids]))}
+
+
+def _hook_groups(
+    config_file: str,
+    settings: RulesetSettings,
+    env: dict[str, str],
+    cached: dict[str, set[str]] | None = None,
+) -> tuple[list[str], list[str]] | None:
+    """
+    Splits a config into fixers and read-only checks, None if scheduling hooks
+    is disabled or not worth it. Checks with cached verdicts are always worth
+    running on their own.
+    """
+    ordered = _fail_fast(settings) or bool(cached)
+    if env_int("HOOKED_HOOK_JOBS", os.cpu_count() or 1) <= 1 and not ordered:
+        return None
+    try:
+        hooks = load_hooks(config_file)
+    except ValueError as e:
+        logger.debug(f"Not scheduling hooks: {e}")
+        return None
+    fixers, checks = split_hooks(hooks, settings, parse_skip(env.get("SKIP")))
+    if not checks or (len(checks) < 2 and not ordered):
+        return None
+    return fixers, checks
+
+
+def _run_scheduled(
+    cmd: list[str],
+    files: list[str],
+    fixers: list[str],
+    checks: list[str],
+    cwd_path: Path,
+    env: dict[str, str],
+    out: TextIO | None,
+    fail_fast: bool,
+    repo: str,
+    cached: dict[str, set[str]] | None = None,
+    passed: dict[str, set[str]] | None = None,
+) -> bool:
+    """
+    Runs the fixers of a config first, in config order by a single pre-commit
+    run. Then every read-only check runs on its own, in parallel, with the
+    output written in config order. A check skips the files it passed before
+    according to cached, and doesn't run if that leaves none. The files each
+    check passed on are added to passed, unless the fixers failed and may
+    have changed them.
+
+    In fail-fast mode the checks are ordered by their history, so that likely
+    failures show up first, and no further check is started after a failure.
+
+    Returns True if hooks failed, raises CommandError if pre-commit itself
+    failed.
+    """
+    failed = False
+    if fixers:
+        fixer_env = _with_skip(env, checks)
+        runs = _file_runs([*cmd, "--files"], files, fixer_env)
+        failed = _run_serial(runs, cwd_path, fixer_env, out)
+        if failed and fail_fast:
+            logger.info("Fixing hooks failed, skipping the read-only hooks.")
+            return failed
+
+    if fail_fast:
+        with _stats_lock:
+            checks = fail_fast_order(load_stats(repo), checks)
+
+    cached = cached or {}
+    if cached:
+        logger.debug(f"Cached verdicts: {sum(len(paths) for paths in cached.values())}")
+    checks = [
+        hook_id
+        for hook_id in checks
+        if any(path not in cached.get(hook_id, ()) for path in files)
+    ]
+    fixed = failed
+    hook_ids = []
+    runs = []
+    checked = {}
+    for hook_id in checks:
+        hook_files = [path for path in files if path not in cached.get(hook_id, ())]
+        checked[hook_id] = hook_files
+        for run in _file_runs([*cmd, hook_id, "--files"], hook_files, env):
+            hook_ids.append(hook_id)
+            runs.append(run)
+    if not runs:
+        logger.info("All staged files have passed the read-only hooks before.")
+        return failed
+    jobs = env_int("HOOKED_HOOK_JOBS", os.cpu_count() or 1)
+    logger.debug(f"Running {len(checks)} read-only hooks, {jobs} at a time...")
+    results = run_parallel(
+        runs,
+        jobs=jobs,
+        cwd=str(cwd_path),
+        env=env,
+        fail_fast=fail_fast,
+        popen=_pre_commit_popen(),
+    )
+
+    failed = _report(results, out or sys.stdout) or failed
+    summary = hook_results(hook_ids, results)
+    logger.info(f"Read-only hooks:\n{format_summary(summary)}")
+    if passed is not None and not fixed:
+        for hook in summary:
+            if hook.ok:
+                passed.setdefault(hook.id, set()).update(checked[hook.id])
+    if len(summary) < len(checks):
+        logger.info(
+            f"Skipped {len(checks) - len(summary)} read-only hooks after the "
+            "first failure, set HOOKED_FAIL_FAST=0 to run all of them."
+        )
+
+    with _stats_lock:
+        stats = load_stats(repo)
+        for hook in summary:
+            if hook.returncode in (0, 1):
+                record_hook(stats, hook.id, hook.ok, hook.duration)
+        _save_stats(stats)
+    return failed
+
+
+def _run_files(
+    cmd: list[str],
+    config_file: str,
+    settings: RulesetSettings,
+    files: list[str],
+    cwd_path: Path,
+    env: dict[str, str],
+    out: TextIO | None,
+    repo: str,
+    cached: dict[str, set[str]] | None = None,
+    passed: dict[str, set[str]] | None = None,
+) -> bool:
+    """
+    Runs pre-commit on the given files: the read-only checks in shards for
+    large commits, hook by hook if the config has several read-only hooks, or
+    else all at once. Hook by hook, the files each check passed on are added
+    to passed.
+
+    The history of the repository is used to balance the shards and order
+    hooks, which may be checked in a snapshot at cwd_path.
+    """
+    sizes = _file_sizes(cwd_path, files)
+    jobs = _shard_jobs(files, sizes)
+    groups = _shard_groups(config_file, settings, env) if jobs > 1 else None
+    if groups and groups[1]:
+        return _run_sharded(
+            cmd,
+            files,
+            *groups,
+            cwd_path,
+            env,
+            sizes,
+            jobs,
+            out,
+            _fail_fast(settings),
+            repo,
+        )
+
+    groups = _hook_groups(config_file, settings, env, cached)
+    if groups:
+        return _run_scheduled(
+            cmd,
+            files,
+            *groups,
+            cwd_path,
+            env,
+            out,
+            _fail_fast(settings),
+            repo,
+            cached,
+            passed,
+        )
+
+    # hand over the staged files, so pre-commit doesn't discover them again
+    return _run_serial(_file_runs([*cmd, "--files"], files, env), cwd_path, env, out)
+
+
+def _store_verdicts(settings: RulesetSettings, verdicts: list[bytes]):
+    with user_verdict_cache() as cache:
+        for key in verdicts:
+            cache.add(key)
+
+    remote = _remote_cache(settings)
+    if remote and env_flag("HOOKED_REMOTE_CACHE_UPLOAD", True):
+        remote.upload(verdicts)
+
+
+def _run_config(
+    config_file: str,
+    settings: RulesetSettings,
+    cwd_path: Path,
+    env: dict[str, str],
+    entries: list[StagedEntry],
+    unstaged: set[str],
+    out: TextIO | None = None,
+    snapshot: str | None = None,
+) -> int:
+    """
+    Runs pre-commit with a config on the given staged entries, returns 1 if
+    hooks failed.
+
+    The output is streamed to the console, or buffered and written to out
+    once pre-commit finished. Read-only configs are checked in the snapshot of
+    the staged files, if given, instead of letting pre-commit stash unstaged
+    changes.
+
+    Passing verdicts are cached: of all hooks if they are all cacheable, else
+    of the cacheable checks, even if other hooks failed.
+    """
+    verdicts = []
+    cached = None
+    passed = None
+    skip = parse_skip(env.get("SKIP"))
+    if env_flag("HOOKED_VERDICT_CACHE", True):
+        entries, verdicts = _lookup_verdicts(config_file, settings, entries, skip)
+        if not entries:
+            logger.info("All staged files have passed these hooks before.")
+            return 0
+        if not verdicts:
+            cached = _cached_checks(config_file, settings, entries)
+            passed = {}
+
+    cmd = ["pre-commit", "run", "--config", config_file]
+    if _fail_fast(settings):
+        cmd.append("--fail-fast")
+    files = _select_files(entries, unstaged)
+    repo = str(cwd_path)
+    if files is None and snapshot and _fixers(config_file, settings) == []:
+        logger.debug(f"Checking the staged snapshot with {config_file}")
+        files = [entry.path for entry in entries]
+        snapshot_env = without_hook_env(env)
+        failed = _run_files(
+            cmd,
+            config_file,
+            settings,
+            files,
+            Path(snapshot),
+            snapshot_env,
+            out,
+            repo,
+            cached,
+            passed,
+        )
+    elif files is None:
+        failed = _run_serial([cmd], cwd_path, env, out)
+    else:
+        failed = _run_files(
+            cmd, config_file, settings, files, cwd_path, env, out, repo, cached, passed
+        )
+
+    if passed is not None:
+        # the cacheable checks may have passed while other hooks failed
+        verdicts = _check_verdicts(
+            config_file, settings, entries, skip, passed if failed else None
+        )
+    elif failed:
+        verdicts = []
+    if verdicts:
+        _store_verdicts(settings, verdicts)
+    return 1 if failed else 0
+
+
+def _deferred_hooks(
+    config_file: str, settings: RulesetSettings, cwd_path: Path, env: dict[str, str]
+) -> list[str]:
+    """Returns the read-only hooks of a config to run after the commit."""
+    try:
+        hooks = load_hooks(config_file)
+    except ValueError as e:
+        logger.debug(f"Not deferring hooks: {e}")
+        return []
+    _, checks = split_hooks(hooks, settings, parse_skip(env.get("SKIP")))
+    return plan_deferral(
+        checks,
+        settings,
+        load_stats(str(cwd_path)),
+        budget=env_float("HOOKED_TIME_BUDGET", 0.0),
+        jobs=env_int("HOOKED_HOOK_JOBS", os.cpu_count() or 1),
+    )
+
+
+def _report_deferred(repo_git_dir: str):
+    """Reports the results of hooks that ran after earlier commits."""
+    for result in pop_results(repo_git_dir):
+        if result.failed:
+            logger.warning(
+                f"Deferred hooks failed on commit {result.commit[:12]}: "
+                f"{', '.join(result.failed)}, see {result.log}"
+            )
+        else:
+            logger.info(f"Deferred hooks passed on commit {result.commit[:12]}.")
+
+
+def _native_gitleaks(settings: RulesetSettings) -> bool:
+    """Checks if gitleaks should scan the staged changes itself."""
+    if not env_flag("HOOKED_NATIVE_GITLEAKS", settings.native_gitleaks):
+        return False
+    if "gitleaks" in parse_skip(os.environ.get("SKIP")):
+        return False
+    try:
+        _gitleaks_version()
+    except RuntimeError as e:
+        logger.warning(f"Native gitleaks scan disabled: {e}")
+        return False
+    return True
+
+
+def _report_secrets(result: GitleaksResult) -> bool:
+    """Prints the result of the native gitleaks scan, returns True on leaks."""
+    from hooked.library.gitleaks import format_result
+
+    sys.stdout.write(format_result(result))
+    sys.stdout.flush()
+    if result.skipped:
+        logger.debug(f"No gitleaks keywords found in {result.duration:.2f}s")
+    else:
+        logger.debug(f"gitleaks scanned the staged changes in {result.duration:.2f}s")
+    if result.ok:
+        return False
+    if result.findings:
+        logger.warning(
+            f"gitleaks found {len(result.findings)} leaks in the staged changes."
+        )
+    else:
+        logger.error(f"gitleaks failed with exit code {result.returncode}.")
+    return True
+
+
+def _fixers(config_file: str, settings: RulesetSettings) -> list[str] | None:
+    """Returns the hooks of a config that may modify files, None if unknown."""
+    try:
+        hooks = load_hooks(config_file)
+    except ValueError as e:
+        logger.debug(f"Could not read {config_file}: {e}")
+        return None
+    return [hook.id for hook in hooks if not settings.is_read_only(hook.id)]
+
+
+def _use_snapshot(
+    configs: list[tuple[str, dict[str, str]]],
+    settings: RulesetSettings,
+    entries: list[StagedEntry],
+    unstaged: set[str],
+) -> bool:
+    """
+    Checks if a snapshot of the staged files is worth it: pre-commit would
+    have to stash unstaged changes for at least one read-only config.
+    """
+    if not env_flag("HOOKED_SNAPSHOT", True):
+        return False
+    if _select_files(entries, unstaged) is not None:
+        return False
+    if ".pre-commit-config.yaml" in unstaged:
+        return False
+    return any(_fixers(config_file, settings) == [] for config_file, _ in configs)
+
+
+def _concurrent_configs(
+    configs: list[tuple[str, dict[str, str]]],
+    settings: RulesetSettings,
+    entries: list[StagedEntry],
+    unstaged: set[str],
+    snapshot: str | None,
+) -> bool:
+    """
+    Checks if the configs can run at the same time: none of their hooks may
+    modify files and pre-commit must not need to stash unstaged changes.
+    """
+    if not env_flag("HOOKED_CONCURRENT_CONFIGS", True):
+        return False
+    if _select_files(entries, unstaged) is None and snapshot is None:
+        return False
+    for config_file, _ in configs:
+        fixers = _fixers(config_file, settings)
+        if fixers is None:
+            return False
+        if fixers:
+            logger.debug(
+                f"Running configs one after another, {config_file} has fixing "
+                f"hooks: {', '.join(fixers)}"
+            )
+            return False
+    return True
+
+
+def _run_configs(
+    configs: list[tuple[str, dict[str, str]]],
+    settings: RulesetSettings,
+    cwd_path: Path,
+    entries: list[StagedEntry],
+    unstaged: set[str],
+) -> int:
+    """
+    Runs pre-commit with each config, returns 1 if hooks failed.
+
+    Read-only configs run concurrently with their output printed in config
+    order, otherwise one after another until the first failure. If unstaged
+    changes would have to be stashed, read-only configs check a snapshot of
+    the staged files instead.
+    """
+    stack = ExitStack()
+    snapshot = None
+    if _use_snapshot(configs, settings, entries, unstaged):
+        try:
+            snapshot = stack.enter_context(
+                staged_snapshot(str(cwd_path), entries, unstaged)
+            )
+        except (CommandError, OSError) as e:
+            logger.debug(f"Could not snapshot the staged files: {e}")
+
+    with stack:
+        if len(configs) > 1 and _concurrent_configs(
+            configs, settings, entries, unstaged, snapshot
+        ):
+            logger.debug("Running pre-commit configs concurrently...")
+            outputs = [io.StringIO() for _ in configs]
+            with ThreadPoolExecutor(max_workers=len(configs)) as pool:
+                futures = [
+                    pool.submit(
+                        _run_config,
+                        config_file,
+                        settings,
+                        cwd_path,
+                        env,
+                        entries,
+                        unstaged,
+                        out,
+                        snapshot,
+                    )
+                    for (config_file, env), out in zip(configs, outputs)
+                ]
+                wait(futures)
+            for out in outputs:
+                sys.stdout.write(out.getvalue())
+            sys.stdout.flush()
+            failed = any([future.result() for future in futures])
+        else:
+            failed = any(
+                _run_config(
+                    config_file,
+                    settings,
+                    cwd_path,
+                    env,
+                    entries,
+                    unstaged,
+                    snapshot=snapshot,
+                )
+                for config_file, env in configs
+            )
+
+    return 1 if failed else 0
+
+
+def _complete_run(
+    staged: list[StagedEntry], entries: list[StagedEntry], deferred: bool
+) -> bool:
+    """
+    Checks if every hook ran on every staged file, only then the index memo
+    may remember the staged tree as passed.
+    """
+    if parse_skip(os.environ.get("SKIP")):
+        logger.debug("Not remembering the index, SKIP is set.")
+        return False
+    if len(entries) < len(staged):
+        logger.debug("Not remembering the index, only new blobs were checked.")
+        return False
+    if deferred:
+        logger.debug("Not remembering the index, hooks run after the commit.")
+        return False
+    return True
+
+
+def _excluded(cwd_path: Path, settings: RulesetSettings) -> bool:
+    """Whether the repository matches one of the excluded repository patterns."""
+    return any(
+        fnmatchcase(str(cwd_path), os.path.expanduser(pattern))
+        for pattern in settings.exclude_repos
+    )
 
 
 def run_pre_commit_hook(cwd: str = "") -> int:
@@ -62,30 +1016,38 @@ def run_pre_commit_hook(cwd: str = "") -> int:
     if not cwd:
         raise RuntimeError("Missing required cwd argument")
 
+    cwd_path = Path(cwd[0]).resolve()
+    if not cwd_path.exists() or not cwd_path.is_dir():
+        raise RuntimeError(f"Provided path {cwd} does not exist or is not a directory")
+
+    base_dir = get_base_dir()
+    config_dir = os.path.join(base_dir, "config")
+    local_pre_commit_file = cwd_path.joinpath(".pre-commit-config.yaml")
+
+    if _excluded(cwd_path, load_settings(config_dir)):
+        logger.info(f"{cwd_path} is excluded by the rule set, skipping.")
+        return 0
+
+    memo_key = None
+    if env_flag("HOOKED_INDEX_MEMO", True):
+        memo_key = index_memo_key(str(cwd_path), config_dir, str(local_pre_commit_file))
+        if memo_key and has_index_memo(memo_key):
+            logger.info("Staged changes already passed all hooks, skipping.")
+            return 0
+
     try:
         _pre_commit_version()
     except CommandError as exc:
         raise RuntimeError("pre-commit is not installed or not found in PATH") from exc
 
-    base_dir = get_base_dir()
-    config_dir = os.path.join(base_dir, "config")
-
     last_run = get_last_upgrade_timestamp()
     logger.debug(f"Last pre-commit run at {last_run}")
 
     now = datetime.now()
     delta = timedelta(seconds=__upgrade_interval_seconds__)
 
-    skip_check = os.getenv("HOOKED_SKIP_UPGRADE_CHECK", "false").lower() in (
-        "1",
-        "true",
-        "yes",
-    )
-    skip_hook = os.getenv("HOOKED_SKIP", "false").lower() in (
-        "1",
-        "true",
-        "yes",
-    )
+    skip_check = env_flag("HOOKED_SKIP_UPGRADE_CHECK")
+    skip_hook = env_flag("HOOKED_SKIP")
 
     if (last_run and now - last_run < delta) and not skip_check:
         logger.debug(
@@ -106,78 +1068,129 @@ def run_pre_commit_hook(cwd: str = "") -> int:
 
         set_last_upgrade_timestamp()
 
-    cwd_path = Path(cwd[0]).resolve()
-    if not cwd_path.exists() or not cwd_path.is_dir():
-        raise RuntimeError(f"Provided path {cwd} does not exist or is not a directory")
-
     logger.debug("Starting to work in the target repository %s...", cwd_path)
+    settings = load_settings(config_dir)
 
-    staged_files = run_cmd(
-        ["git", "diff", "--cached", "--name-only", "--diff-filter", "ACM"],
-        cwd=str(cwd_path),
-    ).stdout
-    if not staged_files:
+    staged = staged_entries(str(cwd_path))
+    if not staged:
         logger.info("No staged files to check.")
         return 0
 
-    logger.debug(f"Staged files: {staged_files.replace('\n', ', ')}")
+    logger.debug(f"Staged files: {', '.join(entry.path for entry in staged)}")
+
+    entries = _sequencer_entries(cwd_path, settings, staged)
+    if not entries:
+        return 0
+    # forked while hooked has no threads yet, imports pre-commit meanwhile
+    _pre_commit_popen()
+    unstaged = git_unstaged_files(str(cwd_path))
+
+    repo_git_dir = git_dir(str(cwd_path))
+    _report_deferred(repo_git_dir)
+    discard_deferral(repo_git_dir)
 
+    configs = []
+    deferrals = []
+    gitleaks_config = None
     if not skip_hook:
         logger.debug("Running pre-commit hooks...")
-        try:
-            pre_commit_config = os.path.join(config_dir, ".pre-commit-config.yaml")
+        pre_commit_config = os.path.join(config_dir, ".pre-commit-config.yaml")
+        _env = os.environ.copy()
+        _env["GITLEAKS_CONFIG"] = os.path.join(config_dir, ".gitleaks.toml")
+        _env["PRE_COMMIT_COLOR"] = "always"
 
-            _env = os.environ.copy()
-            _env["GITLEAKS_CONFIG"] = os.path.join(config_dir, ".gitleaks.toml")
-            _env["PRE_COMMIT_COLOR"] = "always"
+        if _native_gitleaks(settings):
+            from hooked.library.gitleaks import GITLEAKS_HOOKS
 
-            run_stream(
-                [
-                    "pre-commit",
-                    "run",
-                    "--config",
-                    pre_commit_config,
-                ],
-                env=_env,
-                cwd=str(cwd_path),
-            )
-        except CommandError as exc:
-            if not is_hook_error(exc):
-                raise
+            gitleaks_config = _env["GITLEAKS_CONFIG"]
+            if settings.drop_gitleaks_hook:
+                _env = _with_skip(_env, list(GITLEAKS_HOOKS))
 
-            logger.warning(
-                "Pre-commit hooks failed. Please fix the issues and try again."
+        deferred = _deferred_hooks(pre_commit_config, settings, cwd_path, _env)
+        if deferred:
+            deferrals.append(
+                DeferredConfig(
+                    config=pre_commit_config,
+                    hooks=deferred,
+                    env={"GITLEAKS_CONFIG": _env["GITLEAKS_CONFIG"]},
+                )
             )
-            return 1
+            _env = _with_skip(_env, deferred)
+        configs.append((pre_commit_config, _env))
 
-    local_pre_commit_file = cwd_path.joinpath(".pre-commit-config.yaml")
-    if not local_pre_commit_file.is_file():
+    if local_pre_commit_file.is_file():
+        logger.info(".pre-commit-config.yaml found. Running local pre-commit hooks...")
+        _env = os.environ.copy()
+        _env["PRE_COMMIT_COLOR"] = "always"
+
+        deferred = _deferred_hooks(str(local_pre_commit_file), settings, cwd_path, _env)
+        if deferred:
+            deferrals.append(
+                DeferredConfig(
+                    config=local_pre_commit_file.name, hooks=deferred, local=True
+                )
+            )
+            _env = _with_skip(_env, deferred)
+        configs.append((str(local_pre_commit_file), _env))
+    else:
         logger.debug("No .pre-commit-config.yaml found in repository.")
-        return 0
 
-    logger.info(".pre-commit-config.yaml found. Running local pre-commit hooks...")
+    forked = settings.forkserver_hooks()
+    if forked and env_flag("HOOKED_FORKSERVER", True) and fork_backend():
+        from hooked.library.forkserver import FORKSERVER_HOOKS_ENV
 
-    _env = os.environ.copy()
-    _env["PRE_COMMIT_COLOR"] = "always"
+        for _, _env in configs:
+            _env[FORKSERVER_HOOKS_ENV] = ",".join(forked)
 
-    try:
-        run_stream(
-            [
-                "pre-commit",
-                "run",
-                "--config",
-                str(local_pre_commit_file),
-            ],
-            env=_env,
-            cwd=str(cwd_path),
+    for deferral in deferrals:
+        logger.info(
+            f"Running {', '.join(deferral.hooks)} in the background after the commit."
         )
-    except CommandError as exc:
-        if not is_hook_error(exc):
-            raise
 
-        logger.warning("Pre-commit hooks failed. Please fix the issues and try again.")
-        return 1
+    with ExitStack() as stack:
+        if configs and env_flag("HOOKED_PUBLISH_CHANGED_LINES", settings.changed_lines):
+            lines_file = stack.enter_context(published_changed_lines(str(cwd_path)))
+            for _, _env in configs:
+                _env[CHANGED_LINES_ENV] = lines_file
+
+        secrets = None
+        if gitleaks_config:
+            from hooked.library.gitleaks import scan_staged
+            from hooked.library.prefilter import DEFAULT_PREFILTER_BYTES
+
+            logger.debug("Scanning the staged changes with gitleaks...")
+            pool = stack.enter_context(ThreadPoolExecutor(max_workers=1))
+            secrets = pool.submit(
+                scan_staged,
+                str(cwd_path),
+                gitleaks_config if os.path.isfile(gitleaks_config) else None,
+                settings.changed_lines_only,
+                env_int("HOOKED_GITLEAKS_PREFILTER_BYTES", DEFAULT_PREFILTER_BYTES),
+            )
+
+        failed = _run_configs(configs, settings, cwd_path, entries, unstaged)
+        if secrets is not None and _report_secrets(secrets.result()):
+            failed = 1
+        if failed:
+            logger.warning(
+                "Pre-commit hooks failed. Please fix the issues and try again."
+            )
+            return 1
+
+    if deferrals:
+        save_deferral(
+            repo_git_dir,
+            Deferral(
+                tree=git_write_tree(str(cwd_path)),
+                files=[entry.path for entry in entries],
+                configs=deferrals,
+            ),
+        )
+
+    if memo_key and not skip_hook and _complete_run(staged, entries, bool(deferrals)):
+        record_index_memo(memo_key)
 
-    logger.info("pre-commit hook ran successfully.")
+    if configs:
+        logger.info("pre-commit hook ran successfully.")
 
     return 0
@@ -0,0 +1,184 @@
+#  Copyright 2025 T-Systems International GmbH
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are met:
+#
+#  1. Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#  2. Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+#
+#  3. Neither the name of the copyright holder nor the names of its
+#     contributors may be used to endorse or promote products derived from
+#     this software without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+#  DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+#  FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+#  DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+#  SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+#  CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+#  OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#  OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+from __future__ import annotations
+
+import os
+import shutil
+import tempfile
+from dataclasses import dataclass, field
+
+from hooked.library.cmd_util import arg_max, partition_args, run_parallel
+from hooked.library.env import env_int
+from hooked.library.files import get_config_dir
+from hooked.library.git import (
+    StagedEntry,
+    git_path,
+    git_staged_entries,
+    git_unstaged_files,
+    git_write_tree,
+    without_hook_env,
+)
+from hooked.library.logger import logger
+from hooked.library.ruleset import (
+    GITLEAKS_CONFIG,
+    PRE_COMMIT_CONFIG,
+    HookSpec,
+    RulesetSettings,
+    file_hash,
+    load_hooks,
+    load_settings,
+)
+from hooked.library.scheduler import parse_skip
+from hooked.library.snapshot import GITLINK_MODE, staged_snapshot
+from hooked.library.verdict_cache import VerdictCache, user_verdict_cache, verdict_key
+
+# Pre-checks staged files for `hooked watch` before the commit: the cacheable
+# read-only hooks of the rule set and the local config run on the staged
+# content in a snapshot, and the files they pass are stored in the verdict
+# cache, where the commit finds them. Hooked works on a copy of the index, so
+# git never waits for an index.lock held by hooked.
+
+
+@dataclass
+class _Check:
+    """A hook to run on the staged files that have no verdict of it yet."""
+
+    config_file: str
+    env: dict[str, str]
+    hook_id: str
+    keys: dict[str, list[bytes]] = field(default_factory=dict)
+
+
+def _configs(cwd: str) -> list[tuple[str, dict[str, str]]]:
+    """The configs a commit in cwd runs, with their environment."""
+    config_dir = get_config_dir()
+    env = without_hook_env(os.environ)
+    env["PRE_COMMIT_COLOR"] = "never"
+    configs = []
+    ruleset_config = os.path.join(config_dir, PRE_COMMIT_CONFIG)
+    if os.path.isfile(ruleset_config):
+        gitleaks_config = os.path.join(config_dir, GITLEAKS_CONFIG)
+        configs.append((ruleset_config, {**env, "GITLEAKS_CONFIG": gitleaks_config}))
+    local_config = os.path.join(cwd, PRE_COMMIT_CONFIG)
+    if os.path.isfile(local_config):
+        configs.append((local_config, env))
+    return configs
+
+
+def _pending_checks(
+    configs: list[tuple[str, dict[str, str]]],
+    settings: RulesetSettings,
+    entries: list[StagedEntry],
+    cache: VerdictCache,
+    failed: set[bytes],
+) -> list[_Check]:
+    """Returns the cacheable hooks with staged files left to check."""
+    checks = []
+    for config_file, env in configs:
+        try:
+            hooks = load_hooks(config_file)
+        except ValueError as e:
+            logger.debug(f"Not pre-checking {config_file}: {e}")
+            continue
+        skip = parse_skip(env.get("SKIP"))
+        specs: dict[str, list[HookSpec]] = {}
+        for hook in hooks:
+            if hook.id not in skip and settings.is_cacheable(hook.id):
+                specs.setdefault(hook.id, []).append(hook)
+        config_hash = file_hash(config_file)
+        for hook_id, hook_specs in specs.items():
+            check = _Check(config_file, env, hook_id)
+            for entry in entries:
+                keys = [verdict_key(entry, hook, config_hash) for hook in hook_specs]
+                if failed.isdisjoint(keys) and not all(map(cache.contains, keys)):
+                    check.keys[entry.path] = keys
+            if check.keys:
+                checks.append(check)
+    return checks
+
+
+def precheck_staged(cwd: str, failed: set[bytes] | None = None) -> int:
+    """
+    Runs the cacheable read-only hooks on staged files without verdicts and
+    stores the verdicts of those that pass. Keys of failing checks are added
+    to failed and not tried again while in it.
+
+    Returns the number of stored verdicts.
+
+    Raises CommandError if git fails, e.g. during an unresolved merge.
+    """
+    failed = set() if failed is None else failed
+    configs = _configs(cwd)
+    if not configs:
+        return 0
+    settings = load_settings(get_config_dir())
+    env = without_hook_env(os.environ)
+
+    with tempfile.TemporaryDirectory(prefix="hooked-precheck-") as tmp:
+        index_env = {**env, "GIT_INDEX_FILE": os.path.join(tmp, "index")}
+        shutil.copyfile(git_path(cwd, "index"), index_env["GIT_INDEX_FILE"])
+        entries = [
+            entry
+            for entry in git_staged_entries(cwd, env=index_env)
+            if entry.mode != GITLINK_MODE
+        ]
+        with user_verdict_cache() as cache:
+            checks = _pending_checks(configs, settings, entries, cache, failed)
+        if not checks:
+            return 0
+        logger.debug(
+            f"Pre-checking {', '.join(check.hook_id for check in checks)} in {cwd}"
+        )
+
+        tree = git_write_tree(cwd, env=index_env)
+        unstaged = {entry.path for entry in entries} | git_unstaged_files(cwd)
+        stored = 0
+        with staged_snapshot(cwd, entries, unstaged, env=env, tree=tree) as snapshot:
+            for check in checks:
+                cmd = ["pre-commit", "run", "--config", check.config_file]
+                cmd += [check.hook_id, "--files"]
+                chunks = list(partition_args(cmd, list(check.keys), arg_max(check.env)))
+                results = run_parallel(
+                    [[*cmd, *chunk] for chunk in chunks],
+                    jobs=env_int("HOOKED_HOOK_JOBS", os.cpu_count() or 1),
+                    cwd=snapshot,
+                    env=check.env,
+                )
+                passed = []
+                for chunk, result in zip(chunks, results):
+                    keys = [key for path in chunk for key in check.keys[path]]
+                    if result and result.returncode == 0:
+                        passed += keys
+                    else:
+                        failed.update(keys)
+                with user_verdict_cache() as cache:
+                    for key in passed:
+                        cache.add(key)
+                stored += len(passed)
+    logger.debug(f"Pre-checked {stored} verdicts in {cwd}")
+    return stored
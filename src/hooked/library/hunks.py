@@ -0,0 +1,172 @@
+#  Copyright 2025 T-Systems International GmbH
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are met:
+#
+#  1. Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#  2. Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+#
+#  3. Neither the name of the copyright holder nor the names of its
+#     contributors may be used to endorse or promote products derived from
+#     this software without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+#  DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+#  FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+#  DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+#  SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+#  CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+#  OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#  OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+from __future__ import annotations
+
+import bisect
+import json
+import os
+import re
+import tempfile
+from contextlib import contextmanager
+from typing import Iterator, Sequence
+
+from hooked.library.git import git_staged_patch
+from hooked.library.logger import logger
+
+# environment variable pointing hooks to the changed lines of the staged files
+CHANGED_LINES_ENV = "HOOKED_CHANGED_LINES"
+
+_HUNK = re.compile(rb"^@@ -\d+(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+_ESCAPES = {
+    ord("a"): 7,
+    ord("b"): 8,
+    ord("t"): 9,
+    ord("n"): 10,
+    ord("v"): 11,
+    ord("f"): 12,
+    ord("r"): 13,
+    ord('"'): ord('"'),
+    ord("\\"): ord("\\"),
+}
+
+LineRanges = dict[str, list[tuple[int, int]]]
+
+
+def _unquote(path: bytes) -> bytes:
+    """Reverts the C style quoting git applies to unusual paths."""
+    if not path.startswith(b'"'):
+        return path
+    out = bytearray()
+    i = 1
+    while i < len(path) - 1:
+        c = path[i]
+        if c != ord("\\"):
+            out.append(c)
+            i += 1
+        elif path[i + 1] in _ESCAPES:
+            out.append(_ESCAPES[path[i + 1]])
+            i += 2
+        else:
+            out.append(int(path[i + 1 : i + 4], 8))
+            i += 4
+    return bytes(out)
+
+
+def _diff_path(line: bytes) -> bytes | None:
+    """
+    Returns the path of a "diff --git" line of a patch without renames, where
+    both (equally quoted) paths are the same, None if they differ.
+    """
+    paths = line[len(b"diff --git ") :]
+    half = (len(paths) - 1) // 2
+    if paths[half : half + 1] != b" " or paths[:half] != paths[half + 1 :]:
+        return None
+    return paths[:half]
+
+
+def parse_patch(lines: Iterator[bytes]) -> LineRanges:
+    """
+    Collects the inclusive ranges of added or changed lines per file from a
+    patch without context, path prefixes and renames. Deleted files are left
+    out, files without text hunks (binary files, mode changes) map to no
+    ranges.
+
+    The lines of a hunk are counted off its header, so that content looking
+    like a file header (an added "++ " line) is not taken for one.
+    """
+    ranges: LineRanges = {}
+    path: str | None = None
+    removed = added = 0
+    for line in lines:
+        if (removed or added) and line[:1] in (b"-", b"+", b"\\"):
+            if line.startswith(b"-"):
+                removed = max(0, removed - 1)
+            elif line.startswith(b"+"):
+                added = max(0, added - 1)
+            continue
+        removed = added = 0
+        if line.startswith(b"diff --git "):
+            diff_path = _diff_path(line)
+            path = None if diff_path is None else os.fsdecode(_unquote(diff_path))
+            if path is not None:
+                ranges[path] = []
+        elif (
+            line.startswith(b"deleted file mode ")
+            or line.rstrip(b"\t") == b"+++ /dev/null"
+        ):
+            if path is not None:
+                ranges.pop(path, None)
+            path = None
+        elif line.startswith(b"+++ "):
+            path = os.fsdecode(_unquote(line[4:].rstrip(b"\t")))
+            ranges.setdefault(path, [])
+        elif line.startswith(b"@@ "):
+            match = _HUNK.match(line)
+            if not match:
+                continue
+            removed = int(match.group(1)) if match.group(1) is not None else 1
+            start = int(match.group(2))
+            added = int(match.group(3)) if match.group(3) is not None else 1
+            if added and path is not None:
+                ranges[path].append((start, start + added - 1))
+    return ranges
+
+
+def changed_lines(cwd: str) -> LineRanges:
+    """Returns the changed line ranges of all staged files in one diff."""
+    return parse_patch(git_staged_patch(cwd))
+
+
+def in_changed_lines(ranges: Sequence[tuple[int, int]], line: int) -> bool:
+    """Checks if a line falls into one of the sorted ranges."""
+    index = bisect.bisect_right(ranges, (line, float("inf"))) - 1
+    return index >= 0 and ranges[index][0] <= line <= ranges[index][1]
+
+
+def load_changed_lines(path: str) -> LineRanges:
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    return {file: [tuple(r) for r in ranges] for file, ranges in data.items()}
+
+
+@contextmanager
+def published_changed_lines(cwd: str) -> Iterator[str]:
+    """
+    Writes the changed lines of the staged files as json, mapping each path
+    to a list of inclusive [first, last] line ranges. Yields the path of the
+    file, which is removed afterwards.
+    """
+    ranges = changed_lines(cwd)
+    fd, path = tempfile.mkstemp(prefix="hooked-changed-lines-", suffix=".json")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(ranges, f)
+        logger.debug(f"Published changed lines of {len(ranges)} files to {path}")
+        yield path
+    finally:
+        os.remove(path)
@@ -36,7 +36,7 @@ from hooked import (
     __min_gitleaks_version__,
     __min_precommit_version__,
 )
-from hooked.library.cmd_util import CommandError, run_cmd
+from hooked.library.cmd_util import CommandError
 from hooked.library.config import install_config
 from hooked.library.files import (
     copy_hooked_files,
@@ -52,6 +52,7 @@ from hooked.library.git import (
     git_unset_template_dir,
 )
 from hooked.library.logger import logger
+from hooked.library.toolchain import probe_versions, tool_version
 
 
 def _parse_version(v: str) -> Version:
@@ -66,24 +67,26 @@ def _parse_version(v: str) -> Version:
 
 def _get_gitleaks_version() -> str:
     try:
-        return str(run_cmd(["gitleaks", "--version"]).stdout)
+        return tool_version("gitleaks")
     except CommandError:
         raise
 
 
-def _check_gitleaks():
+def _check_gitleaks(verbose: bool = True) -> Version:
     try:
         version_raw = _get_gitleaks_version()
         version_split = version_raw.split()
         try:
             version = _parse_version(version_split[2])
-            logger.info(f"gitleaks version {version} found.")
+            if verbose:
+                logger.info(f"gitleaks version {version} found.")
         except (InvalidVersion, IndexError):
             raise RuntimeError(f"Unable to parse gitleaks version from: {version_raw}")
         if version < __min_gitleaks_version__:
             raise RuntimeError(
                 f"gitleaks must have minimum version of {__min_gitleaks_version__}"
             )
+        return version
     except CommandError as e:
         logger.error("gitleaks is not installed or not found in PATH.")
         logger.info(
@@ -99,7 +102,7 @@ def _check_gitleaks():
 
 def _get_git_version() -> str:
     try:
-        return str(run_cmd(["git", "--version"]).stdout)
+        return tool_version("git")
     except CommandError:
         raise
 
@@ -131,7 +134,7 @@ def _check_git():
 
 def _get_precommit_version() -> str:
     try:
-        return str(run_cmd(["pre-commit", "--version"]).stdout)
+        return tool_version("pre-commit")
     except CommandError:
         raise
 
@@ -165,6 +168,9 @@ def _check_precommit():
 
 
 def check_pre_requisites():
+    # probes the tools whose binaries changed concurrently, the checks below
+    # read their versions from the cache
+    probe_versions(["gitleaks", "git", "pre-commit"])
     try:
         _check_gitleaks()
         _check_git()
@@ -205,6 +211,7 @@ def enable():
 
 def install(rules: str, branch: str):
     logger.info("Installing hooked rules ...")
-    copy_hooked_files()
     install_config(get_base_dir(), rules, branch)
+    # after the rule set, its settings are baked into the pre-commit shim
+    copy_hooked_files()
     enable()
@@ -0,0 +1,102 @@
+#  Copyright 2025 T-Systems International GmbH
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are met:
+#
+#  1. Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#  2. Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+#
+#  3. Neither the name of the copyright holder nor the names of its
+#     contributors may be used to endorse or promote products derived from
+#     this software without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+#  DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+#  FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+#  DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+#  SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+#  CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+#  OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#  OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+from __future__ import annotations
+
+import hashlib
+import os
+
+from hooked import __version__
+from hooked.library.cmd_util import CommandError
+from hooked.library.files import get_cache_dir
+from hooked.library.git import git_head, git_write_tree
+from hooked.library.logger import logger
+from hooked.library.ruleset import ruleset_hash
+
+MEMO_SIZE = 256
+
+
+def _memo_file() -> str:
+    return os.path.join(get_cache_dir(), "index_memo")
+
+
+def _local_config_hash(local_config: str) -> str:
+    try:
+        with open(local_config, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except FileNotFoundError:
+        return ""
+
+
+def index_memo_key(cwd: str, config_dir: str, local_config: str) -> str | None:
+    """
+    Builds the memo key of the staged index.
+
+    The key covers the staged tree, HEAD, the rule set and the repository's own
+    pre-commit config. Returns None if the index can not be written as a tree,
+    e.g. during an unresolved merge.
+    """
+    try:
+        tree = git_write_tree(cwd)
+    except CommandError:
+        return None
+    h = hashlib.sha256()
+    for part in (
+        __version__,
+        tree,
+        *git_head(cwd),
+        ruleset_hash(config_dir),
+        _local_config_hash(local_config),
+    ):
+        h.update(part.encode())
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def _read_memo() -> list[str]:
+    try:
+        with open(_memo_file(), encoding="utf-8") as f:
+            return f.read().split()
+    except FileNotFoundError:
+        return []
+
+
+def has_index_memo(key: str) -> bool:
+    """Checks if an identical index already passed all hooks."""
+    return key in _read_memo()
+
+
+def record_index_memo(key: str):
+    """Remembers a passing index, keeping the most recent MEMO_SIZE entries."""
+    keys = [k for k in _read_memo() if k != key]
+    keys.append(key)
+    os.makedirs(get_cache_dir(), exist_ok=True)
+    tmp_file = f"{_memo_file()}.{os.getpid()}"
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        f.write("\n".join(keys[-MEMO_SIZE:]) + "\n")
+    os.replace(tmp_file, _memo_file())
+    logger.debug(f"Recorded index memo {key}")
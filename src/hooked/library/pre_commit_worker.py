@@ -0,0 +1,390 @@
+#  Copyright 2025 T-Systems International GmbH
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are met:
+#
+#  1. Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#  2. Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+#
+#  3. Neither the name of the copyright holder nor the names of its
+#     contributors may be used to endorse or promote products derived from
+#     this software without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+#  DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+#  FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+#  DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+#  SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+#  CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+#  OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#  OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+from __future__ import annotations
+
+import json
+import os
+import selectors
+import signal
+import socket
+import subprocess as sp
+import sys
+import threading
+from typing import IO, Any, Callable, Mapping, Sequence
+
+from hooked.library.logger import logger
+
+# `fork` runs pre-commit in processes forked from a worker that imported it
+# once, `subprocess` starts the pre-commit executable for every run
+BACKEND_ENV = "HOOKED_PRE_COMMIT_BACKEND"
+
+# returncode of a run that failed in hooked's code or whose answer was lost
+# with the worker, not mistaken for failing hooks
+_EX_SOFTWARE = 70
+
+# The worker is forked from hooked while it has no other threads and imports
+# pre-commit in the background. For every run hooked sends it the run's end of
+# a socketpair together with the stdout and stderr to use, the worker forks a
+# child that reads {"argv", "cwd", "env"} from that socket, calls pre-commit's
+# main() and exits. The worker reaps the child and answers {"rc": ...}, with a
+# negative rc for a signal like subprocess. Children start from the freshly
+# imported state of the worker, so no state leaks from one run to the next.
+
+
+def _pre_commit_main(argv: Sequence[str]) -> int:
+    from pre_commit.main import main
+
+    from hooked.library.forkserver import FORKSERVER_HOOKS_ENV, patch_pre_commit
+
+    hook_ids = os.getenv(FORKSERVER_HOOKS_ENV)
+    if hook_ids:
+        patch_pre_commit(set(hook_ids.split(",")))
+    return main(list(argv))
+
+
+def import_pre_commit():
+    """Imports what a run of pre-commit needs."""
+    import pre_commit.main  # noqa: F401
+
+
+def pre_commit_version() -> str:
+    """The output of `pre-commit --version` for the pre-commit hooked imports."""
+    from pre_commit.constants import VERSION
+
+    return f"pre-commit {VERSION}"
+
+
+def fork_backend() -> bool:
+    """Whether pre-commit should run in forked workers."""
+    backend = os.getenv(BACKEND_ENV, "fork").lower()
+    if backend not in ("fork", "subprocess"):
+        logger.warning(f"Unknown {BACKEND_ENV} {backend}, using fork.")
+    if backend == "subprocess" or not hasattr(os, "fork"):
+        return False
+    from importlib.util import find_spec
+
+    return find_spec("pre_commit") is not None
+
+
+def _send(sock: socket.socket, message: dict):
+    sock.sendall(json.dumps(message).encode() + b"\n")
+
+
+def _child(
+    req: socket.socket,
+    stdout: int,
+    stderr: int,
+    entry: Callable[[Sequence[str]], int],
+):
+    """Runs one request in a child of the worker, never returns."""
+    rc = _EX_SOFTWARE
+    try:
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+        message = json.loads(req.makefile("rb").readline())
+        req.close()
+        os.dup2(stdout, 1)
+        os.dup2(stderr, 2)
+        for fd in {stdout, stderr} - {1, 2}:
+            os.close(fd)
+        # pre-commit writes to whatever sys.stdout is, make that fd 1 again
+        if sys.__stdout__ and sys.__stderr__:
+            sys.stdout, sys.stderr = sys.__stdout__, sys.__stderr__
+        os.chdir(message["cwd"])
+        os.environ.clear()
+        os.environ.update(message["env"])
+        rc = entry(message["argv"][1:])
+    except SystemExit as e:
+        rc = e.code if isinstance(e.code, int) else int(e.code is not None)
+    except KeyboardInterrupt:
+        rc = 130
+    except BaseException:
+        import traceback
+
+        traceback.print_exc()
+    finally:
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        finally:
+            os._exit(rc)
+
+
+def _serve(
+    control: socket.socket,
+    entry: Callable[[Sequence[str]], int],
+    warm: Callable[[], None] | None,
+):
+    """The worker's loop, forks a child per request until hooked hangs up."""
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    wakeup_r, wakeup_w = os.pipe()
+    os.set_blocking(wakeup_w, False)
+    signal.set_wakeup_fd(wakeup_w)
+    signal.signal(signal.SIGCHLD, lambda signum, frame: None)
+    if warm:
+        try:
+            warm()
+        except Exception as e:
+            logger.debug(f"pre-commit worker could not import pre-commit: {e}")
+
+    children: dict[int, socket.socket] = {}
+    selector = selectors.DefaultSelector()
+    selector.register(control, selectors.EVENT_READ)
+    selector.register(wakeup_r, selectors.EVENT_READ)
+    open_ = True
+    while open_ or children:
+        for key, _ in selector.select():
+            if key.fileobj == wakeup_r:
+                os.read(wakeup_r, 512)
+                continue
+            _, fds, _, _ = socket.recv_fds(control, 1, 3)
+            if not fds:
+                selector.unregister(control)
+                open_ = False
+                continue
+            req = socket.socket(fileno=fds[0])
+            pid = os.fork()
+            if pid == 0:
+                selector.close()
+                control.close()
+                signal.set_wakeup_fd(-1)
+                signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+                os.close(wakeup_r)
+                os.close(wakeup_w)
+                for other in children.values():
+                    other.close()
+                _child(req, fds[1], fds[2], entry)
+            for fd in fds[1:]:
+                os.close(fd)
+            children[pid] = req
+
+        while children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                break
+            req = children.pop(pid)
+            try:
+                _send(req, {"rc": os.waitstatus_to_exitcode(status)})
+            except OSError:
+                pass
+            req.close()
+
+
+class WorkerProcess:
+    """A pre-commit run in the worker, with the parts of Popen hooked uses."""
+
+    def __init__(
+        self,
+        worker: PreCommitWorker,
+        args: Sequence[str],
+        *,
+        cwd: str | None = None,
+        env: Mapping[str, str] | None = None,
+        stdout: int | None = None,
+        stderr: int | None = None,
+        text: bool = False,
+        **_: Any,
+    ):
+        self.args = args
+        self.returncode: int | None = None
+        self.stdout: IO | None = None
+        self.stderr: IO | None = None
+        mode = "r" if text else "rb"
+
+        pipes = []
+        out_w = 1
+        if stdout == sp.PIPE:
+            out_r, out_w = os.pipe()
+            pipes.append(out_w)
+            self.stdout = open(out_r, mode)
+        err_w = 2
+        if stderr == sp.STDOUT:
+            err_w = out_w
+        elif stderr == sp.PIPE:
+            err_r, err_w = os.pipe()
+            pipes.append(err_w)
+            self.stderr = open(err_r, mode)
+
+        try:
+            self._sock = worker.submit(args, cwd, env, out_w, err_w)
+        except BaseException:
+            for stream in (self.stdout, self.stderr):
+                if stream:
+                    stream.close()
+            raise
+        finally:
+            for fd in pipes:
+                os.close(fd)
+
+    def wait(self) -> int:
+        if self.returncode is None:
+            with self._sock:
+                line = self._sock.makefile("rb").readline()
+            try:
+                self.returncode = int(json.loads(line)["rc"])
+            except (ValueError, KeyError):
+                logger.debug(f"pre-commit worker died running {self.args!r}")
+                self.returncode = _EX_SOFTWARE
+        return self.returncode
+
+    def communicate(self) -> tuple[Any, Any]:
+        errors = []
+        reader = None
+        if self.stderr:
+            stream = self.stderr
+            reader = threading.Thread(target=lambda: errors.append(stream.read()))
+            reader.start()
+        out = self.stdout.read() if self.stdout else None
+        if reader:
+            reader.join()
+        self._close_streams()
+        self.wait()
+        return out, errors[0] if errors else None
+
+    def _close_streams(self):
+        for stream in (self.stdout, self.stderr):
+            if stream:
+                stream.close()
+
+    def __enter__(self) -> WorkerProcess:
+        return self
+
+    def __exit__(self, *exc_info):
+        self._close_streams()
+        self.wait()
+
+
+class PreCommitWorker:
+    """
+    A process forked from hooked that runs pre-commit without starting an
+    interpreter and importing pre-commit for every run.
+    """
+
+    def __init__(
+        self,
+        entry: Callable[[Sequence[str]], int] = _pre_commit_main,
+        warm: Callable[[], None] | None = import_pre_commit,
+    ):
+        self._entry = entry
+        self._warm = warm
+        self._lock = threading.Lock()
+        self._control: socket.socket | None = None
+        self.pid: int | None = None
+
+    def start(self) -> bool:
+        """Forks the worker, False if hooked runs other threads already."""
+        if threading.active_count() > 1:
+            logger.debug("Not forking a pre-commit worker from threads.")
+            return False
+        parent, child = socket.socketpair()
+        for stream in (sys.stdout, sys.stderr, sys.__stdout__, sys.__stderr__):
+            if stream:
+                stream.flush()
+        pid = os.fork()
+        if pid == 0:
+            parent.close()
+            try:
+                _serve(child, self._entry, self._warm)
+            finally:
+                os._exit(0)
+        child.close()
+        self._control = parent
+        self.pid = pid
+        return True
+
+    def submit(
+        self,
+        argv: Sequence[str],
+        cwd: str | None,
+        env: Mapping[str, str] | None,
+        stdout: int,
+        stderr: int,
+    ) -> socket.socket:
+        """Starts a run, returns the socket its returncode arrives on."""
+        if self._control is None:
+            raise OSError("pre-commit worker is not running")
+        ours, theirs = socket.socketpair()
+        try:
+            with self._lock:
+                socket.send_fds(
+                    self._control, [b"\0"], [theirs.fileno(), stdout, stderr]
+                )
+            theirs.close()
+            _send(
+                ours,
+                {
+                    "argv": list(argv),
+                    "cwd": cwd or os.getcwd(),
+                    "env": dict(os.environ if env is None else env),
+                },
+            )
+        except BaseException:
+            ours.close()
+            theirs.close()
+            raise
+        return ours
+
+    def popen(self, args: Sequence[str], **kwargs: Any) -> Popen:
+        """Popen for pre-commit commands, anything else runs as a subprocess."""
+        if not args or os.path.basename(args[0]) != "pre-commit":
+            return sp.Popen(args, **kwargs)
+        try:
+            return WorkerProcess(self, args, **kwargs)
+        except OSError as e:
+            logger.debug(f"pre-commit worker unavailable, starting pre-commit: {e}")
+            return sp.Popen(args, **kwargs)
+
+    def close(self):
+        """Lets the worker exit once its runs finished."""
+        if self._control is not None:
+            self._control.close()
+            self._control = None
+        if self.pid is not None:
+            try:
+                os.waitpid(self.pid, 0)
+            except ChildProcessError:
+                pass
+            self.pid = None
+
+
+Popen = sp.Popen | WorkerProcess
+
+
+def start_worker() -> PreCommitWorker | None:
+    """Starts a pre-commit worker if the fork backend is enabled and possible."""
+    if not fork_backend():
+        return None
+    worker = PreCommitWorker()
+    if not worker.start():
+        return None
+    import atexit
+
+    atexit.register(worker.close)
+    return worker
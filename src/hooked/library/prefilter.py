@@ -0,0 +1,321 @@
+#  Copyright 2025 T-Systems International GmbH
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are met:
+#
+#  1. Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#  2. Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+#
+#  3. Neither the name of the copyright holder nor the names of its
+#     contributors may be used to endorse or promote products derived from
+#     this software without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+#  DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+#  FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+#  DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+#  SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+#  CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+#  OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#  OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+from __future__ import annotations
+
+import base64
+import hashlib
+import json
+import os
+import re
+import tomllib
+from functools import lru_cache
+from typing import Iterable, Iterator
+
+from hooked.library.cmd_util import CommandError, run_cmd
+from hooked.library.files import get_cache_dir
+from hooked.library.git import StagedEntry, git_object_reader, git_staged_changes
+from hooked.library.logger import logger
+
+# gitleaks only applies a rule to a fragment if one of the rule's keywords
+# occurs in the lower cased fragment or in a lower cased decoding of it. With
+# --staged the fragments are the added lines of the staged diff, which are part
+# of the staged blobs. So if no keyword occurs in any staged blob, nor in any
+# base64, hex, percent or unicode escape decoding of it, no rule can match and
+# gitleaks can be skipped. Whenever that argument does not hold, e.g. for rules
+# without keywords, extended configs or textconv diff drivers, nothing is
+# skipped.
+
+# staged bytes above which scanning costs more than running gitleaks
+DEFAULT_PREFILTER_BYTES = 1024 * 1024
+
+_NULL_SHA = "0" * 40
+_GITLINK = "160000"
+# non ASCII characters that lower case to ASCII ones in go
+_FOLDS = ((b"\xe2\x84\xaa", b"k"), (b"\xc4\xb0", b"i"))
+# encoded segments as found by the gitleaks decoder
+_BASE64 = b"+-/0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ_abcdefghijklmnopqrstuvwxyz"
+# maps everything but the base64 alphabet to spaces
+_BASE64_ONLY = bytes(c if c in _BASE64 else 32 for c in range(256))
+_HEX = re.compile(rb"[0-9A-Fa-f]{32,}")
+_PERCENT = re.compile(rb"%([0-9A-Fa-f]{2})")
+_ESCAPE = re.compile(rb"\\{1,2}[uU]([0-9A-Fa-f]{4})")
+_CODE_POINT = re.compile(rb"U\+([0-9A-Fa-f]{4})")
+_CODE_POINT_SPACE = re.compile(rb"U\+([0-9A-Fa-f]{4})\s?")
+_URLSAFE = bytes.maketrans(b"-_", b"+/")
+# diff drivers that make `git diff` show something else than the blobs
+_DIFF_DRIVERS = r"^diff\.(external|.*\.textconv|.*\.command)$"
+
+
+class BudgetExceeded(Exception):
+    pass
+
+
+def extract_keywords(config: dict) -> tuple[str, ...] | None:
+    """
+    Returns the lower cased keywords of all rules of a gitleaks config, None if
+    a rule has no keywords or the config extends another one.
+    """
+    if "extend" in config:
+        return None
+    rules = config.get("rules")
+    if not isinstance(rules, list) or not rules:
+        return None
+    keywords = set()
+    for rule in rules:
+        rule_keywords = rule.get("keywords") if isinstance(rule, dict) else None
+        if not rule_keywords or not isinstance(rule_keywords, list):
+            return None
+        for keyword in rule_keywords:
+            keyword = str(keyword).lower()
+            if not keyword or not keyword.isascii():
+                return None
+            keywords.add(keyword)
+    return tuple(sorted(keywords))
+
+
+def load_keywords(config_file: str) -> tuple[str, ...] | None:
+    """Reads the keywords of a gitleaks config, cached by the config's hash."""
+    with open(config_file, "rb") as f:
+        data = f.read()
+    digest = hashlib.sha256(data).hexdigest()
+    cache_file = os.path.join(get_cache_dir(), "gitleaks", f"{digest}.json")
+    try:
+        with open(cache_file, encoding="utf-8") as f:
+            cached = json.load(f)["keywords"]
+        return tuple(cached) if cached is not None else None
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+
+    try:
+        keywords = extract_keywords(tomllib.loads(data.decode()))
+    except (tomllib.TOMLDecodeError, UnicodeDecodeError) as e:
+        logger.debug(f"Could not read keywords from {config_file}: {e}")
+        return None
+
+    tmp_file = f"{cache_file}.{os.getpid()}"
+    try:
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump({"keywords": keywords}, f)
+        os.replace(tmp_file, cache_file)
+    except OSError as e:
+        logger.debug(f"Could not cache the gitleaks keywords: {e}")
+        try:
+            os.remove(tmp_file)
+        except OSError:
+            pass
+    return keywords
+
+
+@lru_cache(maxsize=4)
+def keyword_pattern(keywords: tuple[str, ...]) -> re.Pattern[bytes]:
+    """
+    Compiles keywords into a single regex shaped like a trie, so each position
+    is checked against the distinct first characters only. A keyword that is
+    the prefix of another one ends the branch, as it already matches.
+    """
+    trie: dict = {}
+    for keyword in keywords:
+        node = trie
+        for c in keyword.encode():
+            if node.get(None):
+                break
+            node = node.setdefault(c, {})
+        else:
+            node.clear()
+            node[None] = True
+
+    def build(node: dict) -> bytes:
+        if node.get(None):
+            return b""
+        branches = [re.escape(bytes([c])) + build(child) for c, child in node.items()]
+        if len(branches) == 1:
+            return branches[0]
+        return b"(?:" + b"|".join(branches) + b")"
+
+    return re.compile(build(trie))
+
+
+def _fold(data: bytes) -> bytes:
+    for special, ascii_char in _FOLDS:
+        if special in data:
+            data = data.replace(special, ascii_char)
+    return data.lower()
+
+
+def _base64(segments: list[bytes]) -> Iterator[bytes]:
+    """
+    Decodes all segments at each of the four alignments in one go. Segments
+    are completed to whole quanta, so the concatenation decodes to the
+    concatenated decodings, plus zero bytes where a segment was completed.
+    """
+    for offset in range(4):
+        parts = []
+        for segment in segments:
+            value = segment[offset:]
+            rest = len(value) % 4
+            if rest == 1:
+                value = value[:-1]
+            elif rest:
+                value += b"A" * (4 - rest)
+            parts.append(value)
+        yield base64.b64decode(b"".join(parts).translate(_URLSAFE))
+
+
+def _hex(segments: list[bytes]) -> Iterator[bytes]:
+    for offset in range(2):
+        parts = []
+        for segment in segments:
+            value = segment[offset:]
+            parts.append(value[: len(value) - len(value) % 2])
+        yield bytes.fromhex(b"".join(parts).decode())
+
+
+def _lines(pattern: re.Pattern[bytes], data: bytes) -> list[bytes]:
+    """Returns the lines of data with a match of pattern."""
+    lines = []
+    end = 0
+    while match := pattern.search(data, end):
+        start = data.rfind(b"\n", 0, match.start()) + 1
+        end = data.find(b"\n", match.end())
+        if end < 0:
+            end = len(data)
+        lines.append(data[start:end])
+    return lines
+
+
+def _char(match: re.Match[bytes]) -> bytes:
+    return chr(int(match.group(1), 16)).encode(errors="replace")
+
+
+def _decodings(data: bytes) -> Iterator[bytes]:
+    """
+    Yields decodings of data that cover everything gitleaks decodes: all
+    base64 and hex segments at every alignment, the lines with percent or
+    unicode escapes, and unicode code points with and without the whitespace
+    after them. Joining decodings may only add matches.
+    """
+    # the runs of at least 16 base64 characters, hex segments are part of them
+    segments = [s for s in data.translate(_BASE64_ONLY).split() if len(s) >= 16]
+    if segments:
+        yield from _base64(segments)
+    if segments := _HEX.findall(b" ".join(segments)):
+        yield from _hex(segments)
+    if lines := _lines(_PERCENT, data):
+        yield _PERCENT.sub(lambda m: bytes([int(m.group(1), 16)]), b"\n".join(lines))
+    if (b"\\u" in data or b"\\U" in data) and (lines := _lines(_ESCAPE, data)):
+        yield _ESCAPE.sub(_char, b"\n".join(lines))
+    if b"U+" in data and _CODE_POINT.search(data):
+        yield _CODE_POINT.sub(_char, data)
+        yield _CODE_POINT_SPACE.sub(_char, data)
+
+
+def contains_keyword(
+    pattern: re.Pattern[bytes], data: bytes, budget: list[int]
+) -> bool:
+    """
+    Checks data and, recursively, its decodings for keywords. The budget of
+    bytes to scan is shared between calls and bounds the effort.
+
+    Raises:
+        BudgetExceeded: If scanning needs more bytes than the budget allows.
+    """
+    pending = [data]
+    while pending:
+        data = pending.pop()
+        budget[0] -= len(data)
+        if budget[0] < 0:
+            raise BudgetExceeded()
+        if pattern.search(_fold(data)):
+            return True
+        pending.extend(_decodings(data))
+    return False
+
+
+def _has_diff_drivers(cwd: str) -> bool:
+    try:
+        run_cmd(["git", "config", "--get-regexp", _DIFF_DRIVERS], cwd=cwd)
+    except CommandError as e:
+        # exit code 1: no such config
+        return e.result.returncode != 1
+    return True
+
+
+def _contents(cwd: str, entries: list[StagedEntry], max_bytes: int) -> Iterable[bytes]:
+    """
+    Yields the staged content of the entries.
+
+    Raises:
+        BudgetExceeded: If the blobs alone are larger than max_bytes.
+    """
+    for entry in entries:
+        if entry.mode == _GITLINK:
+            # shown as "Subproject commit <sha>" in the diff
+            yield f"Subproject commit {entry.sha}".encode()
+    shas = [entry.sha for entry in entries if entry.mode != _GITLINK]
+    reader = git_object_reader(cwd)
+    # sizes are cheap, don't read blobs that can't fit the budget anyway
+    if sum(info[1] if info else 0 for info in reader.info(shas)) > max_bytes:
+        raise BudgetExceeded()
+    for content in reader.contents(shas):
+        # scanning needs the bytes methods, the view is reused for the next blob
+        yield bytes(content)
+
+
+def may_leak(
+    cwd: str, config_file: str, max_bytes: int = DEFAULT_PREFILTER_BYTES
+) -> bool:
+    """
+    Returns False only if gitleaks can not find anything in the staged
+    changes with the given config, True if it can or that is unknown.
+    """
+    keywords = load_keywords(config_file)
+    if not keywords:
+        logger.debug("gitleaks rules without keywords, can not prefilter.")
+        return True
+    if _has_diff_drivers(cwd):
+        logger.debug("Custom diff drivers configured, can not prefilter.")
+        return True
+
+    entries = git_staged_changes(cwd)
+    if any(entry.sha == _NULL_SHA for entry in entries):
+        return True
+
+    pattern = keyword_pattern(keywords)
+    budget = [max_bytes]
+    try:
+        for content in _contents(cwd, entries, max_bytes):
+            if contains_keyword(pattern, content, budget):
+                return True
+    except BudgetExceeded:
+        logger.debug(f"Staged changes exceed {max_bytes} bytes, can not prefilter.")
+        return True
+    except CommandError as e:
+        logger.debug(f"Could not read staged blobs: {e}")
+        return True
+    return False
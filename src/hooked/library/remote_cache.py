@@ -0,0 +1,189 @@
+#  Copyright 2025 T-Systems International GmbH
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are met:
+#
+#  1. Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#  2. Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+#
+#  3. Neither the name of the copyright holder nor the names of its
+#     contributors may be used to endorse or promote products derived from
+#     this software without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+#  DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+#  FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+#  DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+#  SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+#  CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+#  OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#  OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+from __future__ import annotations
+
+import http.client
+import json
+import threading
+import urllib.error
+import urllib.request
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from hooked.library.logger import logger
+from hooked.library.verdict_cache import KEY_SIZE, VerdictCache
+
+# Protocol, all bodies are JSON and keys are hex encoded verdict keys:
+#   POST /v1/lookup  {"keys": [...]}  ->  200 {"hits": [...]}
+#   POST /v1/upload  {"keys": [...]}  ->  204
+LOOKUP_PATH = "/v1/lookup"
+UPLOAD_PATH = "/v1/upload"
+MAX_KEYS = 100_000
+DEFAULT_REMOTE_TIMEOUT = 0.5
+DEFAULT_PORT = 8420
+
+
+def _encode_keys(keys) -> bytes:
+    return json.dumps({"keys": [key.hex() for key in keys]}).encode()
+
+
+def _decode_keys(values) -> list[bytes]:
+    if not isinstance(values, list) or len(values) > MAX_KEYS:
+        raise ValueError("expected a list of keys")
+    if not all(isinstance(value, str) for value in values):
+        raise ValueError("expected hex encoded keys")
+    keys = [bytes.fromhex(value) for value in values]
+    if any(len(key) != KEY_SIZE for key in keys):
+        raise ValueError("invalid key size")
+    return keys
+
+
+class RemoteVerdictCache:
+    """
+    Client of a shared verdict cache.
+
+    Every call is a single round trip bounded by the timeout. Failures are
+    logged and treated like misses, so hooks simply run locally.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        timeout: float = DEFAULT_REMOTE_TIMEOUT,
+        token: str | None = None,
+    ):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+        self.token = token
+
+    def _post(self, path: str, keys) -> bytes:
+        request = urllib.request.Request(
+            self.url + path,
+            data=_encode_keys(keys),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        if self.token:
+            request.add_header("Authorization", f"Bearer {self.token}")
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return response.read()
+
+    def lookup(self, keys: list[bytes]) -> set[bytes]:
+        """Returns the subset of keys the server knows as passing."""
+        if not keys:
+            return set()
+        try:
+            body = json.loads(self._post(LOOKUP_PATH, keys))
+            return set(_decode_keys(body.get("hits", []))) & set(keys)
+        except (
+            OSError,
+            ValueError,
+            TypeError,
+            AttributeError,
+            http.client.HTTPException,
+        ) as e:
+            # a broken server is a miss, hooks run locally
+            logger.debug(f"Remote verdict cache lookup failed: {e}")
+            return set()
+
+    def upload(self, keys: list[bytes]):
+        """Publishes passing verdicts, errors are ignored."""
+        if not keys:
+            return
+        try:
+            self._post(UPLOAD_PATH, keys)
+        except (OSError, ValueError, http.client.HTTPException) as e:
+            logger.debug(f"Remote verdict cache upload failed: {e}")
+
+
+class _CacheHandler(BaseHTTPRequestHandler):
+    server: CacheServer
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+    def _reply(self, status: HTTPStatus, body: dict | None = None):
+        data = json.dumps(body).encode() if body is not None else b""
+        self.send_response(status)
+        if data:
+            self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        if self.server.token and (
+            self.headers.get("Authorization") != f"Bearer {self.server.token}"
+        ):
+            self._reply(HTTPStatus.UNAUTHORIZED)
+            return
+        if self.path not in (LOOKUP_PATH, UPLOAD_PATH):
+            self._reply(HTTPStatus.NOT_FOUND)
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            if not 0 <= length <= MAX_KEYS * (KEY_SIZE * 2 + 4) + 64:
+                raise ValueError("invalid request size")
+            keys = _decode_keys(json.loads(self.rfile.read(length)).get("keys"))
+        except (ValueError, TypeError, AttributeError):
+            self._reply(HTTPStatus.BAD_REQUEST)
+            return
+
+        with self.server.lock:
+            if self.path == LOOKUP_PATH:
+                hits = [key.hex() for key in keys if self.server.cache.contains(key)]
+            else:
+                for key in keys:
+                    self.server.cache.add(key)
+        if self.path == LOOKUP_PATH:
+            self._reply(HTTPStatus.OK, {"hits": hits})
+        else:
+            self._reply(HTTPStatus.NO_CONTENT)
+
+
+class CacheServer(ThreadingHTTPServer):
+    """Reference verdict cache server backed by a local verdict index."""
+
+    daemon_threads = True
+
+    def __init__(self, address: tuple[str, int], cache: VerdictCache, token=None):
+        super().__init__(address, _CacheHandler)
+        self.cache = cache
+        self.token = token
+        self.lock = threading.Lock()
+
+
+def serve(host: str, port: int, cache_file: str, size: int, token: str | None):
+    """Runs the verdict cache server until interrupted."""
+    with VerdictCache(cache_file, size=size) as cache:
+        with CacheServer((host, port), cache, token) as server:
+            logger.info(f"Serving verdict cache on http://{host}:{server.server_port}")
+            try:
+                server.serve_forever()
+            except KeyboardInterrupt:
+                pass
@@ -0,0 +1,333 @@
+#  Copyright 2025 T-Systems International GmbH
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are met:
+#
+#  1. Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#  2. Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+#
+#  3. Neither the name of the copyright holder nor the names of its
+#     contributors may be used to endorse or promote products derived from
+#     this software without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+#  DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+#  FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+#  DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+#  SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+#  CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+#  OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#  OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+from __future__ import annotations
+
+import hashlib
+import os
+from dataclasses import dataclass, field
+from enum import StrEnum
+
+import yaml
+
+from hooked.library.logger import logger
+
+SETTINGS_FILE = ".hooked.yaml"
+PRE_COMMIT_CONFIG = ".pre-commit-config.yaml"
+GITLEAKS_CONFIG = ".gitleaks.toml"
+
+# hooks from pre-commit-hooks (and friends) that never modify files
+READ_ONLY_HOOKS = frozenset(
+    {
+        "check-added-large-files",
+        "check-ast",
+        "check-builtin-literals",
+        "check-case-conflict",
+        "check-docstring-first",
+        "check-executables-have-shebangs",
+        "check-illegal-windows-names",
+        "check-json",
+        "check-merge-conflict",
+        "check-shebang-scripts-are-executable",
+        "check-symlinks",
+        "check-toml",
+        "check-vcs-permalinks",
+        "check-xml",
+        "check-yaml",
+        "debug-statements",
+        "destroyed-symlinks",
+        "detect-aws-credentials",
+        "detect-private-key",
+        "forbid-new-submodules",
+        "forbid-submodules",
+        "gitleaks",
+        "gitleaks-docker",
+        "gitleaks-system",
+        "name-tests-test",
+        "no-commit-to-branch",
+    }
+)
+
+# read-only hooks whose verdict depends only on path, mode and content of a
+# single file; anything looking at git state, other files or the host is not
+CACHEABLE_HOOKS = frozenset(
+    {
+        "check-ast",
+        "check-builtin-literals",
+        "check-docstring-first",
+        "check-executables-have-shebangs",
+        "check-illegal-windows-names",
+        "check-json",
+        "check-shebang-scripts-are-executable",
+        "check-toml",
+        "check-vcs-permalinks",
+        "check-xml",
+        "check-yaml",
+        "debug-statements",
+        "detect-private-key",
+        "name-tests-test",
+    }
+)
+
+# read-only hooks that check the repository instead of the files handed to
+# them (pass_filenames: false or always_run in their manifest)
+REPOSITORY_HOOKS = frozenset(
+    {
+        "gitleaks",
+        "gitleaks-docker",
+        "gitleaks-system",
+        "no-commit-to-branch",
+    }
+)
+
+# secret scanners, these always block the commit
+SECRET_HOOKS = frozenset(
+    {
+        "detect-aws-credentials",
+        "detect-private-key",
+        "detect-secrets",
+        "gitleaks",
+        "gitleaks-docker",
+        "gitleaks-system",
+        "ggshield",
+        "trufflehog",
+    }
+)
+
+
+class HookTier(StrEnum):
+    """When a read-only hook runs: before the commit, or after it."""
+
+    BLOCKING = "blocking"
+    DEFERRED = "deferred"
+
+
+@dataclass(frozen=True)
+class HookSpec:
+    """A single hook as declared in a pre-commit config."""
+
+    id: str
+    repo: str
+    rev: str | None = None
+    args: tuple[str, ...] = ()
+    pass_filenames: bool = True
+    always_run: bool = False
+
+    @property
+    def runs_on_files(self) -> bool:
+        """Whether the hook only checks the files pre-commit hands to it."""
+        return (
+            self.pass_filenames
+            and not self.always_run
+            and self.id not in REPOSITORY_HOOKS
+        )
+
+
+@dataclass
+class HookSettings:
+    """Per-hook overrides declared by the rule set."""
+
+    read_only: bool | None = None
+    cacheable: bool | None = None
+    tier: HookTier | None = None
+    # run a python hook in a forkserver of its environment
+    forkserver: bool = False
+
+
+@dataclass
+class RulesetSettings:
+    """Hooked specific settings shipped with the rule set in .hooked.yaml."""
+
+    hooks: dict[str, HookSettings] = field(default_factory=dict)
+    remote_cache: str | None = None
+    sequencer_policy: str | None = None
+    fail_fast: bool = False
+    # publish the changed lines of staged files to hooks
+    changed_lines: bool = False
+    # hooked's own checks only report findings on changed lines
+    changed_lines_only: bool = False
+    # scan staged changes with gitleaks next to the pre-commit run
+    native_gitleaks: bool = False
+    # skip the gitleaks hooks of the rule set while the native scan runs
+    drop_gitleaks_hook: bool = False
+    # glob patterns of repository paths hooked never runs in
+    exclude_repos: list[str] = field(default_factory=list)
+
+    def is_read_only(self, hook_id: str) -> bool:
+        override = self.hooks.get(hook_id)
+        if override and override.read_only is not None:
+            return override.read_only
+        return hook_id in READ_ONLY_HOOKS
+
+    def is_cacheable(self, hook_id: str) -> bool:
+        if not self.is_read_only(hook_id):
+            return False
+        override = self.hooks.get(hook_id)
+        if override and override.cacheable is not None:
+            return override.cacheable
+        return hook_id in CACHEABLE_HOOKS
+
+    def hook_tier(self, hook_id: str) -> HookTier | None:
+        """
+        The declared tier of a hook. Secret scanners and hooks that check the
+        repository are always blocking: deferred hooks run in a detached work
+        tree once the commit has landed, e.g. the branch is no longer checked.
+        """
+        if hook_id in SECRET_HOOKS or hook_id in REPOSITORY_HOOKS:
+            return HookTier.BLOCKING
+        override = self.hooks.get(hook_id)
+        return override.tier if override else None
+
+    def forkserver_hooks(self) -> list[str]:
+        """Ids of the hooks that opted into running in forkservers."""
+        return [hook_id for hook_id, hook in self.hooks.items() if hook.forkserver]
+
+
+# parsed yaml files by path, with the stat the content was read at
+_yaml_cache: dict[str, tuple[tuple[int, int, int], dict]] = {}
+
+
+def _load_yaml(path: str) -> dict:
+    """Parses a yaml file once per version of it, the result must not be changed."""
+    st = os.stat(path)
+    key = (st.st_mtime_ns, st.st_size, st.st_ino)
+    cached = _yaml_cache.get(path)
+    if cached and cached[0] == key:
+        return cached[1]
+    with open(path, encoding="utf-8") as f:
+        data = yaml.safe_load(f)
+    data = data if isinstance(data, dict) else {}
+    _yaml_cache[path] = (key, data)
+    return data
+
+
+def _parse_tier(hook_id: str, value: str | None) -> HookTier | None:
+    if value is None:
+        return None
+    try:
+        tier = HookTier(str(value).lower())
+    except ValueError:
+        logger.warning(f"Ignoring unknown tier {value} of hook {hook_id}.")
+        return None
+    if tier == HookTier.DEFERRED and hook_id in SECRET_HOOKS:
+        logger.warning(f"Secret scanner {hook_id} can not be deferred.")
+    return tier
+
+
+def _string_list(value) -> list[str]:
+    if isinstance(value, str):
+        return [value]
+    if isinstance(value, list):
+        return [str(item) for item in value]
+    return []
+
+
+def load_settings(config_dir: str) -> RulesetSettings:
+    """Reads .hooked.yaml from the rule set, returns defaults if absent."""
+    path = os.path.join(config_dir, SETTINGS_FILE)
+    try:
+        data = _load_yaml(path)
+    except FileNotFoundError:
+        return RulesetSettings()
+    except yaml.YAMLError as e:
+        logger.warning(f"Ignoring invalid {SETTINGS_FILE}: {e}")
+        return RulesetSettings()
+
+    settings = RulesetSettings(
+        remote_cache=data.get("remote_cache"),
+        sequencer_policy=data.get("sequencer_policy"),
+        fail_fast=bool(data.get("fail_fast", False)),
+        changed_lines=bool(data.get("changed_lines", False)),
+        changed_lines_only=bool(data.get("changed_lines_only", False)),
+        native_gitleaks=bool(data.get("native_gitleaks", False)),
+        drop_gitleaks_hook=bool(data.get("drop_gitleaks_hook", False)),
+        exclude_repos=_string_list(data.get("exclude_repos")),
+    )
+    for hook_id, values in (data.get("hooks") or {}).items():
+        values = values or {}
+        settings.hooks[str(hook_id)] = HookSettings(
+            read_only=values.get("read_only"),
+            cacheable=values.get("cacheable"),
+            tier=_parse_tier(hook_id, values.get("tier")),
+            forkserver=bool(values.get("forkserver", False)),
+        )
+    return settings
+
+
+def _runs_at_pre_commit(hook: dict, default_stages: list[str] | None) -> bool:
+    stages = hook.get("stages") or default_stages
+    if not stages:
+        return True
+    return "pre-commit" in stages or "commit" in stages
+
+
+def load_hooks(config_file: str) -> list[HookSpec]:
+    """
+    Returns the hooks of a pre-commit config that run at commit time.
+
+    Raises:
+        ValueError: If the config can not be parsed.
+    """
+    try:
+        data = _load_yaml(config_file)
+        default_stages = data.get("default_stages")
+        hooks = []
+        for repo in data.get("repos") or []:
+            for hook in repo.get("hooks") or []:
+                if not _runs_at_pre_commit(hook, default_stages):
+                    continue
+                hooks.append(
+                    HookSpec(
+                        id=str(hook["id"]),
+                        repo=str(repo.get("repo")),
+                        rev=repo.get("rev"),
+                        args=tuple(str(arg) for arg in hook.get("args") or ()),
+                        pass_filenames=bool(hook.get("pass_filenames", True)),
+                        always_run=bool(hook.get("always_run", False)),
+                    )
+                )
+    except (yaml.YAMLError, AttributeError, KeyError, TypeError) as e:
+        raise ValueError(f"Invalid pre-commit config {config_file}: {e}") from e
+    return hooks
+
+
+def file_hash(path: str) -> str:
+    """Returns the sha256 hex digest of a file's content."""
+    with open(path, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+def ruleset_hash(config_dir: str) -> str:
+    """Returns a hash over all files of the rule set hooked reads."""
+    h = hashlib.sha256()
+    for name in (PRE_COMMIT_CONFIG, GITLEAKS_CONFIG, SETTINGS_FILE):
+        h.update(name.encode())
+        try:
+            h.update(file_hash(os.path.join(config_dir, name)).encode())
+        except FileNotFoundError:
+            h.update(b"-")
+    return h.hexdigest()
@@ -0,0 +1,141 @@
+#  Copyright 2025 T-Systems International GmbH
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are met:
+#
+#  1. Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#  2. Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+#
+#  3. Neither the name of the copyright holder nor the names of its
+#     contributors may be used to endorse or promote products derived from
+#     this software without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+#  DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+#  FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+#  DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+#  SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+#  CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+#  OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#  OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Sequence
+
+from hooked.library.cmd_util import CommandResult
+from hooked.library.ruleset import HookSpec, HookTier, RulesetSettings
+from hooked.library.stats import DEFAULT_HOOK_DURATION, RepoStats
+
+
+@dataclass
+class HookResult:
+    id: str
+    returncode: int
+    duration: float
+
+    @property
+    def ok(self) -> bool:
+        return self.returncode == 0
+
+
+def parse_skip(value: str | None) -> set[str]:
+    """Parses the hook ids of the SKIP variable like pre-commit does."""
+    return {hook_id.strip() for hook_id in (value or "").split(",") if hook_id.strip()}
+
+
+def split_hooks(
+    hooks: Sequence[HookSpec], settings: RulesetSettings, skip: set[str]
+) -> tuple[list[str], list[str]]:
+    """
+    Splits the hook ids of a config into fixers and read-only checks, both in
+    config order. Hooks listed in skip are left out of the checks.
+    """
+    fixers: list[str] = []
+    checks: list[str] = []
+    for hook in hooks:
+        if hook.id in fixers or hook.id in checks:
+            continue
+        if not settings.is_read_only(hook.id):
+            fixers.append(hook.id)
+        elif hook.id not in skip:
+            checks.append(hook.id)
+    return fixers, checks
+
+
+def plan_deferral(
+    checks: Sequence[str],
+    settings: RulesetSettings,
+    stats: RepoStats,
+    budget: float | None,
+    jobs: int,
+) -> list[str]:
+    """
+    Picks the read-only checks to defer until after the commit: those declared
+    deferred by the rule set, and with a time budget the slowest checks
+    without a declared tier until the expected duration of the remaining ones
+    fits the budget. Returns the deferred checks in config order.
+    """
+
+    def _duration(hook_id: str) -> float:
+        hook = stats.hooks.get(hook_id)
+        return hook.duration if hook else DEFAULT_HOOK_DURATION
+
+    def _expected(hook_ids: list[str]) -> float:
+        durations = [_duration(hook_id) for hook_id in hook_ids]
+        return max(sum(durations) / max(1, jobs), max(durations, default=0.0))
+
+    deferred = {
+        hook_id
+        for hook_id in checks
+        if settings.hook_tier(hook_id) == HookTier.DEFERRED
+    }
+    if budget:
+        blocking = [hook_id for hook_id in checks if hook_id not in deferred]
+        candidates = sorted(
+            (hook_id for hook_id in blocking if settings.hook_tier(hook_id) is None),
+            key=_duration,
+            reverse=True,
+        )
+        for hook_id in candidates:
+            if _expected(blocking) <= budget:
+                break
+            blocking.remove(hook_id)
+            deferred.add(hook_id)
+    return [hook_id for hook_id in checks if hook_id in deferred]
+
+
+def hook_results(
+    hook_ids: Sequence[str], results: Sequence[CommandResult | None]
+) -> list[HookResult]:
+    """
+    Combines the results of the runs of each hook, which may have been split
+    into several runs. The first failure wins, durations add up. Runs that
+    never started (None) are left out.
+    """
+    combined: dict[str, HookResult] = {}
+    for hook_id, result in zip(hook_ids, results):
+        if result is None:
+            continue
+        hook = combined.setdefault(hook_id, HookResult(hook_id, 0, 0.0))
+        if hook.ok:
+            hook.returncode = result.returncode
+        hook.duration += result.duration
+    return list(combined.values())
+
+
+def format_summary(results: Sequence[HookResult]) -> str:
+    """Formats the hook results as a table."""
+    width = max((len(result.id) for result in results), default=0)
+    return "\n".join(
+        f"{result.id:<{width}}  {'Passed' if result.ok else 'Failed'}"
+        f"  {result.duration:6.2f}s"
+        for result in results
+    )
@@ -0,0 +1,100 @@
+#  Copyright 2025 T-Systems International GmbH
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are met:
+#
+#  1. Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#  2. Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+#
+#  3. Neither the name of the copyright holder nor the names of its
+#     contributors may be used to endorse or promote products derived from
+#     this software without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+#  DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+#  FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+#  DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+#  SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+#  CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+#  OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#  OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass
+from enum import StrEnum
+
+from hooked.library.cmd_util import CommandError
+from hooked.library.git import StagedEntry, git_reachable_objects
+from hooked.library.logger import logger
+
+
+class SequencerPolicy(StrEnum):
+    """How to check commits created while git replays or merges commits."""
+
+    FULL = "full"  # check all staged files, like any other commit
+    NEW_BLOBS = "new-blobs"  # only check blobs not found in the replayed commits
+    SKIP = "skip"  # don't run any hooks
+
+
+@dataclass
+class SequencerState:
+    """An operation in progress and the revisions it brings in."""
+
+    operation: str
+    revs: list[str]
+
+
+def _read(git_dir: str, *path: str) -> str | None:
+    try:
+        with open(os.path.join(git_dir, *path), encoding="utf-8") as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return None
+
+
+def sequencer_state(git_dir: str) -> SequencerState | None:
+    """Detects a rebase, cherry-pick or merge in progress."""
+    for backend in ("rebase-merge", "rebase-apply"):
+        if not os.path.isdir(os.path.join(git_dir, backend)):
+            continue
+        onto = _read(git_dir, backend, "onto")
+        orig_head = _read(git_dir, backend, "orig-head")
+        if onto and orig_head:
+            return SequencerState("rebase", [orig_head, "--not", onto])
+        # `git am` applies patches, nothing is known about their content
+        return SequencerState("am", [])
+
+    cherry_pick_head = _read(git_dir, "CHERRY_PICK_HEAD")
+    if cherry_pick_head:
+        return SequencerState("cherry-pick", [f"{cherry_pick_head}^!"])
+
+    merge_heads = _read(git_dir, "MERGE_HEAD")
+    if merge_heads:
+        return SequencerState("merge", [*merge_heads.split(), "--not", "HEAD"])
+
+    return None
+
+
+def new_blobs(
+    cwd: str, state: SequencerState, entries: list[StagedEntry]
+) -> list[StagedEntry]:
+    """
+    Returns the staged entries whose blobs don't appear in the commits being
+    replayed or merged. Falls back to all entries if those can't be listed.
+    """
+    if not state.revs:
+        return entries
+    try:
+        known = git_reachable_objects(cwd, state.revs)
+    except CommandError:
+        logger.debug(f"Unable to list objects of {state.operation}, checking all.")
+        return entries
+    return [entry for entry in entries if entry.sha not in known]
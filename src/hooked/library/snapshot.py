@@ -0,0 +1,140 @@
+#  Copyright 2025 T-Systems International GmbH
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are met:
+#
+#  1. Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#  2. Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+#
+#  3. Neither the name of the copyright holder nor the names of its
+#     contributors may be used to endorse or promote products derived from
+#     this software without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+#  DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+#  FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+#  DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+#  SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+#  CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+#  OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#  OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+from __future__ import annotations
+
+import os
+import tempfile
+from contextlib import contextmanager
+from typing import Iterator, Mapping
+
+from hooked.library.cmd_util import arg_max, partition_args, run_cmd
+from hooked.library.git import (
+    StagedEntry,
+    git_head,
+    git_path,
+    git_tree_files,
+    git_write_tree,
+    without_hook_env,
+)
+from hooked.library.logger import logger
+
+GITLINK_MODE = "160000"
+
+
+def snapshot_root() -> str:
+    """Where snapshots are created: tmpfs when available."""
+    root = os.getenv("HOOKED_SNAPSHOT_DIR")
+    if root:
+        return root
+    if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK):
+        return "/dev/shm"
+    return tempfile.gettempdir()
+
+
+def _init_repository(cwd: str, snapshot: str, tree: str, env: Mapping[str, str]):
+    """
+    Creates a repository that borrows the objects of the original one, with
+    the same HEAD and the staged tree as its index.
+    """
+    run_cmd(["git", "init", "--quiet", "--template=", snapshot], env=env)
+    alternates = os.path.join(snapshot, ".git", "objects", "info", "alternates")
+    with open(alternates, "w", encoding="utf-8") as f:
+        f.write(git_path(cwd, "objects") + "\n")
+
+    sha, ref = git_head(cwd)
+    if ref.startswith("refs/"):
+        if sha:
+            run_cmd(["git", "update-ref", ref, sha], cwd=snapshot, env=env)
+        run_cmd(["git", "symbolic-ref", "HEAD", ref], cwd=snapshot, env=env)
+    elif sha:
+        run_cmd(["git", "update-ref", "--no-deref", "HEAD", sha], cwd=snapshot, env=env)
+    run_cmd(["git", "read-tree", tree], cwd=snapshot, env=env)
+
+
+def _materialise(
+    cwd: str,
+    snapshot: str,
+    paths: list[str],
+    unstaged: set[str],
+    env: Mapping[str, str],
+):
+    """
+    Puts the staged content of paths into the snapshot. Files whose working
+    tree content is staged are hard linked, the others are written from the
+    staged blobs.
+    """
+    blobs = []
+    for path in paths:
+        if path in unstaged:
+            blobs.append(path)
+            continue
+        target = os.path.join(snapshot, path)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        try:
+            os.link(os.path.join(cwd, path), target, follow_symlinks=False)
+        except OSError:
+            # e.g. the snapshot is on another file system
+            blobs.append(path)
+
+    cmd = ["git", "checkout-index", "--force", "--"]
+    for chunk in partition_args(cmd, blobs, arg_max(env)):
+        run_cmd([*cmd, *chunk], cwd=snapshot, env=env)
+    logger.debug(
+        f"Snapshot has {len(paths) - len(blobs)} linked and {len(blobs)} written files"
+    )
+
+
+@contextmanager
+def staged_snapshot(
+    cwd: str,
+    entries: list[StagedEntry],
+    unstaged: set[str],
+    env: Mapping[str, str] | None = None,
+    tree: str | None = None,
+) -> Iterator[str]:
+    """
+    Materialises the staged entries, plus the files at the top of the
+    repository (where tools look for their config), into a temporary
+    repository. Yields its path, the working tree is never touched. The
+    staged tree is written from the index unless given.
+
+    Raises CommandError if the index can't be written as a tree, e.g. during
+    an unresolved merge.
+    """
+    env = without_hook_env(os.environ if env is None else env)
+    tree = tree or git_write_tree(cwd)
+    paths = [entry.path for entry in entries if entry.mode != GITLINK_MODE]
+    staged = set(paths)
+    paths += [path for path in git_tree_files(cwd, tree) if path not in staged]
+
+    with tempfile.TemporaryDirectory(
+        prefix="hooked-snapshot-", dir=snapshot_root()
+    ) as snapshot:
+        _init_repository(cwd, snapshot, tree, env)
+        _materialise(cwd, snapshot, paths, unstaged, env)
+        yield snapshot
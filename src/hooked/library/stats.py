@@ -0,0 +1,183 @@
+#  Copyright 2025 T-Systems International GmbH
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are met:
+#
+#  1. Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#  2. Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+#
+#  3. Neither the name of the copyright holder nor the names of its
+#     contributors may be used to endorse or promote products derived from
+#     this software without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+#  DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+#  FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+#  DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+#  SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+#  CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+#  OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#  OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+from __future__ import annotations
+
+import hashlib
+import heapq
+import json
+import os
+from dataclasses import asdict, dataclass, field
+from typing import Mapping, Sequence
+
+from hooked.library.files import get_cache_dir
+from hooked.library.logger import logger
+
+# estimated seconds per byte of a file type that was never timed
+DEFAULT_COST = 1e-6
+# every file costs at least as much as this many bytes
+FILE_OVERHEAD = 4096
+# estimated seconds of a hook that was never timed
+DEFAULT_HOOK_DURATION = 1.0
+# weight of the latest observation in the moving average
+_ALPHA = 0.3
+
+
+@dataclass
+class HookStats:
+    runs: int = 0
+    failures: int = 0
+    duration: float = DEFAULT_HOOK_DURATION
+
+    @property
+    def failure_rate(self) -> float:
+        """Smoothed failure rate, so that new hooks aren't ruled out."""
+        return (self.failures + 1) / (self.runs + 2)
+
+
+@dataclass
+class RepoStats:
+    """Run history of a repository, stored as json in the cache directory."""
+
+    repo: str
+    languages: dict[str, float] = field(default_factory=dict)
+    hooks: dict[str, HookStats] = field(default_factory=dict)
+
+
+def _stats_file(repo: str) -> str:
+    name = hashlib.sha256(repo.encode()).hexdigest()[:16]
+    return os.path.join(get_cache_dir(), "stats", f"{name}.json")
+
+
+def load_stats(repo: str) -> RepoStats:
+    """Loads the run history of a repository, empty if there is none."""
+    try:
+        with open(_stats_file(repo), encoding="utf-8") as f:
+            data = json.load(f)
+        return RepoStats(
+            repo=repo,
+            languages=dict(data.get("languages", {})),
+            hooks={
+                hook_id: HookStats(**values)
+                for hook_id, values in data.get("hooks", {}).items()
+            },
+        )
+    except FileNotFoundError:
+        return RepoStats(repo=repo)
+    except (ValueError, AttributeError, TypeError) as e:
+        logger.debug(f"Ignoring invalid stats of {repo}: {e}")
+        return RepoStats(repo=repo)
+
+
+def save_stats(stats: RepoStats):
+    stats_file = _stats_file(stats.repo)
+    os.makedirs(os.path.dirname(stats_file), exist_ok=True)
+    tmp_file = f"{stats_file}.{os.getpid()}"
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "repo": stats.repo,
+                "languages": stats.languages,
+                "hooks": {
+                    hook_id: asdict(hook_stats)
+                    for hook_id, hook_stats in stats.hooks.items()
+                },
+            },
+            f,
+        )
+    os.replace(tmp_file, stats_file)
+
+
+def language(path: str) -> str:
+    """The file type used to group costs: the lower case extension or name."""
+    name = os.path.basename(path)
+    root, ext = os.path.splitext(name)
+    return ext.lower() if ext and root else name
+
+
+def _language_cost(stats: RepoStats, lang: str) -> float:
+    return stats.languages.get(lang, DEFAULT_COST)
+
+
+def estimate_cost(stats: RepoStats, path: str, size: int) -> float:
+    """Estimated seconds the hooks spend on a file."""
+    return (size + FILE_OVERHEAD) * _language_cost(stats, language(path))
+
+
+def record_costs(stats: RepoStats, sizes: Mapping[str, int], seconds: float):
+    """
+    Folds the observed duration of a run over the given files into the cost
+    per byte of their file types.
+    """
+    estimated = sum(estimate_cost(stats, path, size) for path, size in sizes.items())
+    if estimated <= 0 or seconds <= 0:
+        return
+    ratio = seconds / estimated
+    for lang in {language(path) for path in sizes}:
+        cost = _language_cost(stats, lang)
+        stats.languages[lang] = cost * (1 - _ALPHA) + cost * ratio * _ALPHA
+
+
+def record_hook(stats: RepoStats, hook_id: str, ok: bool, duration: float):
+    """Counts a run of a hook and folds its duration into the average."""
+    hook = stats.hooks.get(hook_id)
+    if hook is None:
+        hook = stats.hooks[hook_id] = HookStats(duration=duration)
+    hook.runs += 1
+    hook.failures += 0 if ok else 1
+    hook.duration = hook.duration * (1 - _ALPHA) + duration * _ALPHA
+
+
+def fail_fast_order(stats: RepoStats, hook_ids: Sequence[str]) -> list[str]:
+    """
+    Orders hooks to find a failure as early as possible: cheap hooks that
+    failed often come first. Sorting by duration divided by failure rate
+    minimizes the expected time until the first failure of independent hooks.
+    """
+
+    def _score(hook_id: str) -> float:
+        hook = stats.hooks.get(hook_id, HookStats())
+        return hook.duration / hook.failure_rate
+
+    return sorted(hook_ids, key=_score)
+
+
+def balance(costs: Mapping[str, float], count: int) -> list[list[str]]:
+    """
+    Partitions paths into at most count shards of about equal total cost.
+
+    The most expensive paths are placed first, each on the cheapest shard so
+    far. Paths keep their given order within a shard, empty shards are dropped.
+    """
+    shards: list[list[str]] = [[] for _ in range(max(1, count))]
+    heap = [(0.0, index) for index in range(len(shards))]
+    order = {path: index for index, path in enumerate(costs)}
+    for path in sorted(costs, key=lambda p: (-costs[p], order[p])):
+        total, index = heapq.heappop(heap)
+        shards[index].append(path)
+        heapq.heappush(heap, (total + costs[path], index))
+    return [sorted(shard, key=order.__getitem__) for shard in shards if shard]
@@ -0,0 +1,159 @@
+#  Copyright 2025 T-Systems International GmbH
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are met:
+#
+#  1. Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#  2. Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+#
+#  3. Neither the name of the copyright holder nor the names of its
+#     contributors may be used to endorse or promote products derived from
+#     this software without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+#  DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+#  FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+#  DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+#  SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+#  CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+#  OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#  OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+from __future__ import annotations
+
+import json
+import os
+import shutil
+from typing import Sequence
+
+from hooked.library.cmd_util import CommandError, CommandResult, run_cmd_async
+from hooked.library.files import get_cache_dir
+from hooked.library.logger import logger
+
+# `<tool> --version` is answered from the cache as long as the binary found in
+# PATH is the same file: same path, inode, modification time and size. A
+# wrapper like a pyenv shim stays the same file when the tool behind it is
+# upgraded, deleting the cache file makes hooked ask again.
+
+# seconds a tool may take to print its version, a hanging wrapper must not
+# block the commit forever
+_PROBE_TIMEOUT = 60
+
+
+def _cache_file() -> str:
+    return os.path.join(get_cache_dir(), "toolchain.json")
+
+
+def _identity(name: str) -> list | None:
+    """Where name resolves to in PATH and the stat of the file behind it."""
+    path = shutil.which(name)
+    if path is None:
+        return None
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [path, st.st_ino, st.st_mtime_ns, st.st_size]
+
+
+def _load() -> dict:
+    try:
+        with open(_cache_file(), encoding="utf-8") as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else {}
+    except FileNotFoundError:
+        return {}
+    except ValueError as e:
+        logger.debug(f"Ignoring invalid toolchain cache: {e}")
+        return {}
+
+
+def _save(cache: dict):
+    cache_file = _cache_file()
+    try:
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        tmp_file = f"{cache_file}.{os.getpid()}"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(cache, f)
+        os.replace(tmp_file, cache_file)
+    except OSError as e:
+        logger.debug(f"Could not save the toolchain cache: {e}")
+
+
+async def _probe(path: str) -> str | CommandError:
+    try:
+        result = await run_cmd_async([path, "--version"], timeout=_PROBE_TIMEOUT)
+        return str(result.stdout)
+    except CommandError as e:
+        return e
+
+
+async def _probe_all(paths: list[str]) -> list[str | CommandError]:
+    import asyncio
+
+    return list(await asyncio.gather(*(_probe(path) for path in paths)))
+
+
+def _not_found(name: str) -> CommandError:
+    return CommandError(
+        CommandResult(
+            cmd=[name, "--version"],
+            returncode=127,
+            stdout=None,
+            stderr=f"{name} not found in PATH",
+        )
+    )
+
+
+def probe_versions(names: Sequence[str]) -> dict[str, str | CommandError]:
+    """
+    Returns the `--version` output of each tool, or the CommandError of a tool
+    that is missing or failed. Tools whose binary changed since they were
+    last asked are probed concurrently.
+    """
+    cache = _load()
+    results: dict[str, str | CommandError] = {}
+    identities = {}
+    for name in names:
+        identity = _identity(name)
+        entry = cache.get(name)
+        if identity is None:
+            results[name] = _not_found(name)
+        elif isinstance(entry, dict) and entry.get("id") == identity:
+            results[name] = str(entry.get("output"))
+        else:
+            identities[name] = identity
+
+    if identities:
+        logger.debug(f"Probing {', '.join(identities)}...")
+        import asyncio
+
+        paths = [identity[0] for identity in identities.values()]
+        outputs = asyncio.run(_probe_all(paths))
+        for (name, identity), output in zip(identities.items(), outputs):
+            results[name] = output
+            if isinstance(output, str):
+                cache[name] = {"id": identity, "output": output}
+            else:
+                cache.pop(name, None)
+        _save(cache)
+    return results
+
+
+def tool_version(name: str) -> str:
+    """
+    The `--version` output of a tool, cached per binary.
+
+    Raises:
+        CommandError: If the tool is missing or failed.
+    """
+    result = probe_versions([name])[name]
+    if isinstance(result, CommandError):
+        raise result
+    return result
@@ -27,7 +27,6 @@
 
 from __future__ import annotations
 
-import importlib.metadata as md
 import json
 import os
 import re
@@ -35,8 +34,6 @@ import sys
 from dataclasses import dataclass
 from datetime import datetime
 
-from packaging.version import InvalidVersion, Version
-
 from hooked import __pkg_name__
 from hooked.library.cmd_util import run_cmd
 from hooked.library.files import get_base_dir
@@ -71,6 +68,8 @@ def get_install_info() -> InstallInfo:
     """
     Reads installation info from direct_url.json.
     """
+    import importlib.metadata as md
+
     dist = md.distribution(__pkg_name__)
     install_info = InstallInfo()
     try:
@@ -99,6 +98,8 @@ def get_latest_release(tags: list[tuple[str, str]]) -> str | None:
 
     Tuple elements are (tag, sha).
     """
+    from packaging.version import InvalidVersion, Version
+
     semver_tags: list[tuple[Version, str]] = []
 
     # filter all semver tags
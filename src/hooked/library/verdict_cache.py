@@ -0,0 +1,183 @@
+#  Copyright 2025 T-Systems International GmbH
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are met:
+#
+#  1. Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#  2. Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+#
+#  3. Neither the name of the copyright holder nor the names of its
+#     contributors may be used to endorse or promote products derived from
+#     this software without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+#  DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+#  FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+#  DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+#  SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+#  CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+#  OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#  OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+from __future__ import annotations
+
+import hashlib
+import mmap
+import os
+import struct
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - windows
+    fcntl = None
+
+from hooked.library.env import env_int
+from hooked.library.files import get_cache_dir
+from hooked.library.git import StagedEntry
+from hooked.library.ruleset import HookSpec
+
+# file layout: header followed by buckets of _WAYS slots each.
+# a slot holds a 16 byte key digest and the clock tick of its last use,
+# a tick of 0 marks an empty slot. each bucket is evicted LRU on its own,
+# which keeps the index a fixed size without any rehashing.
+_MAGIC = b"HKVC"
+_FORMAT_VERSION = 1
+_HEADER = struct.Struct("<4sIIQ")  # magic, version, bucket count, clock
+_SLOT = struct.Struct("<16sQ")  # key digest, last used tick
+_WAYS = 8
+
+KEY_SIZE = 16
+DEFAULT_SIZE = 4 * 1024 * 1024  # 4 MiB ~ 170k verdicts
+
+
+def verdict_key(entry: StagedEntry, hook: HookSpec, config_hash: str) -> bytes:
+    """
+    Builds the cache key of a hook verdict for a staged blob.
+
+    Path and mode are part of the key, since pre-commit's file filters and
+    several hooks (e.g. shebang checks) depend on them.
+    """
+    h = hashlib.blake2b(digest_size=KEY_SIZE)
+    for part in (
+        entry.sha,
+        entry.mode,
+        entry.path,
+        hook.id,
+        hook.repo,
+        hook.rev or "",
+        "\0".join(hook.args),
+        config_hash,
+    ):
+        h.update(part.encode("utf-8", "surrogateescape"))
+        h.update(b"\0")
+    return h.digest()
+
+
+def user_verdict_cache() -> VerdictCache:
+    """The verdict cache of the user, sized by HOOKED_VERDICT_CACHE_SIZE."""
+    return VerdictCache(
+        os.path.join(get_cache_dir(), "verdicts.bin"),
+        size=env_int("HOOKED_VERDICT_CACHE_SIZE", DEFAULT_SIZE),
+    )
+
+
+class VerdictCache:
+    """
+    Memory-mapped, fixed size store of passing hook verdicts.
+
+    Usage:
+        with VerdictCache(path) as cache:
+            if not cache.contains(key):
+                ...
+                cache.add(key)
+    """
+
+    def __init__(self, path: str, size: int = DEFAULT_SIZE):
+        self.path = path
+        self.buckets = max(1, (size - _HEADER.size) // (_SLOT.size * _WAYS))
+        self.hits = 0
+        self.misses = 0
+        self._fd: int | None = None
+        self._map: mmap.mmap | None = None
+
+    @property
+    def _file_size(self) -> int:
+        return _HEADER.size + self.buckets * _WAYS * _SLOT.size
+
+    def open(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+
+        if os.fstat(fd).st_size != self._file_size:
+            os.ftruncate(fd, self._file_size)
+        self._fd = fd
+        self._map = mmap.mmap(fd, self._file_size)
+
+        magic, version, buckets, _ = _HEADER.unpack_from(self._map, 0)
+        if (magic, version, buckets) != (_MAGIC, _FORMAT_VERSION, self.buckets):
+            # unknown layout or changed size budget, start from scratch
+            self._map[:] = bytes(self._file_size)
+            _HEADER.pack_into(self._map, 0, _MAGIC, _FORMAT_VERSION, self.buckets, 0)
+        return self
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._fd is not None:
+            os.close(self._fd)  # releases the flock
+            self._fd = None
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _tick(self) -> int:
+        assert self._map is not None
+        magic, version, buckets, clock = _HEADER.unpack_from(self._map, 0)
+        clock += 1
+        _HEADER.pack_into(self._map, 0, magic, version, buckets, clock)
+        return clock
+
+    def _bucket_offset(self, key: bytes) -> int:
+        bucket = int.from_bytes(key[:8], "little") % self.buckets
+        return _HEADER.size + bucket * _WAYS * _SLOT.size
+
+    def contains(self, key: bytes) -> bool:
+        """Looks up a verdict and marks it as recently used."""
+        assert self._map is not None
+        base = self._bucket_offset(key)
+        for way in range(_WAYS):
+            offset = base + way * _SLOT.size
+            slot_key, tick = _SLOT.unpack_from(self._map, offset)
+            if tick and slot_key == key:
+                _SLOT.pack_into(self._map, offset, key, self._tick())
+                self.hits += 1
+                return True
+        self.misses += 1
+        return False
+
+    def add(self, key: bytes):
+        """Stores a passing verdict, evicting the bucket's least recent one."""
+        assert self._map is not None
+        base = self._bucket_offset(key)
+        victim, oldest = base, None
+        for way in range(_WAYS):
+            offset = base + way * _SLOT.size
+            slot_key, tick = _SLOT.unpack_from(self._map, offset)
+            if tick and slot_key == key:
+                victim = offset
+                break
+            if oldest is None or tick < oldest:
+                victim, oldest = offset, tick
+        _SLOT.pack_into(self._map, victim, key, self._tick())
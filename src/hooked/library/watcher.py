@@ -0,0 +1,256 @@
+#  Copyright 2025 T-Systems International GmbH
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are met:
+#
+#  1. Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#  2. Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+#
+#  3. Neither the name of the copyright holder nor the names of its
+#     contributors may be used to endorse or promote products derived from
+#     this software without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+#  DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+#  FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+#  DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+#  SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+#  CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+#  OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#  OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+from __future__ import annotations
+
+import ctypes
+import ctypes.util
+import json
+import os
+import select
+import struct
+import threading
+import time
+from typing import Callable, Sequence
+
+from hooked.library.cmd_util import CommandError, run_cmd
+from hooked.library.files import get_base_dir
+from hooked.library.git import git_path
+from hooked.library.logger import logger
+
+WATCH_FILE = "watch.json"
+# seconds the index has to stay unchanged before staged files are pre-checked,
+# a `git add` of many files writes it several times
+DEFAULT_DEBOUNCE = 0.5
+# seconds between looking at the indexes inotify doesn't watch
+DEFAULT_POLL_INTERVAL = 2.0
+
+# from <sys/inotify.h>
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_NONBLOCK = os.O_NONBLOCK
+_IN_CLOEXEC = os.O_CLOEXEC
+_EVENT = struct.Struct("iIII")  # wd, mask, cookie, len
+
+
+def _watch_file() -> str:
+    return os.path.join(get_base_dir(), WATCH_FILE)
+
+
+def watched_repos() -> list[str]:
+    """The work trees enrolled with `hooked watch --add`."""
+    try:
+        with open(_watch_file(), encoding="utf-8") as f:
+            repos = json.load(f)
+    except (OSError, ValueError):
+        return []
+    return [str(repo) for repo in repos] if isinstance(repos, list) else []
+
+
+def _save_repos(repos: list[str]):
+    path = _watch_file()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_file = f"{path}.{os.getpid()}"
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        json.dump(sorted(repos), f, indent=2)
+    os.replace(tmp_file, path)
+
+
+def work_tree(path: str) -> str:
+    """
+    The top of the work tree path belongs to.
+
+    Raises CommandError if path is not in a git work tree.
+    """
+    return str(run_cmd(["git", "rev-parse", "--show-toplevel"], cwd=path).stdout)
+
+
+def add_repo(path: str) -> bool:
+    """Enrolls the work tree of path, False if it was already."""
+    repo = work_tree(path)
+    repos = watched_repos()
+    if repo in repos:
+        return False
+    _save_repos([*repos, repo])
+    return True
+
+
+def remove_repo(path: str) -> bool:
+    """Withdraws a work tree, False if it wasn't enrolled."""
+    repos = watched_repos()
+    repo = os.path.realpath(path)
+    if repo not in repos:
+        try:
+            repo = work_tree(path)
+        except CommandError:
+            return False
+    if repo not in repos:
+        return False
+    _save_repos([other for other in repos if other != repo])
+    return True
+
+
+class Inotify:
+    """Changes to files in directories, read from a Linux inotify instance."""
+
+    def __init__(self):
+        name = ctypes.util.find_library("c")
+        self._libc = ctypes.CDLL(name, use_errno=True)
+        fd = self._libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+        self.fd = fd
+
+    def add(self, directory: str) -> int:
+        """Watches for files written or moved into directory."""
+        wd = self._libc.inotify_add_watch(
+            self.fd, os.fsencode(directory), _IN_CLOSE_WRITE | _IN_MOVED_TO
+        )
+        if wd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno), directory)
+        return wd
+
+    def read(self) -> list[tuple[int, int, str]]:
+        """The pending events as (wd, mask, file name)."""
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        events = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = _EVENT.unpack_from(data, offset)
+            offset += _EVENT.size
+            name = data[offset : offset + length].rstrip(b"\0")
+            offset += length
+            events.append((wd, mask, os.fsdecode(name)))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+def _inotify() -> Inotify | None:
+    try:
+        return Inotify()
+    except (OSError, AttributeError) as e:
+        # no libc, or no inotify_init1 in it
+        logger.debug(f"inotify unavailable, polling: {e}")
+        return None
+
+
+def _signature(path: str) -> tuple[int, int, int] | None:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_ino, st.st_mtime_ns, st.st_size
+
+
+def watch(
+    repos: Sequence[str],
+    precheck: Callable[[str], object],
+    *,
+    debounce: float = DEFAULT_DEBOUNCE,
+    poll_interval: float = DEFAULT_POLL_INTERVAL,
+    use_inotify: bool = True,
+    stop: threading.Event | None = None,
+):
+    """
+    Calls precheck(repo) once the index of a repository settled after a
+    change, and for every repository when starting. Indexes are watched with
+    inotify where available and polled otherwise. Runs until stop is set.
+    """
+    stop = stop or threading.Event()
+    indexes = {}
+    for repo in repos:
+        try:
+            indexes[repo] = git_path(repo, "index")
+        except CommandError as e:
+            logger.warning(f"Not watching {repo}: {e.result.stderr}")
+
+    inotify = _inotify() if use_inotify else None
+    watches: dict[int, str] = {}
+    if inotify:
+        for repo, index in indexes.items():
+            try:
+                watches[inotify.add(os.path.dirname(index))] = repo
+            except OSError as e:
+                logger.debug(f"Polling {index}: {e}")
+    polled = {repo for repo in indexes if repo not in watches.values()}
+    signatures = {repo: _signature(indexes[repo]) for repo in polled}
+    changed = dict.fromkeys(indexes, time.monotonic() - debounce)
+    next_poll = time.monotonic() + poll_interval
+
+    try:
+        while not stop.is_set():
+            now = time.monotonic()
+            for repo, at in list(changed.items()):
+                if now - at < debounce or stop.is_set():
+                    continue
+                del changed[repo]
+                try:
+                    precheck(repo)
+                except (CommandError, OSError) as e:
+                    logger.debug(f"Pre-check of {repo} failed: {e}")
+
+            now = time.monotonic()
+            timeout = next_poll - now if polled else None
+            if changed:
+                wait = min(changed.values()) + debounce - now
+                timeout = wait if timeout is None else min(timeout, wait)
+            # wakes up regularly to notice stop
+            timeout = max(0.0, min(timeout if timeout is not None else 1.0, 1.0))
+            if inotify:
+                ready, _, _ = select.select([inotify.fd], [], [], timeout)
+                for wd, mask, name in inotify.read() if ready else []:
+                    if mask & _IN_Q_OVERFLOW:
+                        changed.update(dict.fromkeys(indexes, time.monotonic()))
+                    elif mask & _IN_IGNORED and wd in watches:
+                        # the git directory is gone, e.g. a removed work tree
+                        polled.add(watches.pop(wd))
+                    elif wd in watches and name == os.path.basename(
+                        indexes[watches[wd]]
+                    ):
+                        changed[watches[wd]] = time.monotonic()
+            else:
+                stop.wait(timeout)
+
+            if polled and time.monotonic() >= next_poll:
+                for repo in polled:
+                    signature = _signature(indexes[repo])
+                    if signature != signatures.get(repo):
+                        signatures[repo] = signature
+                        changed[repo] = time.monotonic()
+                next_poll = time.monotonic() + poll_interval
+    finally:
+        if inotify:
+            inotify.close()
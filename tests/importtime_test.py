@@ -0,0 +1,99 @@
+#  Copyright 2025 T-Systems International GmbH
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are met:
+#
+#  1. Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#  2. Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+#
+#  3. Neither the name of the copyright holder nor the names of its
+#     contributors may be used to endorse or promote products derived from
+#     this software without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+#  DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+#  FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+#  DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+#  SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+#  CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+#  OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#  OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+from __future__ import annotations
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+SRC = Path(__file__).resolve().parent.parent / "src"
+
+# what `python -m hooked run pre-commit <path>` imports before the first hook
+HOOK_PATH = "import hooked.__main__, hooked.library.hooks.pre_commit"
+
+# only needed by other commands or optional features of the hook
+LAZY_MODULES = (
+    "asyncio",
+    "hooked.library.cli",
+    "hooked.library.gitleaks",
+    "hooked.library.install",
+    "hooked.library.prefilter",
+    "hooked.library.remote_cache",
+    "http.client",
+    "importlib.metadata",
+    "importlib.resources",
+    "packaging.version",
+    "urllib.request",
+)
+
+# microseconds, best of RUNS; HOOKED_IMPORT_BUDGET_US overrides it for slow hosts
+BUDGET_US = 240_000
+RUNS = 5
+
+
+def _import_times() -> dict[str, tuple[int, bool]]:
+    """
+    Runs the hook path imports, returns the cumulative microseconds per module
+    and whether the -c statement imported it directly.
+    """
+    env = os.environ | {"PYTHONPATH": str(SRC)}
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", HOOK_PATH],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        # nested imports are indented by two more spaces per level
+        times[name.strip()] = (int(cumulative), not name.startswith("  "))
+    return times
+
+
+def test_hook_path_lazy_imports() -> None:
+    imported = _import_times()
+    assert "hooked.library.hooks.pre_commit" in imported
+    assert [name for name in LAZY_MODULES if name in imported] == []
+
+
+def test_hook_path_import_budget() -> None:
+    budget = int(os.getenv("HOOKED_IMPORT_BUDGET_US", BUDGET_US))
+    best = min(
+        sum(
+            cumulative
+            for name, (cumulative, top) in _import_times().items()
+            if top and name.startswith("hooked")
+        )
+        for _ in range(RUNS)
+    )
+    assert best <= budget, f"hook path imports took {best} us, budget {budget} us"
@@ -26,7 +26,13 @@
 #  OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 from __future__ import annotations
 
+import asyncio
+import io
+import os
 import subprocess
+import sys
+import tempfile
+import time
 import unittest
 from unittest.mock import patch
 
@@ -85,41 +91,211 @@ class CmdUtilTests(unittest.TestCase):
         with self.assertRaises(lib.CommandError):
             lib.run_cmd([])
 
-    @patch("hooked.library.cmd_util.threading.Thread")
+    def test_run_stream(self):
+        script = (
+            "import sys; print('out'); sys.stderr.write('err\\n'); "
+            "sys.stdout.buffer.write('\\u00e9'.encode() * 100000)"
+        )
+        with (
+            patch("hooked.library.cmd_util.sys.stdout", io.StringIO()) as stdout,
+            patch("hooked.library.cmd_util.sys.stderr", io.StringIO()) as stderr,
+        ):
+            result = lib.run_stream([sys.executable, "-c", script], cwd="/")
+
+        self.assertEqual("out\n" + "\u00e9" * 100000, stdout.getvalue())
+        self.assertEqual("err\n", stderr.getvalue())
+        self.assertEqual(0, result.returncode)
+        self.assertEqual("\u00e9" * 100000, result.stdout[-100000:])
+        self.assertEqual("err\n", result.stderr)
+
+    def test_run_stream_capture(self):
+        script = "import sys; sys.stdout.write('x' * 1000000 + 'end')"
+        with patch("hooked.library.cmd_util.sys.stdout", io.StringIO()) as stdout:
+            result = lib.run_stream([sys.executable, "-c", script], capture=1000)
+            self.assertEqual(1000003, len(stdout.getvalue()))
+            self.assertEqual("x" * 997 + "end", result.stdout)
+            result = lib.run_stream([sys.executable, "-c", script], capture=0)
+            self.assertIsNone(result.stdout)
+
     @patch("hooked.library.cmd_util.sp.Popen")
-    def test_run_stream(self, popen, _):
+    def test_run_stream_passthrough(self, popen):
         cmd = ["foo", "bar", "baz"]
-        cwd = "/home/batman"
         env = {"user": "batman"}
-
         popen.return_value.wait.return_value = 0
 
-        result = lib.run_stream(cmd, cwd=cwd, env=env)
+        result = lib.run_stream(cmd, cwd="/home/batman", env=env, passthrough=True)
 
         popen.assert_called_once_with(
-            cmd,
-            cwd=cwd,
-            env=env,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            bufsize=1,
+            cmd, cwd="/home/batman", env=env, stdout=None, stderr=None
         )
+        self.assertEqual(0, result.returncode)
+        self.assertIsNone(result.stdout)
+        self.assertIsNone(result.stderr)
 
-        self.assertEqual(result.cmd, cmd)
-        self.assertEqual(result.returncode, 0)
-        self.assertEqual(result.stdout, None)
+    def test_run_stream_nok(self):
+        script = "import sys; sys.stderr.write('broken'); sys.exit(3)"
+        with (
+            patch("hooked.library.cmd_util.sys.stderr", io.StringIO()),
+            self.assertRaises(lib.CommandError) as e,
+        ):
+            lib.run_stream([sys.executable, "-c", script])
+        self.assertEqual(
+            (3, "broken"), (e.exception.result.returncode, e.exception.result.stderr)
+        )
 
-    @patch("hooked.library.cmd_util.threading.Thread")
-    @patch("hooked.library.cmd_util.sp.Popen")
-    def test_run_stream_nok(self, popen, _):
-        popen.return_value.wait.return_value = 1
-        with self.assertRaises(lib.CommandError):
-            lib.run_stream([])
+    def test_run_stream_err(self):
+        with self.assertRaises(lib.CommandError) as e:
+            lib.run_stream(["/does/not/exist"])
+        self.assertEqual(127, e.exception.result.returncode)
 
-    @patch("hooked.library.cmd_util.threading.Thread")
-    @patch("hooked.library.cmd_util.sp.Popen")
-    def test_run_stream_err(self, popen, _):
-        popen.side_effect = FileNotFoundError()
+    def test_iter_records(self):
+        script = "import sys; sys.stdout.write('a\\0b\\nc\\0' + 'd' * 100000)"
+        records = list(lib.iter_records([sys.executable, "-c", script]))
+        self.assertEqual([b"a", b"b\nc", b"d" * 100000], records)
+
+    def test_iter_records_err(self):
+        with self.assertRaises(lib.CommandError):
+            list(lib.iter_records([sys.executable, "-c", "raise SystemExit(3)"]))
         with self.assertRaises(lib.CommandError):
-            lib.run_stream([])
+            list(lib.iter_records(["/does/not/exist"]))
+
+    def test_run_parallel(self):
+        cmds = [
+            [sys.executable, "-c", f"import sys, time; time.sleep({delay}); {code}"]
+            for delay, code in (
+                (0.2, "print('slow')"),
+                (0, "sys.stderr.write('fast'); raise SystemExit(1)"),
+            )
+        ]
+        results = lib.run_parallel([*cmds, ["/does/not/exist"]], jobs=2)
+
+        self.assertEqual(["slow\n", "fast", None], [r.stdout for r in results])
+        self.assertEqual([0, 1, 127], [r.returncode for r in results])
+        self.assertGreaterEqual(results[0].duration, 0.2)
+
+    def test_run_parallel_fail_fast(self):
+        cmds = [[sys.executable, "-c", f"raise SystemExit({rc})"] for rc in (0, 1, 0)]
+        results = lib.run_parallel(cmds, jobs=1, fail_fast=True)
+
+        self.assertEqual([0, 1], [r.returncode for r in results[:2]])
+        self.assertIsNone(results[2])
+        self.assertNotIn(None, lib.run_parallel(cmds, jobs=1))
+
+    def test_run_cmd_async(self):
+        result = asyncio.run(
+            lib.run_cmd_async([sys.executable, "-c", "print(' out ')"], cwd="/")
+        )
+        self.assertEqual(("out", ""), (result.stdout, result.stderr))
+        result = asyncio.run(
+            lib.run_cmd_async([sys.executable, "-c", "print('out')"], text=False)
+        )
+        self.assertEqual(b"out", result.stdout)
+
+        with self.assertRaises(lib.CommandError) as e:
+            asyncio.run(
+                lib.run_cmd_async([sys.executable, "-c", "import sys; sys.exit('no')"])
+            )
+        self.assertEqual(
+            (1, "no"), (e.exception.result.returncode, e.exception.result.stderr)
+        )
+        with self.assertRaises(lib.CommandError) as e:
+            asyncio.run(lib.run_cmd_async(["/does/not/exist"]))
+        self.assertEqual(127, e.exception.result.returncode)
+
+    def _sleeping_tree(self) -> tuple[list[str], str]:
+        """A command that starts a grandchild and writes its pid to a file."""
+        pid_file = os.path.join(self.enterContext(tempfile.TemporaryDirectory()), "pid")
+        script = (
+            "import subprocess, sys, time\n"
+            "p = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(30)'])\n"
+            f"open({pid_file!r}, 'w').write(str(p.pid))\n"
+            "time.sleep(30)\n"
+        )
+        return [sys.executable, "-c", script], pid_file
+
+    def _assert_stopped(self, pid_file: str):
+        with open(pid_file) as f:
+            pid = int(f.read())
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            try:
+                with open(f"/proc/{pid}/stat") as f:
+                    # zombies wait for init to reap them
+                    if f.read().rsplit(")", 1)[1].split()[0] == "Z":
+                        return
+            except FileNotFoundError:
+                return
+            time.sleep(0.05)
+        self.fail(f"process {pid} is still running")
+
+    @unittest.skipUnless(os.path.isdir("/proc/self"), "needs /proc")
+    def test_run_cmd_async_timeout(self):
+        cmd, pid_file = self._sleeping_tree()
+        start = time.monotonic()
+        with self.assertRaises(lib.CommandError) as e:
+            asyncio.run(lib.run_cmd_async(cmd, timeout=1))
+        self.assertEqual(-lib.signal.SIGALRM, e.exception.result.returncode)
+        self.assertLess(time.monotonic() - start, 10)
+        self._assert_stopped(pid_file)
+
+    @patch.object(lib, "_TERMINATE_GRACE", 0.2)
+    def test_run_cmd_async_ignores_sigterm(self):
+        cmd = ["sh", "-c", "trap '' TERM; sleep 10"]
+        start = time.monotonic()
+        with self.assertRaises(lib.CommandError) as e:
+            asyncio.run(lib.run_cmd_async(cmd, timeout=0.5))
+        self.assertEqual(-lib.signal.SIGALRM, e.exception.result.returncode)
+        self.assertLess(time.monotonic() - start, 5)
+
+    @unittest.skipUnless(os.path.isdir("/proc/self"), "needs /proc")
+    def test_run_cmd_async_cancel(self):
+        cmd, pid_file = self._sleeping_tree()
+
+        async def main():
+            task = asyncio.ensure_future(lib.run_cmd_async(cmd))
+            while not os.path.exists(pid_file) or not os.path.getsize(pid_file):
+                await asyncio.sleep(0.05)
+            task.cancel()
+            await task
+
+        with self.assertRaises(asyncio.CancelledError):
+            asyncio.run(main())
+        self._assert_stopped(pid_file)
+
+    def test_run_parallel_async(self):
+        code = "import time; time.sleep(0.3); print('{}')"
+        cmds = [[sys.executable, "-c", code.format(i)] for i in range(4)]
+        start = time.monotonic()
+        results = asyncio.run(
+            lib.run_parallel_async(
+                [*cmds, [sys.executable, "-c", "import time; time.sleep(30)"]],
+                jobs=5,
+                timeout=1,
+            )
+        )
+        self.assertLess(time.monotonic() - start, 10)
+        self.assertEqual(["0\n", "1\n", "2\n", "3\n", ""], [r.stdout for r in results])
+        self.assertEqual(-lib.signal.SIGALRM, results[-1].returncode)
+
+        cmds = [[sys.executable, "-c", f"raise SystemExit({rc})"] for rc in (0, 1, 0)]
+        results = asyncio.run(
+            lib.run_parallel_async([*cmds, ["/does/not/exist"]], jobs=1, fail_fast=True)
+        )
+        self.assertEqual([0, 1], [r.returncode for r in results[:2]])
+        self.assertEqual([None, None], results[2:])
+        results = asyncio.run(lib.run_parallel_async([["/does/not/exist"]], jobs=1))
+        self.assertEqual(127, results[0].returncode)
+
+    def test_partition_args(self):
+        cmd = ["pre-commit", "run", "--files"]
+        files = [f"file{i:03}.txt" for i in range(100)]
+        base = sum(len(arg) + 9 for arg in cmd)
+        chunks = list(lib.partition_args(cmd, files, base + 10 * 20))
+
+        self.assertEqual(files, [f for chunk in chunks for f in chunk])
+        self.assertEqual(10, len(chunks))
+        self.assertEqual([["a"]], list(lib.partition_args(cmd, ["a"], 0)))
+
+    def test_arg_max(self):
+        self.assertGreater(lib.arg_max({}), lib.arg_max({"FOO": "x" * 10000}))
+        self.assertGreaterEqual(lib.arg_max({"FOO": "x" * 10**9}), 4096)
@@ -0,0 +1,125 @@
+#  Copyright 2025 T-Systems International GmbH
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are met:
+#
+#  1. Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#  2. Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+#
+#  3. Neither the name of the copyright holder nor the names of its
+#     contributors may be used to endorse or promote products derived from
+#     this software without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+#  DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+#  FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+#  DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+#  SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+#  CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+#  OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#  OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+from __future__ import annotations
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+import hooked.library.daemon as lib
+
+# serves requests by printing argv and cwd, exiting with the length of argv
+SERVER = """
+import os, sys
+from hooked.library import daemon
+
+def handler(argv):
+    print(" ".join(argv), os.getcwd(), os.environ.get("MARKER"), flush=True)
+    return len(argv)
+
+daemon.serve(sys.argv[1], idle_timeout=float(sys.argv[2]), handler=handler)
+"""
+
+
+class DaemonTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, "run", "daemon.sock")
+
+    def _serve(self, idle_timeout: float = 30) -> subprocess.Popen:
+        env = {**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)}
+        server = subprocess.Popen(
+            [sys.executable, "-c", SERVER, self.path, str(idle_timeout)],
+            env=env,
+            stderr=subprocess.DEVNULL,
+        )
+        self.addCleanup(server.kill)
+        for _ in range(100):
+            sock = lib._connect(self.path)
+            if sock is not None:
+                sock.close()
+                break
+            time.sleep(0.05)
+        return server
+
+    def _request(self, argv: list[str]) -> tuple[int, str]:
+        r, w = os.pipe()
+        with open(os.devnull) as devnull:
+            rc = lib.request(argv, self.tmp.name, (devnull.fileno(), w, w), self.path)
+        os.close(w)
+        with os.fdopen(r) as f:
+            return rc, f.read()
+
+    def test_socket_path(self):
+        with patch.dict(os.environ, {"XDG_RUNTIME_DIR": "/run/user/1000"}):
+            self.assertEqual("/run/user/1000/hooked/daemon.sock", lib.socket_path())
+
+    def test_no_daemon(self):
+        self.assertEqual(lib.EX_NO_DAEMON, lib.request(["run"], "/", path=self.path))
+        self.assertFalse(lib.stop(self.path))
+
+    @patch.dict(os.environ, {"MARKER": "from-client"})
+    def test_request(self):
+        server = self._serve()
+        rc, output = self._request(["run", "pre-commit", "/repo"])
+        self.assertEqual(3, rc)
+        self.assertEqual(
+            f"run pre-commit /repo {os.path.realpath(self.tmp.name)} from-client\n",
+            output,
+        )
+        # a second daemon leaves the running one alone
+        self.assertEqual(0, self._serve().wait(timeout=10))
+
+        self.assertTrue(lib.stop(self.path))
+        self.assertEqual(0, server.wait(timeout=10))
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_version_mismatch(self):
+        server = self._serve()
+        with patch("hooked.library.daemon.__version__", "0.0.1"):
+            self.assertEqual(lib.EX_NO_DAEMON, self._request(["run"])[0])
+        self.assertEqual(0, server.wait(timeout=10))
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_idle_timeout(self):
+        server = self._serve(idle_timeout=0.5)
+        self.assertEqual(0, server.wait(timeout=10))
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_stale_socket(self):
+        import socket
+
+        os.makedirs(os.path.dirname(self.path))
+        socket.socket(socket.AF_UNIX).bind(self.path)
+        self._serve()
+        self.assertEqual(1, self._request(["x"])[0])
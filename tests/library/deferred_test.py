@@ -0,0 +1,81 @@
+#  Copyright 2025 T-Systems International GmbH
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are met:
+#
+#  1. Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#  2. Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+#
+#  3. Neither the name of the copyright holder nor the names of its
+#     contributors may be used to endorse or promote products derived from
+#     this software without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+#  DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+#  FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+#  DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+#  SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+#  CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+#  OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#  OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+from __future__ import annotations
+
+import os
+import tempfile
+import unittest
+
+import hooked.library.deferred as lib
+
+
+class DeferredTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.git_dir = self.tmp.name
+
+    def test_claim_deferral(self):
+        self.assertIsNone(lib.claim_deferral(self.git_dir))
+
+        deferral = lib.Deferral(
+            tree="tree",
+            files=["a.py", "b c.py"],
+            configs=[
+                lib.DeferredConfig("/rules/config.yaml", ["slow"], {"X": "1"}),
+                lib.DeferredConfig(".pre-commit-config.yaml", ["lint"], local=True),
+            ],
+        )
+        lib.save_deferral(self.git_dir, deferral)
+        self.assertEqual(deferral, lib.claim_deferral(self.git_dir))
+        self.assertIsNone(lib.claim_deferral(self.git_dir))
+
+        lib.save_deferral(self.git_dir, deferral)
+        lib.discard_deferral(self.git_dir)
+        self.assertIsNone(lib.claim_deferral(self.git_dir))
+
+    def test_pop_results(self):
+        lib.save_deferral(self.git_dir, lib.Deferral("tree", [], []))
+        passed = lib.DeferredResult("c1", ["a"], [])
+        failed = lib.DeferredResult(
+            "c2", ["a"], ["b"], lib.log_file(self.git_dir, "c2")
+        )
+        lib.save_result(self.git_dir, passed)
+        lib.save_result(self.git_dir, failed)
+        with open(failed.log, "w") as f:
+            f.write("output")
+
+        lib.prune_logs(self.git_dir)
+        self.assertTrue(os.path.exists(failed.log))
+
+        self.assertEqual([passed, failed], lib.pop_results(self.git_dir))
+        self.assertEqual([], lib.pop_results(self.git_dir))
+        self.assertIsNotNone(lib.claim_deferral(self.git_dir))
+
+        lib.prune_logs(self.git_dir)
+        self.assertFalse(os.path.exists(failed.log))
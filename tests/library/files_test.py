@@ -27,6 +27,8 @@
 from __future__ import annotations
 
 import os
+import subprocess
+import sys
 import tempfile
 import unittest
 from unittest.mock import call, patch
@@ -88,6 +90,7 @@ class TestFiles(unittest.TestCase):
                 [call(f"{tmp}/post-commit", 0o755), call(f"{tmp}/pre-commit", 0o755)]
             )
 
+    @patch("hooked.library.files._render_pre_commit_shim")
     @patch("hooked.library.files._copy_git_hooks")
     @patch("hooked.library.files._create_hooks_dir")
     @patch("hooked.library.files._create_git_template_dir")
@@ -98,6 +101,7 @@ class TestFiles(unittest.TestCase):
         _create_git_template_dir,
         _create_hooks_dir,
         _copy_git_hooks,
+        _render_pre_commit_shim,
     ):
         lib.copy_hooked_files()
         _create_base_dir.assert_called_once()
@@ -109,3 +113,86 @@ class TestFiles(unittest.TestCase):
                 call("hooked.data.git_template", lib.get_template_dir()),
             ]
         )
+        _render_pre_commit_shim.assert_called_once_with(lib.get_hooks_dir())
+
+    def test_case_pattern(self):
+        self.assertEqual("/src/*/[!a-z]?", lib._case_pattern("/src/*/[!a-z]?"))
+        self.assertEqual("/my\\ repo/\\$x\\;", lib._case_pattern("/my repo/$x;"))
+        self.assertEqual("\\~a\\^b", lib._case_pattern("~a^b"))
+        with self.assertRaises(ValueError):
+            lib._case_pattern("a\nb")
+
+
+class TestPreCommitShim(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.config_dir = os.path.join(self.tmp.name, "config")
+        self.repo = os.path.realpath(os.path.join(self.tmp.name, "my repo"))
+        os.makedirs(self.config_dir)
+        subprocess.run(["git", "init", "-q", self.repo], check=True)
+        # stands in for the interpreter, prints what hooked would be run with
+        self.python = os.path.join(self.tmp.name, "python")
+        with open(self.python, "w") as f:
+            f.write('#!/bin/sh\necho "$@"\n')
+        os.chmod(self.python, 0o755)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _render(self, settings: str = "") -> str:
+        with open(os.path.join(self.config_dir, ".hooked.yaml"), "w") as f:
+            f.write(settings)
+        with (
+            patch("hooked.library.files.get_config_dir", return_value=self.config_dir),
+            patch.object(sys, "executable", self.python),
+        ):
+            lib._render_pre_commit_shim(self.tmp.name)
+        return os.path.join(self.tmp.name, "pre-commit")
+
+    def _run(self, shim: str, **env: str) -> subprocess.CompletedProcess:
+        env = {k: v for k, v in os.environ.items() if not k.startswith("HOOKED_")} | env
+        return subprocess.run(
+            [shim], cwd=self.repo, env=env, capture_output=True, text=True
+        )
+
+    def _stage(self):
+        with open(os.path.join(self.repo, "a.txt"), "w") as f:
+            f.write("a\n")
+        subprocess.run(["git", "add", "a.txt"], cwd=self.repo, check=True)
+
+    def test_render(self):
+        shim = self._render()
+        self.assertTrue(os.access(shim, os.X_OK))
+        with open(shim) as f:
+            content = f.read()
+        self.assertIn(f"PY={self.python}\n", content)
+        self.assertNotIn("@", content.split("PY=")[1].split("\n")[0])
+        self.assertFalse(os.path.exists(f"{shim}.tmp"))
+
+    def test_nothing_staged(self):
+        result = self._run(self._render())
+        self.assertEqual(0, result.returncode)
+        self.assertEqual("", result.stdout)
+
+    def test_staged(self):
+        self._stage()
+        result = self._run(self._render())
+        self.assertEqual(0, result.returncode)
+        self.assertEqual(f"-m hooked run pre-commit {self.repo}\n", result.stdout)
+
+    def test_excluded(self):
+        self._stage()
+        shim = self._render(
+            f"exclude_repos: ['/nowhere', '{os.path.dirname(self.repo)}/my*']"
+        )
+        result = self._run(shim)
+        self.assertEqual(0, result.returncode)
+        self.assertEqual("", result.stdout)
+
+    def test_skip(self):
+        self._stage()
+        shim = self._render()
+        self.assertEqual("", self._run(shim, HOOKED_SKIP="1").stdout)
+        with open(os.path.join(self.repo, ".pre-commit-config.yaml"), "w") as f:
+            f.write("repos: []\n")
+        self.assertIn("run pre-commit", self._run(shim, HOOKED_SKIP="1").stdout)
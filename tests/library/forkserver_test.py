@@ -0,0 +1,192 @@
+#  Copyright 2025 T-Systems International GmbH
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are met:
+#
+#  1. Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#  2. Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+#
+#  3. Neither the name of the copyright holder nor the names of its
+#     contributors may be used to endorse or promote products derived from
+#     this software without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+#  DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+#  FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+#  DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+#  SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+#  CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+#  OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#  OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+from __future__ import annotations
+
+import importlib.util
+import os
+import signal
+import socket
+import subprocess as sp
+import sys
+import tempfile
+import time
+import unittest
+from unittest.mock import Mock, patch
+
+import hooked.library.forkserver as lib
+
+SCRIPT = """\
+import os, sys
+if sys.argv[1] == "exit":
+    sys.exit(sys.argv[2])
+print(" ".join(sys.argv[1:]), os.getcwd(), os.getenv("MARKER"), sys.stdout.isatty())
+print("err", file=sys.stderr)
+print("server", os.getppid())
+sys.exit(3)
+"""
+
+
+class ForkserverTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        root = os.path.realpath(self.tmp.name)
+        self.venv = os.path.join(root, "venv")
+        bin_dir = os.path.join(self.venv, "bin")
+        os.makedirs(bin_dir)
+        with open(os.path.join(self.venv, "pyvenv.cfg"), "w") as f:
+            f.write(f"home = {os.path.dirname(os.path.realpath(sys.executable))}\n")
+        self.python = os.path.join(bin_dir, "python")
+        os.symlink(os.path.realpath(sys.executable), self.python)
+        self.script = os.path.join(bin_dir, "tool")
+        with open(self.script, "w") as f:
+            f.write(SCRIPT)
+        env = {"XDG_RUNTIME_DIR": root, "HOOKED_DAEMON_IDLE_TIMEOUT": "30"}
+        patcher = patch.dict(os.environ, env)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        lib._spawned.clear()
+
+    def _serve(self) -> str:
+        """Runs the first request, which starts the server, returns its socket."""
+        self.assertIsNone(lib.run([self.python, self.script, "x"]))
+        path = lib.socket_path(self.python)
+        for _ in range(200):
+            if os.path.exists(path):
+                break
+            time.sleep(0.05)
+        return path
+
+    def _stop(self, out: bytes):
+        pid = int(out.decode().rsplit("server ", 1)[1])
+        os.kill(pid, signal.SIGTERM)
+
+    def test_run(self):
+        path = self._serve()
+        cwd = os.path.join(self.tmp.name, "venv")
+        with patch.dict(os.environ, {"MARKER": "m"}):
+            old_cwd = os.getcwd()
+            os.chdir(cwd)
+            try:
+                rc, out = lib.run([self.python, self.script, "a", "b"])
+            finally:
+                os.chdir(old_cwd)
+        self.addCleanup(self._stop, out)
+        self.assertEqual(3, rc)
+        lines = out.decode().splitlines()
+        self.assertEqual(f"a b {os.path.realpath(cwd)} m False", lines[0])
+        self.assertEqual("err", lines[1])
+
+        rc, again = lib.run([self.python, self.script, "c"])
+        self.assertEqual(again.decode().splitlines()[-1], lines[-1])
+        self.assertTrue(os.path.exists(path))
+
+    def test_run_color(self):
+        self._serve()
+        rc, out = lib.run([self.python, self.script, "a"], color=True)
+        self.addCleanup(self._stop, out)
+        self.assertIn(b" True\n", out)
+        self.assertNotIn(b"\r\n", out)
+
+    def test_exit_message(self):
+        self._serve()
+        rc, out = lib.run([self.python, self.script, "exit", "boom"])
+        self.assertEqual((1, b"boom\n"), (rc, out))
+        _, out = lib.run([self.python, self.script, "a"])
+        self._stop(out)
+
+    def test_rejects_other_users(self):
+        spec = importlib.util.spec_from_file_location("server", lib.server_script())
+        server = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(server)
+        listener = server._listen(os.path.join(self.tmp.name, "s", "sock"))
+        self.addCleanup(listener.close)
+        for uid, accepted in ((os.getuid(), True), (os.getuid() + 1, False)):
+            with socket.socket(socket.AF_UNIX) as client:
+                client.connect(listener.getsockname())
+                socket.send_fds(client, [b"\0"], [1])
+                client.sendall(b'{"argv": ["tool"]}\n')
+                with patch.object(server.os, "getuid", return_value=uid):
+                    request = server._accept(listener)
+            self.assertEqual(accepted, request is not None)
+            if request:
+                request[0].close()
+                os.close(request[2])
+
+    def test_no_environment(self):
+        os.unlink(os.path.join(self.venv, "pyvenv.cfg"))
+        with patch.object(sp, "Popen") as popen:
+            self.assertIsNone(lib.run([self.python, self.script, "a"]))
+        popen.assert_not_called()
+
+    def test_forked_only_routes_console_scripts(self):
+        original = Mock(return_value=(0, b"original", None))
+        cmd_output = lib._forked(original, color=False)
+        with (
+            patch.dict(os.environ, {"VIRTUAL_ENV": self.venv}),
+            patch.object(lib, "run", return_value=(2, b"forked")) as run,
+        ):
+            self.assertEqual(
+                (2, b"forked", None),
+                cmd_output(self.python, self.script, check=False, stderr=sp.STDOUT),
+            )
+            run.assert_called_once_with((self.python, self.script), False)
+            cmd_output("/usr/bin/python3", self.script, check=False, stderr=sp.STDOUT)
+            cmd_output(self.python, "-m", "tool", check=False, stderr=sp.STDOUT)
+            cmd_output(self.python, self.script)
+            run.return_value = None
+            cmd_output(self.python, self.script, check=False, stderr=sp.STDOUT)
+        self.assertEqual(2, run.call_count)
+        self.assertEqual(4, original.call_count)
+
+    def test_patch_pre_commit(self):
+        from pre_commit import xargs
+        from pre_commit.commands import run as run_command
+
+        seen = {}
+
+        def run_single_hook(classifier, hook, *args):
+            seen[hook.id, hook.language] = xargs.cmd_output_b
+
+        original = xargs.cmd_output_b
+        with (
+            patch.object(run_command, "_run_single_hook", run_single_hook),
+            patch.object(xargs, "cmd_output_b", original),
+        ):
+            lib.patch_pre_commit({"black"})
+            for hook_id, language in [("black", "python"), ("isort", "python")]:
+                run_command._run_single_hook(None, Mock(id=hook_id, language=language))
+            run_command._run_single_hook(None, Mock(id="black", language="node"))
+            self.assertIs(original, xargs.cmd_output_b)
+        self.assertIsNot(original, seen["black", "python"])
+        self.assertIs(original, seen["isort", "python"])
+        self.assertIs(original, seen["black", "node"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,209 @@
+#  Copyright 2025 T-Systems International GmbH
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are met:
+#
+#  1. Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#  2. Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+#
+#  3. Neither the name of the copyright holder nor the names of its
+#     contributors may be used to endorse or promote products derived from
+#     this software without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+#  DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+#  FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+#  DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+#  SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+#  CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+#  OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#  OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+from __future__ import annotations
+
+import os
+import subprocess
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import hooked.library.git_index as lib
+from hooked.library.git import git_staged_entries
+
+
+def _git(cwd: str, *args: str) -> str:
+    return subprocess.run(
+        ["git", "-c", "user.name=a", "-c", "user.email=a@b", *args],
+        cwd=cwd,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout.strip()
+
+
+class GitIndexTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.repo = os.path.join(self.tmp.name, "repo")
+        _git(self.tmp.name, "init", "--quiet", "--template=", self.repo)
+        patcher = patch.dict(os.environ)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        for name in ("GIT_DIR", "GIT_INDEX_FILE", "GIT_OBJECT_DIRECTORY"):
+            os.environ.pop(name, None)
+
+    def _write(self, path: str, content: str, mode: int = 0o644):
+        path = os.path.join(self.repo, path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(content)
+        os.chmod(path, mode)
+
+    def _commit(self):
+        _git(self.repo, "add", "-A")
+        _git(self.repo, "commit", "--quiet", "--allow-empty", "-m", "c")
+
+    def _history(self):
+        for i in range(3):
+            for d in ("a", "a/b", "c", "c/d/e"):
+                self._write(f"{d}/f{i}.txt", f"{d} {i}\n")
+            self._write("top.txt", f"top {i}\n")
+            self._commit()
+
+    def _assert_same(self, cwd: str | None = None):
+        cwd = cwd or self.repo
+        native = lib.native_staged_entries(cwd)
+        self.assertEqual(git_staged_entries(cwd), native)
+        return native
+
+    def test_unborn(self):
+        self._write("x.txt", "x\n")
+        self._write("d/y.txt", "y\n")
+        _git(self.repo, "add", "-A")
+        self.assertEqual(["d/y.txt", "x.txt"], [e.path for e in self._assert_same()])
+
+    def test_nothing_staged(self):
+        self._history()
+        self.assertEqual([], self._assert_same())
+
+    def test_changes(self):
+        self._history()
+        self._write("a/b/f0.txt", "changed\n")
+        self._write("a/b/new/g.txt", "new\n")
+        self._write("c/d/e/f1.txt", "exec\n", mode=0o755)
+        self._write("a-b.txt", "sorted before a/\n")
+        self._write("a0.txt", "sorted after a/\n")
+        os.remove(os.path.join(self.repo, "top.txt"))
+        _git(self.repo, "add", "-A")
+        _git(self.repo, "mv", "c/f0.txt", "c/renamed.txt")
+        self.assertEqual(
+            [
+                ("a-b.txt", "A"),
+                ("a/b/f0.txt", "M"),
+                ("a/b/new/g.txt", "A"),
+                ("a0.txt", "A"),
+                ("c/d/e/f1.txt", "M"),
+                ("c/renamed.txt", "A"),
+            ],
+            [(e.path, e.status) for e in self._assert_same()],
+        )
+
+    def test_packed(self):
+        self._history()
+        _git(self.repo, "gc", "--quiet", "--aggressive")
+        self._write("c/d/e/f2.txt", "packed\n")
+        _git(self.repo, "add", "-A")
+        self.assertEqual(1, len(self._assert_same()))
+
+    def test_index_versions(self):
+        self._history()
+        self._write("a/b/f1.txt", "v\n")
+        self._write("a/b/long" * 20 + ".txt", "long\n")
+        _git(self.repo, "add", "-A")
+        for version in ("2", "3", "4"):
+            _git(self.repo, "update-index", "--index-version", version)
+            self.assertEqual(2, len(self._assert_same()))
+
+    def test_intent_to_add_type_change_and_conflict(self):
+        self._history()
+        self._write("ita.txt", "ita\n")
+        _git(self.repo, "add", "--intent-to-add", "ita.txt")
+        os.remove(os.path.join(self.repo, "top.txt"))
+        os.symlink("a", os.path.join(self.repo, "top.txt"))
+        _git(self.repo, "add", "top.txt")
+        self.assertEqual([], self._assert_same())
+
+        _git(self.repo, "rm", "--quiet", "--cached", "ita.txt")
+        os.remove(os.path.join(self.repo, "ita.txt"))
+        _git(self.repo, "commit", "--quiet", "-m", "c")
+        _git(self.repo, "checkout", "--quiet", "-b", "other", "HEAD~1")
+        self._write("a/f0.txt", "other\n")
+        self._commit()
+        _git(self.repo, "checkout", "--quiet", "-")
+        self._write("a/f0.txt", "mine\n")
+        self._write("c/f0.txt", "clean\n")
+        self._commit()
+        with self.assertRaises(subprocess.CalledProcessError):
+            _git(self.repo, "merge", "--quiet", "other")
+        self.assertEqual([], self._assert_same())
+
+    def test_worktree_and_environment(self):
+        self._history()
+        worktree = os.path.join(self.tmp.name, "worktree")
+        _git(self.repo, "worktree", "add", "--quiet", "-b", "wt", worktree)
+        with open(os.path.join(worktree, "a", "f0.txt"), "w") as f:
+            f.write("worktree\n")
+        _git(worktree, "add", "-A")
+        self.assertEqual(["a/f0.txt"], [e.path for e in self._assert_same(worktree)])
+
+        index = os.path.join(self.tmp.name, "index")
+        _git(self.repo, "read-tree", "HEAD~1")
+        os.rename(os.path.join(self.repo, ".git", "index"), index)
+        os.environ["GIT_INDEX_FILE"] = index
+        self.assertEqual(["top.txt"], [e.path for e in self._assert_same()])
+
+    def test_unsupported(self):
+        self._history()
+        _git(self.repo, "update-index", "--split-index")
+        with self.assertRaises(lib.UnsupportedRepository):
+            lib.native_staged_entries(self.repo)
+        self._write("top.txt", "split\n")
+        _git(self.repo, "add", "-A")
+        with patch.object(lib, "git_staged_entries", return_value=[]) as git:
+            self.assertEqual([], lib.staged_entries(self.repo))
+        git.assert_called_once_with(self.repo)
+
+    def test_disabled(self):
+        with (
+            patch.dict(os.environ, {lib.NATIVE_INDEX_ENV: "0"}),
+            patch.object(lib, "native_staged_entries") as native,
+            patch.object(lib, "git_staged_entries", return_value=[]),
+        ):
+            lib.staged_entries(self.repo)
+        native.assert_not_called()
+
+
+class CacheTreeTests(unittest.TestCase):
+    def test_parse(self):
+        sha = bytes(range(20))
+        data = (
+            b"\x003 2\n"
+            + sha
+            + b"a\x002 1\n"
+            + sha
+            + b"b\x00-1 0\n"
+            + b"c\x001 0\n"
+            + sha
+        )
+        self.assertEqual({b"": sha, b"a": sha, b"c": sha}, lib._parse_cache_tree(data))
+
+
+if __name__ == "__main__":
+    unittest.main()
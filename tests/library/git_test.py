@@ -27,6 +27,9 @@
 
 from __future__ import annotations
 
+import os
+import subprocess
+import tempfile
 import unittest
 from unittest.mock import patch
 
@@ -122,3 +125,88 @@ class GitTests(unittest.TestCase):
         )
         dir = "/not/a/repo"
         self.assertFalse(lib.is_git_repo(dir))
+
+    def test_parse_raw_diff(self):
+        sha = "f4d1f7c42304573858383f39582c67aff7d3b3cd"
+        zero = "0" * 40
+        output = (
+            f":000000 100644 {zero} {sha} A\0new file.txt\0"
+            f":100644 100755 {sha} {sha} M\0with\nnewline.sh\0"
+            f":100644 100644 {sha} {sha} C075\0src.py\0copy.py\0"
+        ).encode()
+        self.assertEqual(
+            [
+                lib.StagedEntry("new file.txt", "100644", sha, "A"),
+                lib.StagedEntry("with\nnewline.sh", "100755", sha, "M"),
+                lib.StagedEntry("copy.py", "100644", sha, "C"),
+            ],
+            list(lib._parse_raw_records(iter(output.split(b"\0")))),
+        )
+
+
+class GitObjectReaderTests(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.repo = tmp.name
+        subprocess.run(["git", "init", "--quiet", self.repo], check=True)
+        self.blobs = {}
+        for content in (b"small\n", b"", b"x" * 5000, b"bin\0ary\n" * 100):
+            sha = (
+                subprocess.run(
+                    ["git", "hash-object", "-w", "--stdin"],
+                    cwd=self.repo,
+                    input=content,
+                    capture_output=True,
+                    check=True,
+                )
+                .stdout.decode()
+                .strip()
+            )
+            self.blobs[sha] = content
+        self.reader = lib.GitObjectReader(self.repo)
+        self.addCleanup(self.reader.close)
+
+    def test_info(self):
+        missing = "1" * 40
+        self.assertEqual(
+            [("blob", len(c)) for c in self.blobs.values()] + [None],
+            self.reader.info([*self.blobs, missing]),
+        )
+
+    @patch.object(lib, "_REUSE_MAX", 1000)
+    def test_contents(self):
+        shas = list(self.blobs) * 3
+        contents = [bytes(view) for view in self.reader.contents(shas)]
+        self.assertEqual([self.blobs[sha] for sha in shas], contents)
+        # one process per mode serves all requests
+        p = self.reader._procs["--batch"]
+        self.assertEqual(
+            [b"small\n"], [bytes(v) for v in self.reader.contents(shas[:1])]
+        )
+        self.assertIs(p, self.reader._procs["--batch"])
+
+    def test_missing_and_early_stop(self):
+        shas = list(self.blobs)
+        with self.assertRaises(lib.CommandError):
+            list(self.reader.contents([shas[0], "1" * 40, shas[1]]))
+        contents = self.reader.contents(shas)
+        next(contents)
+        contents.close()
+        self.assertEqual(
+            list(self.blobs.values()),
+            [bytes(view) for view in self.reader.contents(shas)],
+        )
+
+    def test_shared_readers(self):
+        self.addCleanup(lib.close_object_readers)
+        reader = lib.git_object_reader(self.repo)
+        self.assertIs(reader, lib.git_object_reader(os.path.join(self.repo, ".")))
+        self.assertEqual([("blob", 6)], reader.info(list(self.blobs)[:1]))
+        lib.close_object_readers()
+        self.assertEqual({}, reader._procs)
+        self.assertIsNot(reader, lib.git_object_reader(self.repo))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,159 @@
+#  Copyright 2025 T-Systems International GmbH
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are met:
+#
+#  1. Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#  2. Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+#
+#  3. Neither the name of the copyright holder nor the names of its
+#     contributors may be used to endorse or promote products derived from
+#     this software without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+#  DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+#  FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+#  DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+#  SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+#  CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+#  OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#  OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+from __future__ import annotations
+
+import json
+import unittest
+from unittest.mock import patch
+
+import hooked.library.gitleaks as lib
+from hooked.library.cmd_util import CommandError, CommandResult
+
+REPORT = [
+    {
+        "RuleID": "generic-api-key",
+        "Description": "Detected a Generic API Key",
+        "StartLine": 3,
+        "EndLine": 3,
+        "Match": "REDACTED",
+        "Secret": "REDACTED",
+        "File": "src/settings.py",
+        "Fingerprint": "src/settings.py:generic-api-key:3",
+    },
+    {
+        "RuleID": "private-key",
+        "Description": "Identified a Private Key",
+        "StartLine": 10,
+        "EndLine": 14,
+        "Secret": "REDACTED",
+        "File": "id_rsa",
+        "Fingerprint": "id_rsa:private-key:10",
+    },
+]
+
+
+def _gitleaks(returncode: int, report: object = None):
+    """Fakes a gitleaks run writing the given report."""
+
+    def run_cmd(cmd, cwd=None):
+        if report is not None:
+            path = cmd[cmd.index("--report-path") + 1]
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(report, f)
+        result = CommandResult(cmd, returncode, "", "leaks found" if returncode else "")
+        if returncode:
+            raise CommandError(result)
+        return result
+
+    return run_cmd
+
+
+class GitleaksTests(unittest.TestCase):
+    def test_parse_report(self):
+        findings = lib.parse_report(REPORT)
+        self.assertEqual(
+            lib.Finding(
+                rule_id="generic-api-key",
+                description="Detected a Generic API Key",
+                file="src/settings.py",
+                start_line=3,
+                end_line=3,
+                secret="REDACTED",
+                fingerprint="src/settings.py:generic-api-key:3",
+            ),
+            findings[0],
+        )
+        self.assertEqual((10, 14), (findings[1].start_line, findings[1].end_line))
+
+    def test_parse_report_invalid(self):
+        with self.assertRaises(ValueError):
+            lib.parse_report({"RuleID": "x"})
+        with self.assertRaises(ValueError):
+            lib.parse_report(["x"])
+
+    def test_scan_staged_clean(self):
+        with patch("hooked.library.gitleaks.run_cmd", _gitleaks(0, [])):
+            result = lib.scan_staged("/repo", "/config/.gitleaks.toml")
+        self.assertTrue(result.ok)
+        self.assertEqual([], result.findings)
+
+    def test_scan_staged_command(self):
+        with patch("hooked.library.gitleaks.run_cmd") as run_cmd:
+            run_cmd.return_value = CommandResult([], 0, "", "")
+            lib.scan_staged("/repo", "/config/.gitleaks.toml")
+        cmd = run_cmd.call_args.args[0]
+        self.assertEqual(["gitleaks", "git", "--pre-commit", "--staged"], cmd[:4])
+        self.assertIn("--redact", cmd)
+        self.assertEqual("/config/.gitleaks.toml", cmd[cmd.index("--config") + 1])
+        self.assertEqual("/repo", run_cmd.call_args.kwargs["cwd"])
+
+    @patch("hooked.library.gitleaks.may_leak", return_value=False)
+    def test_scan_staged_prefiltered(self, may_leak):
+        with patch("hooked.library.gitleaks.run_cmd") as run_cmd:
+            result = lib.scan_staged("/repo", "/config/.gitleaks.toml", False, 1024)
+        run_cmd.assert_not_called()
+        may_leak.assert_called_once_with("/repo", "/config/.gitleaks.toml", 1024)
+        self.assertTrue(result.ok)
+        self.assertTrue(result.skipped)
+        self.assertIn("Skipped", lib.format_result(result))
+
+    def test_scan_staged_leaks(self):
+        with patch("hooked.library.gitleaks.run_cmd", _gitleaks(1, REPORT)):
+            result = lib.scan_staged("/repo")
+        self.assertFalse(result.ok)
+        self.assertEqual(1, result.returncode)
+        self.assertEqual(
+            ["src/settings.py", "id_rsa"], [f.file for f in result.findings]
+        )
+
+    def test_scan_staged_error(self):
+        with patch("hooked.library.gitleaks.run_cmd", _gitleaks(126)):
+            result = lib.scan_staged("/repo")
+        self.assertFalse(result.ok)
+        self.assertEqual([], result.findings)
+        self.assertIn("Failed", lib.format_result(result))
+
+    @patch("hooked.library.gitleaks.changed_lines")
+    def test_scan_staged_changed_lines_only(self, changed_lines):
+        changed_lines.return_value = {"src/settings.py": [(1, 2)], "id_rsa": [(12, 12)]}
+        with patch("hooked.library.gitleaks.run_cmd", _gitleaks(1, REPORT)):
+            result = lib.scan_staged("/repo", changed_lines_only=True)
+        self.assertEqual(["id_rsa"], [f.file for f in result.findings])
+
+        changed_lines.return_value = {"src/settings.py": [(1, 2)]}
+        with patch("hooked.library.gitleaks.run_cmd", _gitleaks(1, REPORT)):
+            result = lib.scan_staged("/repo", changed_lines_only=True)
+        self.assertTrue(result.ok)
+
+    def test_format_result(self):
+        result = lib.GitleaksResult(1, lib.parse_report(REPORT[:1]))
+        output = lib.format_result(result)
+        self.assertTrue(output.startswith("gitleaks (native)...."))
+        self.assertIn("Failed", output.splitlines()[0])
+        self.assertIn("- src/settings.py:3: generic-api-key", output)
+        self.assertIn("Passed", lib.format_result(lib.GitleaksResult(0)))
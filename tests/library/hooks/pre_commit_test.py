@@ -0,0 +1,541 @@
+#  Copyright 2025 T-Systems International GmbH
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are met:
+#
+#  1. Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#  2. Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+#
+#  3. Neither the name of the copyright holder nor the names of its
+#     contributors may be used to endorse or promote products derived from
+#     this software without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+#  DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+#  FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+#  DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+#  SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+#  CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+#  OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#  OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+from __future__ import annotations
+
+import io
+import os
+import tempfile
+import unittest
+from datetime import datetime
+from pathlib import Path
+from unittest.mock import patch
+
+import hooked.library.hooks.pre_commit as lib
+from hooked.library.cmd_util import CommandResult
+from hooked.library.git import StagedEntry
+from hooked.library.ruleset import RulesetSettings, file_hash, load_hooks
+from hooked.library.sequencer import SequencerState
+from hooked.library.stats import RepoStats
+from hooked.library.verdict_cache import VerdictCache, verdict_key
+
+SHA = "f4d1f7c42304573858383f39582c67aff7d3b3cd"
+
+CONFIG = """
+repos:
+  - repo: https://github.com/pre-commit/pre-commit-hooks
+    rev: v6.0.0
+    hooks:
+      - id: trailing-whitespace
+      - id: check-yaml
+      - id: check-json
+      - id: no-commit-to-branch
+  - repo: local
+    hooks:
+      - id: my-lint
+        name: lint
+        entry: lint
+        language: system
+        pass_filenames: false
+"""
+
+
+def _entry(path: str) -> StagedEntry:
+    return StagedEntry(path, "100644", SHA, "M")
+
+
+def _passed(runs, **_) -> list[CommandResult]:
+    return [CommandResult(run, 0, "", None) for run in runs]
+
+
+def _json_failed(runs, **_) -> list[CommandResult]:
+    return [CommandResult(run, int("check-json" in run), "", None) for run in runs]
+
+
+class _ConfigTestCase(unittest.TestCase):
+    """Runs the orchestration of a config with pre-commit itself mocked."""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = tmp.name
+        self.config = os.path.join(tmp.name, ".pre-commit-config.yaml")
+        self._write_config(CONFIG)
+        self.files = [f"f{i}.py" for i in range(8)]
+        env = {k: v for k, v in os.environ.items() if not k.startswith("HOOKED_")}
+        env.pop("SKIP", None)
+        for patcher in (
+            patch.dict(os.environ, env, clear=True),
+            patch.object(lib, "_pre_commit_popen", return_value=None),
+            patch.object(lib, "load_stats", side_effect=RepoStats),
+            patch.object(lib, "_save_stats"),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.serial = self._patch("_run_serial", return_value=False)
+        self.parallel = self._patch("run_parallel", side_effect=_passed)
+
+    def _patch(self, name: str, **kwargs):
+        patcher = patch.object(lib, name, **kwargs)
+        self.addCleanup(patcher.stop)
+        return patcher.start()
+
+    def _write_config(self, content: str):
+        with open(self.config, "w", encoding="utf-8") as f:
+            f.write(content)
+
+    def _run_files(self, settings: RulesetSettings | None = None, **env: str):
+        with patch.dict(os.environ, env):
+            return lib._run_files(
+                ["pre-commit", "run"],
+                self.config,
+                settings or RulesetSettings(),
+                self.files,
+                Path(self.tmp),
+                {"SKIP": os.environ.get("SKIP", "")},
+                None,
+                self.tmp,
+            )
+
+
+class ShardTests(_ConfigTestCase):
+    SHARDS = {"HOOKED_SHARD_JOBS": "2", "HOOKED_SHARD_MIN_FILES": "1"}
+
+    def test_fixers_and_repository_hooks_run_once(self):
+        self.assertFalse(self._run_files(**self.SHARDS))
+
+        self.serial.assert_called_once()
+        runs, _, env, _ = self.serial.call_args.args
+        self.assertEqual([[*"pre-commit run --files".split(), *self.files]], runs)
+        self.assertEqual("check-yaml,check-json", env["SKIP"])
+
+        shard_runs = self.parallel.call_args.args[0]
+        self.assertEqual(2, len(shard_runs))
+        self.assertEqual(
+            sorted(self.files), sorted(path for run in shard_runs for path in run[3:])
+        )
+        self.assertEqual(
+            "trailing-whitespace,my-lint,no-commit-to-branch",
+            self.parallel.call_args.kwargs["env"]["SKIP"],
+        )
+
+    def test_fail_fast_stops_before_the_shards(self):
+        self.serial.return_value = True
+        self.assertTrue(self._run_files(RulesetSettings(fail_fast=True), **self.SHARDS))
+        self.parallel.assert_not_called()
+
+    def test_nothing_to_shard(self):
+        self._write_config(CONFIG.split("      - id: check-yaml")[0])
+        self.assertFalse(self._run_files(**self.SHARDS))
+        self.parallel.assert_not_called()
+        self.serial.assert_called_once()
+
+
+CHECKS = CONFIG.split("      - id: trailing-whitespace\n")[0] + (
+    "      - id: check-yaml\n      - id: check-json\n"
+)
+
+
+class VerdictTests(_ConfigTestCase):
+    def setUp(self):
+        super().setUp()
+        self._write_config(CHECKS)
+        path = os.path.join(self.tmp, "cache", "verdicts.bin")
+        self._patch("user_verdict_cache", side_effect=lambda: VerdictCache(path, 4096))
+        self._patch("_remote_cache", return_value=None)
+        self.entries = [_entry(path) for path in ("a.json", "b.json", "c.json")]
+
+    def _cache(self, entry: StagedEntry, *hook_ids: str):
+        config_hash = file_hash(self.config)
+        with lib.user_verdict_cache() as cache:
+            for hook in load_hooks(self.config):
+                if hook.id in hook_ids:
+                    cache.add(verdict_key(entry, hook, config_hash))
+
+    def test_drops_files_with_cached_verdicts(self):
+        self._cache(self.entries[0], "check-yaml", "check-json")
+        self._cache(self.entries[1], "check-yaml")
+        remaining, misses = lib._lookup_verdicts(
+            self.config, RulesetSettings(), self.entries, set()
+        )
+        self.assertEqual(self.entries[1:], remaining)
+        self.assertEqual(3, len(misses))
+
+    def test_skipped_hooks_are_ignored(self):
+        self._cache(self.entries[0], "check-yaml")
+        remaining, misses = lib._lookup_verdicts(
+            self.config, RulesetSettings(), self.entries, {"check-json"}
+        )
+        self.assertEqual(self.entries[1:], remaining)
+        self.assertEqual(2, len(misses))
+
+    def test_not_used_with_fixers(self):
+        self._write_config(CONFIG)
+        self.assertEqual(
+            (self.entries, []),
+            lib._lookup_verdicts(self.config, RulesetSettings(), self.entries, set()),
+        )
+
+    def test_cached_checks(self):
+        self._write_config(CONFIG)
+        self._cache(self.entries[0], "check-yaml", "check-json")
+        self._cache(self.entries[1], "check-json")
+        self.assertEqual(
+            {"check-yaml": {"a.json"}, "check-json": {"a.json", "b.json"}},
+            lib._cached_checks(self.config, RulesetSettings(), self.entries),
+        )
+
+    def _run_config(self, **env: str) -> int:
+        self._write_config(CONFIG)
+        env = {"HOOKED_SHARD_JOBS": "1", "HOOKED_HOOK_JOBS": "2", **env}
+        with patch.dict(os.environ, env):
+            return lib._run_config(
+                self.config,
+                RulesetSettings(),
+                Path(self.tmp),
+                {"SKIP": os.environ.get("SKIP", "")},
+                self.entries,
+                set(),
+            )
+
+    def _cached(self) -> dict[str, set[str]]:
+        return lib._cached_checks(self.config, RulesetSettings(), self.entries)
+
+    def test_stores_checks_of_mixed_configs(self):
+        self.assertEqual(0, self._run_config())
+        paths = {entry.path for entry in self.entries}
+        self.assertEqual({"check-yaml": paths, "check-json": paths}, self._cached())
+
+    def test_stores_passed_checks_if_others_failed(self):
+        self.parallel.side_effect = _json_failed
+        self.assertEqual(1, self._run_config())
+        paths = {entry.path for entry in self.entries}
+        self.assertEqual({"check-yaml": paths}, self._cached())
+
+    def test_stores_nothing_if_fixers_failed(self):
+        self.serial.return_value = True
+        self.assertEqual(1, self._run_config())
+        self.assertEqual({}, self._cached())
+
+    def test_stores_no_skipped_checks(self):
+        self.assertEqual(0, self._run_config(SKIP="check-json"))
+        self.assertEqual({"check-yaml"}, set(self._cached()))
+
+    def test_stores_nothing_without_cache(self):
+        self.assertEqual(0, self._run_config(HOOKED_VERDICT_CACHE="0"))
+        self.assertEqual({}, self._cached())
+
+
+class SequencerTests(_ConfigTestCase):
+    def setUp(self):
+        super().setUp()
+        self.staged = [_entry("a.py"), _entry("b.py")]
+        self.state = SequencerState("rebase", ["HEAD"])
+        self._patch("git_dir", return_value=os.path.join(self.tmp, ".git"))
+        self.sequencer_state = self._patch("sequencer_state", return_value=self.state)
+        self.new_blobs = self._patch("new_blobs", return_value=self.staged[1:])
+
+    def _entries(self, policy: str | None = None) -> list[StagedEntry]:
+        settings = RulesetSettings(sequencer_policy=policy)
+        return lib._sequencer_entries(Path(self.tmp), settings, self.staged)
+
+    def test_full(self):
+        self.assertEqual(self.staged, self._entries())
+        self.sequencer_state.assert_not_called()
+
+    def test_skip(self):
+        self.assertEqual([], self._entries("skip"))
+
+    def test_new_blobs(self):
+        self.assertEqual(self.staged[1:], self._entries("new-blobs"))
+        self.new_blobs.assert_called_once_with(self.tmp, self.state, self.staged)
+
+    def test_env_overrides_settings(self):
+        with patch.dict(os.environ, {"HOOKED_SEQUENCER_POLICY": "skip"}):
+            self.assertEqual([], self._entries("new-blobs"))
+
+    def test_no_operation_in_progress(self):
+        self.sequencer_state.return_value = None
+        self.assertEqual(self.staged, self._entries("skip"))
+        self.new_blobs.assert_not_called()
+
+    def test_unknown_policy(self):
+        self.assertEqual(self.staged, self._entries("bogus"))
+        self.sequencer_state.assert_not_called()
+
+
+class RunFilesTests(_ConfigTestCase):
+    SERIAL = {"HOOKED_SHARD_JOBS": "1", "HOOKED_HOOK_JOBS": "1"}
+    SCHEDULED = {"HOOKED_SHARD_JOBS": "1", "HOOKED_HOOK_JOBS": "2"}
+
+    def _hook_runs(self) -> list[str]:
+        return [run[2] for run in self.parallel.call_args.args[0]]
+
+    def test_serial(self):
+        self.assertFalse(self._run_files(**self.SERIAL))
+        self.parallel.assert_not_called()
+        runs, _, env, _ = self.serial.call_args.args
+        self.assertEqual([[*"pre-commit run --files".split(), *self.files]], runs)
+        self.assertEqual("", env["SKIP"])
+
+    def test_scheduled(self):
+        self.assertFalse(self._run_files(**self.SCHEDULED))
+        # the fixers first, in a single run
+        _, _, env, _ = self.serial.call_args.args
+        self.assertEqual("check-yaml,check-json,no-commit-to-branch", env["SKIP"])
+        self.assertEqual(
+            ["check-yaml", "check-json", "no-commit-to-branch"], self._hook_runs()
+        )
+
+    def test_single_check_is_not_scheduled(self):
+        self._write_config(
+            CONFIG.replace("      - id: check-json\n", "").replace(
+                "      - id: no-commit-to-branch\n", ""
+            )
+        )
+        self.assertFalse(self._run_files(**self.SCHEDULED))
+        self.parallel.assert_not_called()
+        self.serial.assert_called_once()
+
+    def test_cached_checks_are_scheduled(self):
+        cached = {"check-yaml": set(self.files), "check-json": set(self.files[1:])}
+        with patch.dict(os.environ, self.SERIAL):
+            self.assertFalse(
+                lib._run_files(
+                    ["pre-commit", "run"],
+                    self.config,
+                    RulesetSettings(),
+                    self.files,
+                    Path(self.tmp),
+                    {"SKIP": ""},
+                    None,
+                    self.tmp,
+                    cached,
+                )
+            )
+        self.assertEqual(["check-json", "no-commit-to-branch"], self._hook_runs())
+        self.assertEqual(
+            [*"pre-commit run check-json --files".split(), self.files[0]],
+            self.parallel.call_args.args[0][0],
+        )
+
+    def test_scheduled_collects_passed_checks(self):
+        self.parallel.side_effect = _json_failed
+        passed = {}
+        with patch.dict(os.environ, self.SCHEDULED):
+            self.assertTrue(
+                lib._run_files(
+                    ["pre-commit", "run"],
+                    self.config,
+                    RulesetSettings(),
+                    self.files,
+                    Path(self.tmp),
+                    {"SKIP": ""},
+                    None,
+                    self.tmp,
+                    {"check-yaml": {self.files[0]}},
+                    passed,
+                )
+            )
+        self.assertEqual(
+            {"check-yaml": set(self.files[1:]), "no-commit-to-branch": set(self.files)},
+            passed,
+        )
+
+    def test_skipped_checks_are_not_scheduled(self):
+        self.assertFalse(self._run_files(SKIP="check-json", **self.SCHEDULED))
+        self.assertEqual(["check-yaml", "no-commit-to-branch"], self._hook_runs())
+
+    def test_shards_take_precedence(self):
+        self.assertFalse(self._run_files(**ShardTests.SHARDS, HOOKED_HOOK_JOBS="2"))
+        self.assertEqual(2, len(self.parallel.call_args.args[0]))
+        self.assertEqual(
+            [*"pre-commit run --files".split()],
+            self.parallel.call_args.args[0][0][:3],
+        )
+
+
+class RunConfigsTests(_ConfigTestCase):
+    def setUp(self):
+        super().setUp()
+        self._write_config(CHECKS)
+        other = os.path.join(self.tmp, "other.yaml")
+        with open(other, "w", encoding="utf-8") as f:
+            f.write(CHECKS)
+        self.configs = [(self.config, {}), (other, {})]
+        self.entries = [_entry(path) for path in self.files]
+        self._patch("_use_snapshot", return_value=False)
+        self.run_config = self._patch("_run_config", return_value=False)
+
+    def _run(self, unstaged: set[str] | None = None) -> int:
+        return lib._run_configs(
+            self.configs,
+            RulesetSettings(),
+            Path(self.tmp),
+            self.entries,
+            unstaged or set(),
+        )
+
+    def _outputs(self) -> list[io.StringIO | None]:
+        return [
+            call.args[6] if len(call.args) > 6 else call.kwargs.get("out")
+            for call in self.run_config.call_args_list
+        ]
+
+    def test_concurrent(self):
+        self.assertEqual(0, self._run())
+        outputs = self._outputs()
+        self.assertEqual(2, len(outputs))
+        self.assertTrue(all(isinstance(out, io.StringIO) for out in outputs))
+
+    def test_serial_with_fixers(self):
+        self._write_config(CONFIG)
+        self.assertEqual(0, self._run())
+        self.assertEqual([None, None], self._outputs())
+
+    def test_serial_stops_at_first_failure(self):
+        self._write_config(CONFIG)
+        self.run_config.return_value = True
+        self.assertEqual(1, self._run())
+        self.run_config.assert_called_once()
+
+    def test_serial_with_partially_staged_files(self):
+        self.assertEqual(0, self._run({self.files[0]}))
+        self.assertEqual([None, None], self._outputs())
+
+    def test_serial_with_unstaged_files(self):
+        self.assertEqual(0, self._run({"pyproject.toml"}))
+        self.assertEqual([None, None], self._outputs())
+
+    def test_serial_if_disabled(self):
+        with patch.dict(os.environ, {"HOOKED_CONCURRENT_CONFIGS": "0"}):
+            self.assertEqual(0, self._run())
+        self.assertEqual([None, None], self._outputs())
+
+
+class SelectFilesTests(unittest.TestCase):
+    def test_staged_files(self):
+        entries = [_entry("a.py"), _entry("b.py")]
+        self.assertEqual(["a.py", "b.py"], lib._select_files(entries, set()))
+
+    def test_unstaged_changes_are_stashed(self):
+        entries = [_entry("a.py")]
+        for unstaged in ({"a.py"}, {"b.txt"}, {".pre-commit-config.yaml"}):
+            self.assertIsNone(lib._select_files(entries, unstaged), unstaged)
+
+
+class UseSnapshotTests(_ConfigTestCase):
+    def _use_snapshot(self, unstaged: set[str]) -> bool:
+        entries = [_entry(path) for path in self.files]
+        return lib._use_snapshot(
+            [(self.config, {})], RulesetSettings(), entries, unstaged
+        )
+
+    def test_unstaged_files(self):
+        self._write_config(CHECKS)
+        self.assertTrue(self._use_snapshot({"pyproject.toml"}))
+        self.assertFalse(self._use_snapshot(set()))
+
+    def test_fixers_use_the_stash(self):
+        self.assertFalse(self._use_snapshot({"pyproject.toml"}))
+
+
+class RunPreCommitHookTests(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.repo = os.path.join(tmp.name, "repo")
+        os.makedirs(self.repo)
+        self.staged = [_entry("a.py"), _entry("b.py")]
+        env = {k: v for k, v in os.environ.items() if not k.startswith("HOOKED_")}
+        env.pop("SKIP", None)
+        mocks = {
+            "get_base_dir": tmp.name,
+            "load_settings": RulesetSettings(),
+            "index_memo_key": "memo",
+            "has_index_memo": False,
+            "record_index_memo": None,
+            "_pre_commit_version": "pre-commit 4.0.0",
+            "get_last_upgrade_timestamp": datetime.now(),
+            "staged_entries": self.staged,
+            "git_unstaged_files": set(),
+            "git_dir": os.path.join(self.repo, ".git"),
+            "git_write_tree": SHA,
+            "_report_deferred": None,
+            "discard_deferral": None,
+            "save_deferral": None,
+            "_pre_commit_popen": None,
+            "_deferred_hooks": [],
+            "_native_gitleaks": False,
+            "_run_configs": 0,
+        }
+        self.mocks = {}
+        for name, value in mocks.items():
+            patcher = patch.object(lib, name, return_value=value)
+            self.mocks[name] = patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = patch.dict(os.environ, env, clear=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _run(self, **env: str) -> int:
+        with patch.dict(os.environ, env):
+            return lib.run_pre_commit_hook([self.repo])
+
+    def test_memo_recorded(self):
+        self.assertEqual(0, self._run())
+        self.mocks["record_index_memo"].assert_called_once_with("memo")
+
+    def test_memo_skips_run(self):
+        self.mocks["has_index_memo"].return_value = True
+        self.assertEqual(0, self._run())
+        self.mocks["_run_configs"].assert_not_called()
+
+    def test_no_memo_with_skip(self):
+        self.assertEqual(0, self._run(SKIP="no-bad"))
+        self.mocks["record_index_memo"].assert_not_called()
+        # the same tree without SKIP runs all hooks
+        self.assertEqual(0, self._run())
+        self.assertEqual(2, self.mocks["_run_configs"].call_count)
+        self.mocks["record_index_memo"].assert_called_once_with("memo")
+
+    def test_no_memo_after_narrowing(self):
+        with patch.object(lib, "_sequencer_entries", return_value=self.staged[:1]):
+            self.assertEqual(0, self._run())
+        self.assertEqual(self.staged[:1], self.mocks["_run_configs"].call_args.args[3])
+        self.mocks["record_index_memo"].assert_not_called()
+
+    def test_no_memo_with_deferred_hooks(self):
+        self.mocks["_deferred_hooks"].return_value = ["slow-check"]
+        self.assertEqual(0, self._run())
+        self.mocks["save_deferral"].assert_called_once()
+        self.mocks["record_index_memo"].assert_not_called()
+
+    def test_no_memo_on_failure(self):
+        self.mocks["_run_configs"].return_value = 1
+        self.assertEqual(1, self._run())
+        self.mocks["record_index_memo"].assert_not_called()
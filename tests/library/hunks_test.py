@@ -0,0 +1,169 @@
+#  Copyright 2025 T-Systems International GmbH
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are met:
+#
+#  1. Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#  2. Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+#
+#  3. Neither the name of the copyright holder nor the names of its
+#     contributors may be used to endorse or promote products derived from
+#     this software without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+#  DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+#  FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+#  DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+#  SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+#  CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+#  OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#  OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+from __future__ import annotations
+
+import json
+import os
+import subprocess
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import hooked.library.hunks as lib
+from hooked.library.git import git_staged_entries
+
+PATCH = b"""diff --git src/a.py src/a.py
+index 1111111..2222222 100644
+--- src/a.py
++++ src/a.py
+@@ -3 +3 @@ def a():
+-    return 1
++    return 2
+@@ -10,0 +11,3 @@ def b():
++x
++y
++z
+@@ -20,2 +22,0 @@ def c():
+-gone
+-gone
+diff --git new file.txt new file.txt
+new file mode 100644
+index 0000000..3333333
+--- /dev/null
++++ new file.txt\t
+@@ -0,0 +1,2 @@
++one
++two
+diff --git "caf\\303\\251\\t.md" "caf\\303\\251\\t.md"
+--- "caf\\303\\251\\t.md"
++++ "caf\\303\\251\\t.md"
+@@ -1 +1 @@
+-a
++b
+diff --git deleted.py deleted.py
+deleted file mode 100644
+--- deleted.py
++++ /dev/null
+@@ -1 +0,0 @@
+-bye
+diff --git image.png image.png
+Binary files image.png and image.png differ
+diff --git old.bin old.bin
+deleted file mode 100644
+Binary files old.bin and /dev/null differ
+diff --git run.sh run.sh
+old mode 100644
+new mode 100755
+"""
+
+# added lines that look like file and hunk headers
+HEADER_CONTENT = b"""diff --git a.txt a.txt
+--- a.txt
++++ a.txt
+@@ -1,2 +1,3 @@
+-- x
+--- y
++++ b.txt
++@@ -1 +1 @@
++++ c.txt
+@@ -9,0 +10 @@
++z
+"""
+
+
+def _git(cwd: str, *args: str) -> str:
+    return subprocess.run(
+        ["git", "-c", "user.name=a", "-c", "user.email=a@b", *args],
+        cwd=cwd,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout.strip()
+
+
+class HunksTests(unittest.TestCase):
+    def test_parse_patch(self):
+        ranges = lib.parse_patch(iter(PATCH.split(b"\n")))
+        self.assertEqual(
+            {
+                "src/a.py": [(3, 3), (11, 13)],
+                "new file.txt": [(1, 2)],
+                "café\t.md": [(1, 1)],
+                "image.png": [],
+                "run.sh": [],
+            },
+            ranges,
+        )
+
+    def test_parse_patch_header_content(self):
+        ranges = lib.parse_patch(iter(HEADER_CONTENT.split(b"\n")))
+        self.assertEqual({"a.txt": [(1, 3), (10, 10)]}, ranges)
+
+    def test_changed_lines(self):
+        with tempfile.TemporaryDirectory() as repo:
+            _git(repo, "init", "--quiet", "--template=")
+            with open(os.path.join(repo, "old.txt"), "w") as f:
+                f.write("".join(f"{i}\n" for i in range(10)))
+            with open(os.path.join(repo, "run.sh"), "w") as f:
+                f.write("echo\n")
+            _git(repo, "add", ".")
+            _git(repo, "commit", "--quiet", "-m", "init")
+
+            _git(repo, "mv", "old.txt", "new.txt")
+            with open(os.path.join(repo, "new.txt"), "a") as f:
+                f.write("++ more\n")
+            with open(os.path.join(repo, "image.png"), "wb") as f:
+                f.write(b"\x89PNG\0\0")
+            os.chmod(os.path.join(repo, "run.sh"), 0o755)
+            _git(repo, "add", "-A")
+
+            ranges = lib.changed_lines(repo)
+            self.assertEqual(
+                {"new.txt": [(1, 11)], "image.png": [], "run.sh": []}, ranges
+            )
+            self.assertEqual(
+                sorted(entry.path for entry in git_staged_entries(repo)),
+                sorted(ranges),
+            )
+
+    def test_in_changed_lines(self):
+        ranges = [(3, 3), (11, 13)]
+        self.assertEqual(
+            [3, 11, 12, 13],
+            [line for line in range(20) if lib.in_changed_lines(ranges, line)],
+        )
+        self.assertFalse(lib.in_changed_lines([], 1))
+
+    @patch("hooked.library.hunks.git_staged_patch")
+    def test_published_changed_lines(self, git_staged_patch):
+        git_staged_patch.return_value = iter(PATCH.split(b"\n"))
+        with lib.published_changed_lines("/repo") as path:
+            with open(path) as f:
+                self.assertEqual([[3, 3], [11, 13]], json.load(f)["src/a.py"])
+            self.assertEqual([(1, 2)], lib.load_changed_lines(path)["new file.txt"])
+        self.assertFalse(os.path.exists(path))
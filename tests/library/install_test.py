@@ -34,17 +34,17 @@ from hooked.library.files import get_base_dir, get_hooks_dir, get_template_dir
 
 
 class InstallTests(unittest.TestCase):
-    @patch("hooked.library.install.run_cmd")
-    def test_get_gitleaks_version(self, run_cmd):
-        run_cmd.return_value.stdout = "foo"
+    @patch("hooked.library.install.tool_version")
+    def test_get_gitleaks_version(self, tool_version):
+        tool_version.return_value = "foo"
         self.assertEqual("foo", lib._get_gitleaks_version())
-        run_cmd.assert_called_once_with(["gitleaks", "--version"])
+        tool_version.assert_called_once_with("gitleaks")
 
-    @patch("hooked.library.install.run_cmd")
-    def test_get_git_version(self, run_cmd):
-        run_cmd.return_value.stdout = "bar"
+    @patch("hooked.library.install.tool_version")
+    def test_get_git_version(self, tool_version):
+        tool_version.return_value = "bar"
         self.assertEqual("bar", lib._get_git_version())
-        run_cmd.assert_called_once_with(["git", "--version"])
+        tool_version.assert_called_once_with("git")
 
     @patch("hooked.library.install.git_set_template_dir")
     @patch("hooked.library.install.git_set_global_hook_path")
@@ -94,18 +94,23 @@ class InstallTests(unittest.TestCase):
         git_set_global_hook_path.assert_called_once_with(get_hooks_dir())
         git_set_template_dir.assert_called_once_with(get_template_dir())
 
+    @patch("hooked.library.install.probe_versions")
     @patch("hooked.library.install._check_precommit")
     @patch("hooked.library.install._check_git")
     @patch("hooked.library.install._check_gitleaks")
-    def test_check_pre_requisities(self, _check_gitleaks, _check_git, _check_precommit):
+    def test_check_pre_requisities(
+        self, _check_gitleaks, _check_git, _check_precommit, probe_versions
+    ):
         lib.check_pre_requisites()
+        probe_versions.assert_called_once_with(["gitleaks", "git", "pre-commit"])
         _check_gitleaks.assert_called_once()
         _check_git.assert_called_once()
         _check_precommit.assert_called_once()
 
+    @patch("hooked.library.install.probe_versions")
     @patch("hooked.library.install._check_git")
     @patch("hooked.library.install._check_gitleaks")
-    def test_check_pre_requisities_error1(self, _check_gitleaks, _check_git):
+    def test_check_pre_requisities_error1(self, _check_gitleaks, _check_git, _):
         _check_gitleaks.side_effect = RuntimeError()
 
         with self.assertRaises(RuntimeError):
@@ -114,9 +119,10 @@ class InstallTests(unittest.TestCase):
         _check_gitleaks.assert_called_once()
         _check_git.assert_not_called()
 
+    @patch("hooked.library.install.probe_versions")
     @patch("hooked.library.install._check_git")
     @patch("hooked.library.install._check_gitleaks")
-    def test_check_pre_requisities_error2(self, _check_gitleaks, _check_git):
+    def test_check_pre_requisities_error2(self, _check_gitleaks, _check_git, _):
         _check_git.side_effect = RuntimeError()
 
         with self.assertRaises(RuntimeError):
@@ -131,3 +137,14 @@ class InstallTests(unittest.TestCase):
         self.assertEqual(Version("1.2.3"), lib._parse_version("1.2.3"))
         self.assertEqual(Version("0.0.0"), lib._parse_version("not.a.version"))
         self.assertEqual(Version("2.51.1"), lib._parse_version("2.51.1.windows.1"))
+
+    @patch("hooked.library.install._get_gitleaks_version")
+    def test_check_gitleaks(self, _get_gitleaks_version):
+        from packaging.version import Version
+
+        _get_gitleaks_version.return_value = "gitleaks version 8.28.0"
+        self.assertEqual(Version("8.28.0"), lib._check_gitleaks(verbose=False))
+
+        _get_gitleaks_version.return_value = "gitleaks version 8.18.0"
+        with self.assertRaises(RuntimeError):
+            lib._check_gitleaks()
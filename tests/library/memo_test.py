@@ -0,0 +1,86 @@
+#  Copyright 2025 T-Systems International GmbH
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are met:
+#
+#  1. Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#  2. Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+#
+#  3. Neither the name of the copyright holder nor the names of its
+#     contributors may be used to endorse or promote products derived from
+#     this software without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+#  DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+#  FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+#  DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+#  SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+#  CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+#  OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#  OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+from __future__ import annotations
+
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import hooked.library.memo as lib
+from hooked.library.cmd_util import CommandError, CommandResult
+
+
+class MemoTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        patcher = patch("hooked.library.memo.get_cache_dir", return_value=self.tmp.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.tmp.cleanup)
+
+    @patch("hooked.library.memo.ruleset_hash", return_value="rules")
+    @patch("hooked.library.memo.git_head", return_value=("sha", "refs/heads/main"))
+    @patch("hooked.library.memo.git_write_tree")
+    def test_index_memo_key(self, git_write_tree, git_head, ruleset_hash):
+        local_config = os.path.join(self.tmp.name, ".pre-commit-config.yaml")
+        git_write_tree.return_value = "tree1"
+        key = lib.index_memo_key("/repo", "/config", local_config)
+        self.assertEqual(key, lib.index_memo_key("/repo", "/config", local_config))
+
+        git_write_tree.return_value = "tree2"
+        self.assertNotEqual(key, lib.index_memo_key("/repo", "/config", local_config))
+
+        git_write_tree.return_value = "tree1"
+        git_head.return_value = ("sha", "refs/heads/feature")
+        self.assertNotEqual(key, lib.index_memo_key("/repo", "/config", local_config))
+
+        git_head.return_value = ("sha", "refs/heads/main")
+        with open(local_config, "w") as f:
+            f.write("repos: []")
+        self.assertNotEqual(key, lib.index_memo_key("/repo", "/config", local_config))
+
+    @patch("hooked.library.memo.git_write_tree")
+    def test_index_memo_key_unmerged(self, git_write_tree):
+        git_write_tree.side_effect = CommandError(CommandResult([], 128, "", ""))
+        self.assertIsNone(lib.index_memo_key("/repo", "/config", "/nope"))
+
+    def test_record_and_lookup(self):
+        self.assertFalse(lib.has_index_memo("a"))
+        lib.record_index_memo("a")
+        lib.record_index_memo("b")
+        self.assertTrue(lib.has_index_memo("a"))
+        self.assertTrue(lib.has_index_memo("b"))
+
+    @patch("hooked.library.memo.MEMO_SIZE", 2)
+    def test_record_keeps_most_recent(self):
+        for key in ("a", "b", "a", "c"):
+            lib.record_index_memo(key)
+        self.assertFalse(lib.has_index_memo("b"))
+        self.assertTrue(lib.has_index_memo("a"))
+        self.assertTrue(lib.has_index_memo("c"))
@@ -0,0 +1,120 @@
+#  Copyright 2025 T-Systems International GmbH
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are met:
+#
+#  1. Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#  2. Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+#
+#  3. Neither the name of the copyright holder nor the names of its
+#     contributors may be used to endorse or promote products derived from
+#     this software without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+#  DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+#  FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+#  DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+#  SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+#  CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+#  OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#  OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+from __future__ import annotations
+
+import os
+import signal
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import hooked.library.pre_commit_worker as lib
+from hooked.library.cmd_util import CommandError, run_parallel, run_stream
+
+
+def _entry(argv):
+    """Stands in for pre-commit's main, driven by its arguments."""
+    match argv:
+        case ["echo", *args]:
+            print(" ".join(args), os.getcwd(), os.getenv("MARKER"), flush=True)
+            sys.stderr.write("err\n")
+            return 0
+        case ["exit", rc]:
+            raise SystemExit(int(rc))
+        case ["kill"]:
+            os.kill(os.getpid(), signal.SIGKILL)
+        case _:
+            raise RuntimeError(argv)
+
+
+class PreCommitWorkerTests(unittest.TestCase):
+    def setUp(self):
+        self.worker = lib.PreCommitWorker(entry=_entry, warm=None)
+        self.assertTrue(self.worker.start())
+        self.addCleanup(self.worker.close)
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.cwd = os.path.realpath(self.tmp.name)
+
+    def test_run_stream(self):
+        result = run_stream(
+            ["pre-commit", "echo", "a", "b"],
+            cwd=self.cwd,
+            env={"MARKER": "m"},
+            popen=self.worker.popen,
+        )
+        self.assertEqual(f"a b {self.cwd} m\n", result.stdout)
+        self.assertEqual("err\n", result.stderr)
+
+    def test_run_stream_fails(self):
+        with self.assertRaises(CommandError) as cm:
+            run_stream(["pre-commit", "exit", "3"], popen=self.worker.popen)
+        self.assertEqual(3, cm.exception.result.returncode)
+
+    def test_run_parallel(self):
+        cmds = [["pre-commit", "echo", str(i)] for i in range(8)]
+        cmds += [["pre-commit", "exit", "1"], ["pre-commit", "kill"]]
+        results = run_parallel(
+            cmds, jobs=4, cwd=self.cwd, env={}, popen=self.worker.popen
+        )
+        self.assertEqual(
+            [f"{i} {self.cwd} None\nerr\n" for i in range(8)],
+            [r.stdout for r in results[:8]],
+        )
+        self.assertEqual([1, -signal.SIGKILL], [r.returncode for r in results[8:]])
+
+    def test_error(self):
+        with open(os.devnull, "w") as devnull, patch("sys.stderr", devnull):
+            process = self.worker.popen(["pre-commit", "unknown"], stderr=None)
+        with process:
+            pass
+        self.assertEqual(lib._EX_SOFTWARE, process.returncode)
+
+    def test_other_commands(self):
+        process = self.worker.popen([sys.executable, "-c", "print(1)"], stdout=-1)
+        self.assertNotIsInstance(process, lib.WorkerProcess)
+        with process:
+            self.assertEqual(b"1\n", process.stdout.read())
+
+    def test_worker_gone(self):
+        self.worker.close()
+        result = run_stream([sys.executable, "-c", "print(1)"], popen=self.worker.popen)
+        self.assertEqual("1\n", result.stdout)
+        with self.assertRaises(CommandError):
+            run_stream(["pre-commit", "--version"], popen=self.worker.popen, env={})
+
+    @patch.dict(os.environ, {lib.BACKEND_ENV: "subprocess"})
+    def test_subprocess_backend(self):
+        self.assertFalse(lib.fork_backend())
+        self.assertIsNone(lib.start_worker())
+
+    def test_pre_commit_version(self):
+        from pre_commit.constants import VERSION
+
+        self.assertEqual(f"pre-commit {VERSION}", lib.pre_commit_version())
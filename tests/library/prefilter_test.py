@@ -0,0 +1,199 @@
+#  Copyright 2025 T-Systems International GmbH
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are met:
+#
+#  1. Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#  2. Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+#
+#  3. Neither the name of the copyright holder nor the names of its
+#     contributors may be used to endorse or promote products derived from
+#     this software without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+#  DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+#  FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+#  DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+#  SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+#  CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+#  OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#  OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+from __future__ import annotations
+
+import base64
+import os
+import subprocess
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import hooked.library.prefilter as lib
+
+CONFIG = """
+title = "test"
+
+[[rules]]
+id = "aws-access-token"
+regex = '''(?:A3T[A-Z0-9]|AKIA|ASIA|ABIA|ACCA)[A-Z2-7]{16}'''
+keywords = ["AKIA", "ASIA", "ABIA", "ACCA", "A3T"]
+
+[[rules]]
+id = "github-pat"
+regex = '''ghp_[0-9a-zA-Z]{36}'''
+keywords = ["ghp_"]
+
+[[rules]]
+id = "generic-password"
+regex = '''password\\s*=\\s*\\S+'''
+keywords = ["password", "passwd"]
+"""
+
+
+def _git(cwd: str, *args: str) -> str:
+    return subprocess.run(
+        ["git", "-c", "user.name=a", "-c", "user.email=a@b", *args],
+        cwd=cwd,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout.strip()
+
+
+class KeywordTests(unittest.TestCase):
+    def setUp(self):
+        self.pattern = lib.keyword_pattern(("akia", "ghp_", "pass", "passwd"))
+
+    def _contains(self, data: bytes) -> bool:
+        return lib.contains_keyword(self.pattern, data, [1 << 20])
+
+    def test_extract_keywords(self):
+        import tomllib
+
+        self.assertEqual(
+            ("a3t", "abia", "acca", "akia", "asia", "ghp_", "passwd", "password"),
+            lib.extract_keywords(tomllib.loads(CONFIG)),
+        )
+
+    def test_extract_keywords_unfilterable(self):
+        self.assertIsNone(lib.extract_keywords({}))
+        self.assertIsNone(lib.extract_keywords({"extend": {"useDefault": True}}))
+        self.assertIsNone(
+            lib.extract_keywords({"rules": [{"keywords": ["a"]}, {"path": "x"}]})
+        )
+        self.assertIsNone(lib.extract_keywords({"rules": [{"keywords": ["ключ"]}]}))
+
+    def test_keyword_pattern(self):
+        self.assertTrue(self.pattern.search(b"xx ghp_123"))
+        self.assertTrue(self.pattern.search(b"my passwd"))
+        self.assertTrue(self.pattern.search(b"pass"))
+        self.assertFalse(self.pattern.search(b"pas akiX ghp-"))
+
+    def test_contains_keyword(self):
+        self.assertTrue(self._contains(b"key = AKIAXYZ"))
+        self.assertFalse(self._contains(b"print('hello world')"))
+
+    def test_contains_keyword_folds_case_like_go(self):
+        # KELVIN SIGN lower cases to k
+        self.assertTrue(self._contains("A\u212aIA".encode()))
+
+    def test_contains_keyword_decoded(self):
+        secret = b'token = "ghp_abcdef0123456789"'
+        encoded = base64.b64encode(secret)
+        self.assertTrue(self._contains(b"x = " + encoded))
+        self.assertTrue(self._contains(b"prefix_" + encoded))
+        self.assertTrue(self._contains(base64.urlsafe_b64encode(b"?>" + secret)))
+        self.assertTrue(self._contains(base64.b64encode(encoded + b"\n")))
+        self.assertTrue(self._contains(secret.hex().encode()))
+        self.assertTrue(self._contains(b"x=%41KIA"))
+        self.assertTrue(self._contains(b"x=\\u0041KIA"))
+        self.assertTrue(self._contains(b"U+0041 U+004B\nU+0049 U+0041"))
+
+    def test_contains_keyword_budget(self):
+        with self.assertRaises(lib.BudgetExceeded):
+            lib.contains_keyword(self.pattern, b"x" * 100, [50])
+
+
+class MayLeakTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.repo = os.path.join(self.tmp.name, "repo")
+        _git(self.tmp.name, "init", "--quiet", "--template=", self.repo)
+        self._write("README.md", "readme\n")
+        _git(self.repo, "add", ".")
+        _git(self.repo, "commit", "--quiet", "-m", "init")
+        self.config = os.path.join(self.tmp.name, ".gitleaks.toml")
+        with open(self.config, "w") as f:
+            f.write(CONFIG)
+        patcher = patch(
+            "hooked.library.prefilter.get_cache_dir",
+            return_value=os.path.join(self.tmp.name, "cache"),
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _write(self, path: str, content: str):
+        with open(os.path.join(self.repo, path), "w") as f:
+            f.write(content)
+
+    def test_clean(self):
+        self._write("app.py", "print('hello')\n")
+        _git(self.repo, "add", "app.py")
+        self.assertFalse(lib.may_leak(self.repo, self.config))
+
+    def test_keyword_staged(self):
+        self._write("app.py", "print('hello')\n")
+        self._write("settings.py", "PASSWORD = 'hunter2'\n")
+        _git(self.repo, "add", ".")
+        self.assertTrue(lib.may_leak(self.repo, self.config))
+
+    def test_keyword_only_unstaged(self):
+        self._write("settings.py", "x = 1\n")
+        _git(self.repo, "add", ".")
+        self._write("settings.py", "PASSWORD = 'hunter2'\n")
+        self.assertFalse(lib.may_leak(self.repo, self.config))
+
+    def test_renamed(self):
+        self._write("README.md", "readme\npassword = 1\n")
+        _git(self.repo, "mv", "README.md", "README.txt")
+        _git(self.repo, "add", ".")
+        self.assertTrue(lib.may_leak(self.repo, self.config))
+
+    def test_budget(self):
+        self._write("big.txt", "x" * 1000)
+        _git(self.repo, "add", ".")
+        self.assertTrue(lib.may_leak(self.repo, self.config, max_bytes=100))
+
+    def test_textconv(self):
+        self._write("app.py", "print('hello')\n")
+        _git(self.repo, "add", ".")
+        _git(self.repo, "config", "diff.secret.textconv", "cat")
+        self.assertTrue(lib.may_leak(self.repo, self.config))
+
+    def test_keywords_cached(self):
+        keywords = lib.load_keywords(self.config)
+        with patch("hooked.library.prefilter.extract_keywords") as extract_keywords:
+            self.assertEqual(keywords, lib.load_keywords(self.config))
+        extract_keywords.assert_not_called()
+
+    def test_keywords_not_cached(self):
+        keywords = lib.load_keywords(self.config)
+        self._write("settings.py", "PASSWORD = 'hunter2'\n")
+        _git(self.repo, "add", ".")
+        with tempfile.TemporaryDirectory() as tmp:
+            cache_dir = os.path.join(tmp, "cache")
+            os.makedirs(os.path.join(cache_dir, "gitleaks"))
+            with (
+                patch("hooked.library.prefilter.get_cache_dir", return_value=cache_dir),
+                patch("hooked.library.prefilter.os.replace", side_effect=OSError),
+            ):
+                self.assertEqual(keywords, lib.load_keywords(self.config))
+                self.assertTrue(lib.may_leak(self.repo, self.config))
+            self.assertEqual([], os.listdir(os.path.join(cache_dir, "gitleaks")))
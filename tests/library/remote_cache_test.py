@@ -0,0 +1,151 @@
+#  Copyright 2025 T-Systems International GmbH
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are met:
+#
+#  1. Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#  2. Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+#
+#  3. Neither the name of the copyright holder nor the names of its
+#     contributors may be used to endorse or promote products derived from
+#     this software without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+#  DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+#  FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+#  DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+#  SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+#  CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+#  OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#  OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+from __future__ import annotations
+
+import http.client
+import json
+import os
+import socketserver
+import tempfile
+import threading
+import unittest
+
+import hooked.library.remote_cache as lib
+from hooked.library.verdict_cache import KEY_SIZE, VerdictCache
+
+
+class RemoteCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = VerdictCache(os.path.join(self.tmp.name, "server.bin")).open()
+        self.server = lib.CacheServer(("127.0.0.1", 0), self.cache, token="s3cret")
+        self.thread = threading.Thread(
+            target=self.server.serve_forever, args=(0.01,), daemon=True
+        )
+        self.thread.start()
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.cache.close()
+        self.tmp.cleanup()
+
+    def test_upload_and_lookup(self):
+        client = lib.RemoteVerdictCache(self.url, timeout=5, token="s3cret")
+        known = [bytes([i]) * KEY_SIZE for i in range(3)]
+        unknown = b"x" * KEY_SIZE
+
+        self.assertEqual(set(), client.lookup(known))
+        client.upload(known)
+        self.assertEqual(set(known), client.lookup([*known, unknown]))
+
+    def test_wrong_token_is_a_miss(self):
+        key = b"k" * KEY_SIZE
+        lib.RemoteVerdictCache(self.url, timeout=5, token="s3cret").upload([key])
+        client = lib.RemoteVerdictCache(self.url, timeout=5, token="wrong")
+        self.assertEqual(set(), client.lookup([key]))
+
+    def test_unreachable_server_is_a_miss(self):
+        self.server.shutdown()
+        self.server.server_close()
+        client = lib.RemoteVerdictCache(self.url, timeout=0.2)
+        self.assertEqual(set(), client.lookup([b"k" * KEY_SIZE]))
+        client.upload([b"k" * KEY_SIZE])
+
+    def test_decode_keys_rejects_invalid(self):
+        with self.assertRaises(ValueError):
+            lib._decode_keys(["abcd"])
+        with self.assertRaises(ValueError):
+            lib._decode_keys("not a list")
+
+    def test_malformed_requests(self):
+        conn = http.client.HTTPConnection(
+            "127.0.0.1", self.server.server_port, timeout=5
+        )
+        self.addCleanup(conn.close)
+        headers = {"Authorization": "Bearer s3cret"}
+        for body in ({"keys": [1]}, {"keys": "ab"}, [1], {"keys": [None]}):
+            conn.request("POST", lib.LOOKUP_PATH, json.dumps(body), headers)
+            response = conn.getresponse()
+            response.read()
+            self.assertEqual(400, response.status, body)
+        conn.request("POST", lib.UPLOAD_PATH, b"", {**headers, "Content-Length": "-1"})
+        self.assertEqual(400, conn.getresponse().status)
+
+
+class _CannedHandler(socketserver.StreamRequestHandler):
+    """Answers every request with the canned reply of the test."""
+
+    reply = b""
+
+    def handle(self):
+        length = 0
+        while line := self.rfile.readline():
+            if line.lower().startswith(b"content-length:"):
+                length = int(line.split(b":")[1])
+            if line == b"\r\n":
+                break
+        self.rfile.read(length)
+        self.wfile.write(self.reply)
+
+
+class MalformedReplyTests(unittest.TestCase):
+    def _client(self, reply: bytes) -> lib.RemoteVerdictCache:
+        handler = type("Handler", (_CannedHandler,), {"reply": reply})
+        server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, args=(0.01,), daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return lib.RemoteVerdictCache(
+            f"http://127.0.0.1:{server.server_address[1]}", timeout=5
+        )
+
+    def _ok(self, body: bytes, length: int | None = None) -> bytes:
+        length = len(body) if length is None else length
+        return (
+            b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+            + f"Content-Length: {length}\r\nConnection: close\r\n\r\n".encode()
+            + body
+        )
+
+    def test_malformed_replies_are_misses(self):
+        key = b"k" * KEY_SIZE
+        for reply in (
+            self._ok(b'{"hits": [1]}'),
+            self._ok(b'{"hits": "6b6b"}'),
+            self._ok(b"[1]"),
+            self._ok(b"\xff"),
+            self._ok(b'{"hits": []}', length=100),
+            b"garbage\r\n\r\n",
+            b"",
+        ):
+            client = self._client(reply)
+            self.assertEqual(set(), client.lookup([key]), reply)
+            client.upload([key])
@@ -0,0 +1,150 @@
+#  Copyright 2025 T-Systems International GmbH
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are met:
+#
+#  1. Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#  2. Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+#
+#  3. Neither the name of the copyright holder nor the names of its
+#     contributors may be used to endorse or promote products derived from
+#     this software without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+#  DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+#  FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+#  DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+#  SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+#  CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+#  OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#  OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+from __future__ import annotations
+
+import os
+import tempfile
+import unittest
+
+import hooked.library.ruleset as lib
+
+CONFIG = """
+default_stages: [pre-commit]
+repos:
+  - repo: https://github.com/pre-commit/pre-commit-hooks
+    rev: v6.0.0
+    hooks:
+      - id: check-yaml
+        args: [--unsafe]
+      - id: trailing-whitespace
+      - id: no-commit-to-branch
+        stages: [manual]
+  - repo: local
+    hooks:
+      - id: my-check
+        name: my check
+        entry: true
+        language: system
+      - id: my-repo-check
+        name: my repository check
+        entry: true
+        language: system
+        pass_filenames: false
+"""
+
+SETTINGS = """
+fail_fast: true
+native_gitleaks: true
+drop_gitleaks_hook: true
+exclude_repos: ~/scratch/*
+hooks:
+  my-check:
+    read_only: true
+    cacheable: true
+  check-yaml:
+    cacheable: false
+  slow-check:
+    tier: deferred
+  black:
+    forkserver: true
+  gitleaks:
+    tier: deferred
+"""
+
+
+class RulesetTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.config = os.path.join(self.tmp.name, lib.PRE_COMMIT_CONFIG)
+        with open(self.config, "w", encoding="utf-8") as f:
+            f.write(CONFIG)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_load_hooks(self):
+        hooks = lib.load_hooks(self.config)
+        self.assertEqual(
+            [
+                lib.HookSpec(
+                    "check-yaml",
+                    "https://github.com/pre-commit/pre-commit-hooks",
+                    "v6.0.0",
+                    ("--unsafe",),
+                ),
+                lib.HookSpec(
+                    "trailing-whitespace",
+                    "https://github.com/pre-commit/pre-commit-hooks",
+                    "v6.0.0",
+                ),
+                lib.HookSpec("my-check", "local"),
+                lib.HookSpec("my-repo-check", "local", pass_filenames=False),
+            ],
+            hooks,
+        )
+        self.assertEqual(
+            [True, True, True, False], [hook.runs_on_files for hook in hooks]
+        )
+        self.assertFalse(lib.HookSpec("gitleaks", "repo").runs_on_files)
+        self.assertFalse(lib.HookSpec("check", "local", always_run=True).runs_on_files)
+
+    def test_load_hooks_invalid(self):
+        with open(self.config, "w", encoding="utf-8") as f:
+            f.write("repos: [{hooks: [{name: missing id}]}]")
+        with self.assertRaises(ValueError):
+            lib.load_hooks(self.config)
+
+    def test_default_settings(self):
+        settings = lib.load_settings(self.tmp.name)
+        self.assertTrue(settings.is_read_only("check-yaml"))
+        self.assertTrue(settings.is_cacheable("check-yaml"))
+        self.assertTrue(settings.is_read_only("no-commit-to-branch"))
+        self.assertFalse(settings.is_cacheable("no-commit-to-branch"))
+        self.assertFalse(settings.is_read_only("trailing-whitespace"))
+        self.assertFalse(settings.is_read_only("my-check"))
+        self.assertFalse(settings.fail_fast)
+        self.assertFalse(settings.native_gitleaks)
+        self.assertFalse(settings.drop_gitleaks_hook)
+        self.assertEqual([], settings.exclude_repos)
+        self.assertEqual([], settings.forkserver_hooks())
+
+    def test_settings_overrides(self):
+        with open(os.path.join(self.tmp.name, lib.SETTINGS_FILE), "w") as f:
+            f.write(SETTINGS)
+        settings = lib.load_settings(self.tmp.name)
+        self.assertTrue(settings.is_cacheable("my-check"))
+        self.assertTrue(settings.is_read_only("check-yaml"))
+        self.assertFalse(settings.is_cacheable("check-yaml"))
+        self.assertTrue(settings.fail_fast)
+        self.assertTrue(settings.native_gitleaks)
+        self.assertTrue(settings.drop_gitleaks_hook)
+        self.assertEqual(["~/scratch/*"], settings.exclude_repos)
+        self.assertEqual(lib.HookTier.DEFERRED, settings.hook_tier("slow-check"))
+        self.assertEqual(lib.HookTier.BLOCKING, settings.hook_tier("gitleaks"))
+        self.assertIsNone(settings.hook_tier("my-check"))
+        self.assertEqual(["black"], settings.forkserver_hooks())
@@ -0,0 +1,115 @@
+#  Copyright 2025 T-Systems International GmbH
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are met:
+#
+#  1. Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#  2. Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+#
+#  3. Neither the name of the copyright holder nor the names of its
+#     contributors may be used to endorse or promote products derived from
+#     this software without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+#  DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+#  FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+#  DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+#  SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+#  CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+#  OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#  OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+from __future__ import annotations
+
+import unittest
+
+import hooked.library.scheduler as lib
+from hooked.library.cmd_util import CommandResult
+from hooked.library.ruleset import HookSettings, HookSpec, HookTier, RulesetSettings
+from hooked.library.stats import RepoStats, record_hook
+
+
+class SchedulerTests(unittest.TestCase):
+    def test_parse_skip(self):
+        self.assertEqual(set(), lib.parse_skip(None))
+        self.assertEqual({"a", "b"}, lib.parse_skip(" a,,b ,"))
+
+    def test_split_hooks(self):
+        settings = RulesetSettings(
+            hooks={"my-linter": HookSettings(read_only=True, cacheable=None)}
+        )
+        hooks = [
+            HookSpec("check-yaml", "repo"),
+            HookSpec("trailing-whitespace", "repo"),
+            HookSpec("my-linter", "local"),
+            HookSpec("check-json", "repo"),
+            HookSpec("check-yaml", "repo", args=("--unsafe",)),
+        ]
+
+        fixers, checks = lib.split_hooks(hooks, settings, {"check-json"})
+        self.assertEqual(["trailing-whitespace"], fixers)
+        self.assertEqual(["check-yaml", "my-linter"], checks)
+
+    def test_plan_deferral(self):
+        settings = RulesetSettings(
+            hooks={
+                "slow-lint": HookSettings(tier=HookTier.DEFERRED),
+                "must-block": HookSettings(tier=HookTier.BLOCKING),
+                "gitleaks": HookSettings(tier=HookTier.DEFERRED),
+            }
+        )
+        stats = RepoStats(repo="/repo")
+        for hook_id, duration in (("must-block", 9.0), ("big", 6.0), ("small", 1.0)):
+            record_hook(stats, hook_id, True, duration)
+        checks = ["gitleaks", "small", "slow-lint", "must-block", "big"]
+
+        self.assertEqual(
+            ["slow-lint"], lib.plan_deferral(checks, settings, stats, None, 1)
+        )
+        self.assertEqual(
+            ["small", "slow-lint", "big"],
+            lib.plan_deferral(checks, settings, stats, 5.0, 1),
+        )
+        self.assertEqual(
+            ["slow-lint", "big"], lib.plan_deferral(checks, settings, stats, 12.0, 1)
+        )
+        self.assertEqual(
+            ["slow-lint"], lib.plan_deferral(checks, settings, stats, 9.0, 2)
+        )
+
+    def test_repository_hooks_are_never_deferred(self):
+        settings = RulesetSettings(
+            hooks={"no-commit-to-branch": HookSettings(tier=HookTier.DEFERRED)}
+        )
+        stats = RepoStats(repo="/repo")
+        record_hook(stats, "no-commit-to-branch", True, 9.0)
+        record_hook(stats, "slow-lint", True, 6.0)
+        checks = ["no-commit-to-branch", "slow-lint"]
+
+        self.assertEqual([], lib.plan_deferral(checks, settings, stats, None, 1))
+        self.assertEqual(
+            ["slow-lint"], lib.plan_deferral(checks, settings, stats, 1.0, 1)
+        )
+
+    def test_hook_results(self):
+        results = lib.hook_results(
+            ["a", "a", "b"],
+            [
+                CommandResult(["a"], 1, None, None, 1.0),
+                CommandResult(["a"], 0, None, None, 2.0),
+                CommandResult(["b"], 0, None, None, 0.5),
+            ],
+        )
+
+        self.assertEqual(
+            [lib.HookResult("a", 1, 3.0), lib.HookResult("b", 0, 0.5)], results
+        )
+        self.assertEqual(
+            "a  Failed    3.00s\nb  Passed    0.50s", lib.format_summary(results)
+        )
@@ -0,0 +1,98 @@
+#  Copyright 2025 T-Systems International GmbH
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are met:
+#
+#  1. Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#  2. Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+#
+#  3. Neither the name of the copyright holder nor the names of its
+#     contributors may be used to endorse or promote products derived from
+#     this software without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+#  DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+#  FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+#  DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+#  SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+#  CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+#  OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#  OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+from __future__ import annotations
+
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import hooked.library.sequencer as lib
+from hooked.library.cmd_util import CommandError, CommandResult
+from hooked.library.git import StagedEntry
+
+
+class SequencerTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.git_dir = self.tmp.name
+        self.addCleanup(self.tmp.cleanup)
+
+    def _write(self, *path: str, content: str = ""):
+        os.makedirs(os.path.join(self.git_dir, *path[:-1]), exist_ok=True)
+        with open(os.path.join(self.git_dir, *path), "w") as f:
+            f.write(content)
+
+    def test_no_operation(self):
+        self.assertIsNone(lib.sequencer_state(self.git_dir))
+
+    def test_rebase(self):
+        self._write("rebase-merge", "onto", content="aaa\n")
+        self._write("rebase-merge", "orig-head", content="bbb\n")
+        state = lib.sequencer_state(self.git_dir)
+        self.assertEqual(lib.SequencerState("rebase", ["bbb", "--not", "aaa"]), state)
+
+    def test_am(self):
+        self._write("rebase-apply", "applying")
+        self.assertEqual(
+            lib.SequencerState("am", []), lib.sequencer_state(self.git_dir)
+        )
+
+    def test_cherry_pick(self):
+        self._write("CHERRY_PICK_HEAD", content="ccc\n")
+        self.assertEqual(
+            lib.SequencerState("cherry-pick", ["ccc^!"]),
+            lib.sequencer_state(self.git_dir),
+        )
+
+    def test_merge(self):
+        self._write("MERGE_HEAD", content="ddd\neee\n")
+        self.assertEqual(
+            lib.SequencerState("merge", ["ddd", "eee", "--not", "HEAD"]),
+            lib.sequencer_state(self.git_dir),
+        )
+
+    @patch("hooked.library.sequencer.git_reachable_objects")
+    def test_new_blobs(self, git_reachable_objects):
+        known = StagedEntry("a.txt", "100644", "1" * 40, "M")
+        new = StagedEntry("b.txt", "100644", "2" * 40, "M")
+        git_reachable_objects.return_value = {"1" * 40}
+
+        state = lib.SequencerState("merge", ["ddd", "--not", "HEAD"])
+        self.assertEqual([new], lib.new_blobs("/repo", state, [known, new]))
+        git_reachable_objects.assert_called_once_with("/repo", state.revs)
+
+    @patch("hooked.library.sequencer.git_reachable_objects")
+    def test_new_blobs_fallback(self, git_reachable_objects):
+        entries = [StagedEntry("a.txt", "100644", "1" * 40, "M")]
+        git_reachable_objects.side_effect = CommandError(CommandResult([], 128, "", ""))
+        state = lib.SequencerState("rebase", ["bbb", "--not", "aaa"])
+        self.assertEqual(entries, lib.new_blobs("/repo", state, entries))
+        self.assertEqual(
+            entries, lib.new_blobs("/repo", lib.SequencerState("am", []), entries)
+        )
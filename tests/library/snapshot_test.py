@@ -0,0 +1,99 @@
+#  Copyright 2025 T-Systems International GmbH
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are met:
+#
+#  1. Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#  2. Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+#
+#  3. Neither the name of the copyright holder nor the names of its
+#     contributors may be used to endorse or promote products derived from
+#     this software without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+#  DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+#  FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+#  DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+#  SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+#  CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+#  OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#  OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+from __future__ import annotations
+
+import os
+import subprocess
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import hooked.library.snapshot as lib
+from hooked.library.git import git_staged_entries, git_unstaged_files
+
+
+def _git(cwd: str, *args: str) -> str:
+    return subprocess.run(
+        ["git", "-c", "user.name=a", "-c", "user.email=a@b", *args],
+        cwd=cwd,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout.strip()
+
+
+def _read(path: str) -> str:
+    with open(path) as f:
+        return f.read()
+
+
+class SnapshotTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.repo = os.path.join(self.tmp.name, "repo")
+        os.makedirs(os.path.join(self.repo, "src"))
+        _git(self.tmp.name, "init", "--quiet", "--template=", self.repo)
+        self._write("pyproject.toml", "[tool]\n")
+        self._write("src/old.py", "old\n")
+        _git(self.repo, "add", ".")
+        _git(self.repo, "commit", "--quiet", "-m", "init")
+
+    def _write(self, path: str, content: str):
+        with open(os.path.join(self.repo, path), "w") as f:
+            f.write(content)
+
+    @patch.dict(os.environ, {"HOOKED_SNAPSHOT_DIR": ""})
+    def test_staged_snapshot(self):
+        self._write("src/new.py", "staged\n")
+        self._write("src/old.py", "changed\n")
+        _git(self.repo, "add", "src")
+        self._write("src/new.py", "unstaged\n")
+        self._write("src/untracked.py", "untracked\n")
+
+        entries = git_staged_entries(self.repo)
+        unstaged = git_unstaged_files(self.repo)
+        with lib.staged_snapshot(self.repo, entries, unstaged) as snapshot:
+            self.assertEqual("staged\n", _read(os.path.join(snapshot, "src/new.py")))
+            self.assertEqual("changed\n", _read(os.path.join(snapshot, "src/old.py")))
+            self.assertTrue(os.path.exists(os.path.join(snapshot, "pyproject.toml")))
+            self.assertFalse(os.path.exists(os.path.join(snapshot, "src/untracked.py")))
+            self.assertEqual(
+                "src/new.py\nsrc/old.py",
+                _git(snapshot, "diff", "--cached", "--name-only"),
+            )
+            self.assertEqual(
+                _git(self.repo, "symbolic-ref", "HEAD"),
+                _git(snapshot, "symbolic-ref", "HEAD"),
+            )
+        self.assertFalse(os.path.exists(snapshot))
+        self.assertEqual("unstaged\n", _read(os.path.join(self.repo, "src/new.py")))
+
+    def test_snapshot_root(self):
+        with patch.dict(os.environ, {"HOOKED_SNAPSHOT_DIR": "/snapshots"}):
+            self.assertEqual("/snapshots", lib.snapshot_root())
@@ -0,0 +1,114 @@
+#  Copyright 2025 T-Systems International GmbH
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are met:
+#
+#  1. Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#  2. Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+#
+#  3. Neither the name of the copyright holder nor the names of its
+#     contributors may be used to endorse or promote products derived from
+#     this software without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+#  DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+#  FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+#  DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+#  SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+#  CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+#  OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#  OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+from __future__ import annotations
+
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import hooked.library.stats as lib
+
+
+class StatsTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        patcher = patch(
+            "hooked.library.stats.get_cache_dir", return_value=self.tmp.name
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.tmp.cleanup)
+
+    def test_language(self):
+        self.assertEqual(".py", lib.language("src/Main.PY"))
+        self.assertEqual("Makefile", lib.language("sub/Makefile"))
+        self.assertEqual(".bashrc", lib.language(".bashrc"))
+
+    def test_load_save_stats(self):
+        self.assertEqual({}, lib.load_stats("/repo").languages)
+
+        stats = lib.RepoStats(repo="/repo", languages={".py": 2e-6})
+        lib.save_stats(stats)
+        self.assertEqual(stats, lib.load_stats("/repo"))
+        self.assertEqual({}, lib.load_stats("/other").languages)
+
+        with open(lib._stats_file("/repo"), "w") as f:
+            f.write("[")
+        self.assertEqual({}, lib.load_stats("/repo").languages)
+
+    def test_record_costs(self):
+        stats = lib.RepoStats(repo="/repo")
+        sizes = {"a.py": 10000, "b.py": 20000}
+        estimated = sum(lib.estimate_cost(stats, p, s) for p, s in sizes.items())
+
+        lib.record_costs(stats, sizes, estimated * 3)
+        self.assertGreater(stats.languages[".py"], lib.DEFAULT_COST)
+        self.assertNotIn(".md", stats.languages)
+        self.assertGreater(
+            lib.estimate_cost(stats, "c.py", 100), lib.estimate_cost(stats, "c.md", 100)
+        )
+
+        lib.record_costs(stats, {"c.md": 100}, 0)
+        self.assertNotIn(".md", stats.languages)
+
+    def test_balance(self):
+        costs = {"a": 5.0, "b": 4.0, "c": 3.0, "d": 3.0, "e": 1.0}
+        shards = lib.balance(costs, 2)
+
+        self.assertEqual([["a", "d"], ["b", "c", "e"]], shards)
+        self.assertEqual(shards, lib.balance(costs, 2))
+        self.assertEqual([["a"], ["b"]], lib.balance({"a": 1.0, "b": 1.0}, 4))
+        self.assertEqual([["a", "b"]], lib.balance({"a": 1.0, "b": 1.0}, 0))
+
+    def test_record_hook(self):
+        stats = lib.RepoStats(repo="/repo")
+        lib.record_hook(stats, "a", False, 2.0)
+        lib.record_hook(stats, "a", True, 4.0)
+
+        self.assertEqual(2, stats.hooks["a"].runs)
+        self.assertEqual(1, stats.hooks["a"].failures)
+        self.assertAlmostEqual(2.6, stats.hooks["a"].duration)
+
+        lib.save_stats(stats)
+        self.assertEqual(stats.hooks, lib.load_stats("/repo").hooks)
+
+    def test_fail_fast_order(self):
+        stats = lib.RepoStats(repo="/repo")
+        for _ in range(10):
+            lib.record_hook(stats, "slow-passing", True, 10.0)
+            lib.record_hook(stats, "fast-passing", True, 0.1)
+            lib.record_hook(stats, "slow-failing", False, 10.0)
+            lib.record_hook(stats, "fast-failing", False, 0.1)
+
+        self.assertEqual(
+            ["fast-failing", "fast-passing", "new", "slow-failing", "slow-passing"],
+            lib.fail_fast_order(
+                stats,
+                ["slow-passing", "new", "fast-passing", "slow-failing", "fast-failing"],
+            ),
+        )
@@ -0,0 +1,125 @@
+#  Copyright 2025 T-Systems International GmbH
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are met:
+#
+#  1. Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#  2. Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+#
+#  3. Neither the name of the copyright holder nor the names of its
+#     contributors may be used to endorse or promote products derived from
+#     this software without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+#  DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+#  FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+#  DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+#  SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+#  CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+#  OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#  OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+from __future__ import annotations
+
+import os
+import signal
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import hooked.library.toolchain as lib
+from hooked.library.cmd_util import CommandError
+
+# counts its calls in a file next to it
+TOOL = """#!/bin/sh
+echo x >> "$0.calls"
+echo "{name} version {version}"
+exit {rc}
+"""
+
+
+class ToolchainTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.bin = os.path.join(self.tmp.name, "bin")
+        os.makedirs(self.bin)
+        for patcher in (
+            patch.dict(os.environ, {"PATH": self.bin}),
+            patch(
+                "hooked.library.toolchain.get_cache_dir",
+                return_value=os.path.join(self.tmp.name, "cache"),
+            ),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _tool(self, name: str, version: str, rc: int = 0):
+        path = os.path.join(self.bin, name)
+        with open(path, "w") as f:
+            f.write(TOOL.format(name=name, version=version, rc=rc))
+        os.chmod(path, 0o755)
+
+    def _calls(self, name: str) -> int:
+        try:
+            with open(os.path.join(self.bin, f"{name}.calls")) as f:
+                return len(f.readlines())
+        except FileNotFoundError:
+            return 0
+
+    def test_cached(self):
+        self._tool("foo", "1.0.0")
+        self._tool("bar", "2.0.0")
+        versions = lib.probe_versions(["foo", "bar"])
+        self.assertEqual(
+            {"foo": "foo version 1.0.0", "bar": "bar version 2.0.0"}, versions
+        )
+        self.assertEqual(versions, lib.probe_versions(["foo", "bar"]))
+        self.assertEqual("foo version 1.0.0", lib.tool_version("foo"))
+        self.assertEqual((1, 1), (self._calls("foo"), self._calls("bar")))
+
+    def test_changed_binary(self):
+        self._tool("foo", "1.0.0")
+        self.assertEqual("foo version 1.0.0", lib.tool_version("foo"))
+        self._tool("foo", "1.10.0")
+        self.assertEqual("foo version 1.10.0", lib.tool_version("foo"))
+        self.assertEqual(2, self._calls("foo"))
+
+    def test_missing(self):
+        with self.assertRaises(CommandError) as cm:
+            lib.tool_version("foo")
+        self.assertEqual(127, cm.exception.result.returncode)
+
+    def test_failing(self):
+        self._tool("foo", "1.0.0", rc=2)
+        self.assertIsInstance(lib.probe_versions(["foo"])["foo"], CommandError)
+        with self.assertRaises(CommandError):
+            lib.tool_version("foo")
+        # failures are not cached
+        self.assertEqual(2, self._calls("foo"))
+
+    @patch.object(lib, "_PROBE_TIMEOUT", 0.3)
+    @patch("hooked.library.cmd_util._TERMINATE_GRACE", 0.2)
+    def test_hanging(self):
+        path = os.path.join(self.bin, "foo")
+        with open(path, "w") as f:
+            f.write("#!/bin/sh\ntrap '' TERM\nwhile :; do :; done\n")
+        os.chmod(path, 0o755)
+        result = lib.probe_versions(["foo"])["foo"]
+        self.assertIsInstance(result, CommandError)
+        self.assertEqual(-signal.SIGALRM, result.result.returncode)
+
+    def test_invalid_cache(self):
+        self._tool("foo", "1.0.0")
+        os.makedirs(os.path.dirname(lib._cache_file()))
+        with open(lib._cache_file(), "w") as f:
+            f.write("[")
+        self.assertEqual("foo version 1.0.0", lib.tool_version("foo"))
+        self.assertEqual("foo version 1.0.0", lib.tool_version("foo"))
+        self.assertEqual(1, self._calls("foo"))
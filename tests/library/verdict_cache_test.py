@@ -0,0 +1,98 @@
+#  Copyright 2025 T-Systems International GmbH
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are met:
+#
+#  1. Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#  2. Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+#
+#  3. Neither the name of the copyright holder nor the names of its
+#     contributors may be used to endorse or promote products derived from
+#     this software without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+#  DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+#  FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+#  DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+#  SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+#  CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+#  OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#  OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+from __future__ import annotations
+
+import os
+import tempfile
+import unittest
+
+import hooked.library.verdict_cache as lib
+from hooked.library.git import StagedEntry
+from hooked.library.ruleset import HookSpec
+
+
+class VerdictCacheTests(unittest.TestCase):
+    entry = StagedEntry("src/foo.py", "100644", "a" * 40, "M")
+    hook = HookSpec("check-ast", "https://github.com/pre-commit/pre-commit-hooks")
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "cache", "verdicts.bin")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_key_depends_on_identity(self):
+        key = lib.verdict_key(self.entry, self.hook, "cfg")
+        self.assertEqual(lib.KEY_SIZE, len(key))
+        self.assertEqual(key, lib.verdict_key(self.entry, self.hook, "cfg"))
+
+        moved = StagedEntry("tests/foo.py", "100644", "a" * 40, "M")
+        executable = StagedEntry("src/foo.py", "100755", "a" * 40, "M")
+        bumped = HookSpec(self.hook.id, self.hook.repo, rev="v6.0.0")
+        args = HookSpec(self.hook.id, self.hook.repo, args=("--strict",))
+        self.assertNotEqual(key, lib.verdict_key(moved, self.hook, "cfg"))
+        self.assertNotEqual(key, lib.verdict_key(executable, self.hook, "cfg"))
+        self.assertNotEqual(key, lib.verdict_key(self.entry, bumped, "cfg"))
+        self.assertNotEqual(key, lib.verdict_key(self.entry, args, "cfg"))
+        self.assertNotEqual(key, lib.verdict_key(self.entry, self.hook, "other"))
+
+    def test_add_and_contains(self):
+        key = lib.verdict_key(self.entry, self.hook, "cfg")
+        with lib.VerdictCache(self.path) as cache:
+            self.assertFalse(cache.contains(key))
+            cache.add(key)
+            self.assertTrue(cache.contains(key))
+            self.assertEqual((1, 1), (cache.hits, cache.misses))
+
+        # persisted on disk
+        with lib.VerdictCache(self.path) as cache:
+            self.assertTrue(cache.contains(key))
+
+    def test_size_budget_resets_index(self):
+        key = b"k" * lib.KEY_SIZE
+        with lib.VerdictCache(self.path) as cache:
+            cache.add(key)
+        with lib.VerdictCache(self.path, size=64 * 1024) as cache:
+            self.assertFalse(cache.contains(key))
+        self.assertLessEqual(os.path.getsize(self.path), 64 * 1024)
+
+    def test_lru_eviction(self):
+        # a single bucket, so all keys compete for the same slots
+        keys = [bytes([i]) * lib.KEY_SIZE for i in range(lib._WAYS + 1)]
+        with lib.VerdictCache(self.path, size=1) as cache:
+            self.assertEqual(1, cache.buckets)
+            for key in keys[:-1]:
+                cache.add(key)
+            # touch the oldest one, so the second oldest gets evicted
+            self.assertTrue(cache.contains(keys[0]))
+            cache.add(keys[-1])
+
+            self.assertTrue(cache.contains(keys[0]))
+            self.assertFalse(cache.contains(keys[1]))
+            self.assertTrue(cache.contains(keys[-1]))
@@ -0,0 +1,149 @@
+#  Copyright 2025 T-Systems International GmbH
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are met:
+#
+#  1. Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#  2. Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+#
+#  3. Neither the name of the copyright holder nor the names of its
+#     contributors may be used to endorse or promote products derived from
+#     this software without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+#  DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+#  FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+#  DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+#  SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+#  CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+#  OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#  OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+from __future__ import annotations
+
+import os
+import subprocess
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+import hooked.library.watcher as lib
+
+
+def _git(cwd: str, *args: str) -> str:
+    return subprocess.run(
+        ["git", "-c", "user.name=a", "-c", "user.email=a@b", *args],
+        cwd=cwd,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout.strip()
+
+
+class EnrollmentTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.repo = os.path.realpath(os.path.join(self.tmp.name, "repo"))
+        os.makedirs(os.path.join(self.repo, "src"))
+        _git(self.tmp.name, "init", "--quiet", "--template=", self.repo)
+        patcher = patch.object(lib, "get_base_dir", return_value=self.tmp.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_add_remove(self):
+        self.assertEqual([], lib.watched_repos())
+        self.assertTrue(lib.add_repo(os.path.join(self.repo, "src")))
+        self.assertFalse(lib.add_repo(self.repo))
+        self.assertEqual([self.repo], lib.watched_repos())
+        self.assertTrue(lib.remove_repo(os.path.join(self.repo, "src")))
+        self.assertFalse(lib.remove_repo(self.repo))
+        self.assertEqual([], lib.watched_repos())
+
+    def test_remove_deleted(self):
+        lib.add_repo(self.repo)
+        self.tmp.cleanup()
+        os.makedirs(self.tmp.name)
+        lib._save_repos([self.repo])
+        self.assertTrue(lib.remove_repo(self.repo))
+
+
+class WatchTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.repo = os.path.join(self.tmp.name, "repo")
+        _git(self.tmp.name, "init", "--quiet", "--template=", self.repo)
+        self.calls: list[str] = []
+        self.called = threading.Condition()
+
+    def _precheck(self, repo: str):
+        with self.called:
+            self.calls.append(repo)
+            self.called.notify_all()
+
+    def _wait_for(self, count: int):
+        with self.called:
+            self.called.wait_for(lambda: len(self.calls) >= count, timeout=10)
+        self.assertEqual([self.repo] * count, self.calls)
+
+    def _watch(self, precheck=None, **kwargs):
+        stop = threading.Event()
+        thread = threading.Thread(
+            target=lib.watch,
+            args=([self.repo], precheck or self._precheck),
+            kwargs={"debounce": 0.1, "poll_interval": 0.1, "stop": stop, **kwargs},
+        )
+        thread.start()
+
+        def _stop():
+            stop.set()
+            thread.join()
+
+        self.addCleanup(_stop)
+
+    def _stage(self, name: str):
+        with open(os.path.join(self.repo, name), "w") as f:
+            f.write(name)
+        _git(self.repo, "add", name)
+
+    def _check_staging_triggers(self):
+        self._wait_for(1)
+        self._stage("a.txt")
+        self._wait_for(2)
+        # nothing changed, nothing to pre-check
+        time.sleep(0.3)
+        self.assertEqual(2, len(self.calls))
+        self._stage("b.txt")
+        self._wait_for(3)
+
+    def test_poll(self):
+        self._watch(use_inotify=False)
+        self._check_staging_triggers()
+
+    @unittest.skipUnless(lib._inotify(), "inotify unavailable")
+    def test_inotify(self):
+        self._watch()
+        self._check_staging_triggers()
+
+    def test_precheck_errors_keep_watching(self):
+        def _precheck(repo: str):
+            self._precheck(repo)
+            raise OSError("gone")
+
+        self._watch(_precheck, use_inotify=False)
+        self._wait_for(1)
+        self._stage("a.txt")
+        self._wait_for(2)
+
+
+if __name__ == "__main__":
+    unittest.main()